@@ -486,17 +486,15 @@ class AdminMainWindow(QtWidgets.QWidget):
         w.showMaximized()
 
     def open_import_csv_window(self):
-        def job():
-            from PyQt5 import QtWidgets
-            fname, _ = QtWidgets.QFileDialog.getOpenFileName(None, "Select CSV File", "", "CSV Files (*.csv)")
-            if fname:
-                initialize_slots.import_from_csv(fname)
-                set_first_time_flag(False)
-                self.update_first_time_ui()
-            else:
-                raise Exception("No file selected")
-        w = FirstTimeActionWindow("Import Master CSV", job, "CSV file imported successfully!")
-        w.showMaximized()
+        # the file dialog has to run on the Qt thread; the import itself does not
+        fname, _ = QtWidgets.QFileDialog.getOpenFileName(None, "Select CSV File", "", "CSV Files (*.csv)")
+        if not fname:
+            return
+        def done():
+            set_first_time_flag(False)
+            self.update_first_time_ui()
+        self.import_win = slot_manager.CsvImportActionWindow(fname, done)
+        self.import_win.showMaximized()
 
     def open_slot_manager(self):
         self.sm = slot_manager.SlotManagerWindow()
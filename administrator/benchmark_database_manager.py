@@ -0,0 +1,70 @@
+# benchmark_database_manager.py
+# Compares the pooled DatabaseManager with the old connect-per-call behaviour.
+# Runs against a throwaway DB file so the real parking_system.db is never touched.
+import os
+import sqlite3
+import tempfile
+import time
+from database_manager import DatabaseManager
+from create_tables import CREATE_SCRIPT
+
+ITERATIONS = 5000
+
+
+class ConnectPerCallManager:
+    """The previous DatabaseManager: a fresh connection for every call."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def execute(self, sql, params=(), commit=False):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            if commit:
+                conn.commit()
+            return cur.lastrowid if cur.lastrowid else cur.rowcount
+
+    def fetchone(self, sql, params=()):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchone()
+
+
+def run_workload(manager, iterations=ITERATIONS):
+    """Time a gate-like mix: a slot lookup per iteration and an update every fourth."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        manager.fetchone("SELECT id, occupied FROM slots WHERE slot_code = ?", (f"SLOT-{i % 500:03d}",))
+        if i % 4 == 0:
+            manager.execute("UPDATE slots SET occupied = ? WHERE slot_code = ?",
+                            (i % 2, f"SLOT-{i % 500:03d}"), commit=True)
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, factory in (("connect-per-call", ConnectPerCallManager), ("pooled", DatabaseManager)):
+            path = os.path.join(tmp, f"{name}.db")
+            with sqlite3.connect(path) as conn:
+                conn.executescript(CREATE_SCRIPT)
+                conn.executemany("INSERT INTO slots (slot_code, zone, type, location, occupied) VALUES (?, ?, ?, ?, 0)",
+                                 [(f"SLOT-{i:03d}", "A", "Car", "North") for i in range(500)])
+            conn.close()
+            manager = factory(path)
+            results[name] = run_workload(manager)
+            if hasattr(manager, "close_all"):
+                manager.close_all()
+
+        for name, elapsed in results.items():
+            per_call = elapsed / ITERATIONS * 1e6
+            print(f"{name:>17}: {elapsed:7.3f}s total, {per_call:8.1f} us/iteration")
+        print(f"speedup: {results['connect-per-call'] / results['pooled']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
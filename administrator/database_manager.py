@@ -1,50 +1,105 @@
 # database_manager.py
 import sqlite3
+import threading
+from contextlib import contextmanager
 import system_config as cfg
 
 class DatabaseManager:
     def __init__(self, db_path=cfg.DB_PATH):
         self.db_path = db_path
-        # ensure file exists
-        conn = sqlite3.connect(self.db_path)
+        # one connection per thread, opened lazily and kept for the life of the thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self):
+        """Open a new connection and apply the per-connection PRAGMAs once."""
+        conn = sqlite3.connect(self.db_path, timeout=cfg.DB_BUSY_TIMEOUT_MS / 1000)
         conn.row_factory = sqlite3.Row
-        conn.close()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {cfg.DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = -{cfg.DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {cfg.DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout = {cfg.DB_BUSY_TIMEOUT_MS}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """Return this thread's pooled connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def close_all(self):
+        """Close every pooled connection (e.g. before deleting or replacing the DB file)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # connection belongs to another (possibly finished) thread
+                pass
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several execute/executemany calls into one commit (rolled back on error).
+        Nested blocks join the outer transaction.
+        """
+        conn = self.connection()
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except Exception:
+            if depth == 0:
+                conn.rollback()
+            raise
+        else:
+            if depth == 0:
+                conn.commit()
+        finally:
+            self._local.depth = depth
 
     def execute(self, sql, params=(), commit=False):
         """
         Run an INSERT/UPDATE/DELETE or any SQL where caller doesn't need fetched rows.
         Returns lastrowid for inserts or number of affected rows for others.
+        Outside transaction() the statement is committed straight away, as the old
+        per-call connection did; `commit` is kept for existing callers.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            if commit:
-                conn.commit()
-            # return lastrowid for inserts, else rowcount
-            return cur.lastrowid if cur.lastrowid else cur.rowcount
+        with self.transaction() as conn:
+            cur = conn.execute(sql, params)
+        # return lastrowid for inserts, else rowcount
+        return cur.lastrowid if cur.lastrowid else cur.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        """Run one statement for every parameter tuple; returns the number of affected rows."""
+        with self.transaction() as conn:
+            cur = conn.executemany(sql, seq_of_params)
+        return cur.rowcount
 
     def fetchone(self, sql, params=()):
         """Execute a SELECT and return a single row (sqlite3.Row) or None."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            return cur.fetchone()
+        return self.connection().execute(sql, params).fetchone()
 
     def fetchall(self, sql, params=()):
         """Execute a SELECT and return list of sqlite3.Row."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            return cur.fetchall()
+        return self.connection().execute(sql, params).fetchall()
 
     def executescript(self, script):
         """Execute a full SQL script (multiple statements)."""
-        with sqlite3.connect(self.db_path) as conn:
+        # scripts may change connection state (e.g. PRAGMA foreign_keys), so keep
+        # them on their own short-lived connection instead of a pooled one
+        with sqlite3.connect(self.db_path, timeout=cfg.DB_BUSY_TIMEOUT_MS / 1000) as conn:
             conn.executescript(script)
             conn.commit()
+        conn.close()
 
 # single global instance for convenience
 db = DatabaseManager()
@@ -1,28 +1,84 @@
 # initialize_slots.py
 # Functions to create initial slots: default and CSV import.
 import csv
+import os
+from itertools import islice
 from database_manager import db
 import system_config as cfg
 
+INSERT_SLOT = "INSERT OR IGNORE INTO slots (slot_code, zone, type, location, occupied) VALUES (?, ?, ?, ?, ?)"
+
 def initialize_default_slots(n=10):
-    for i in range(1, n+1):
-        code = f"SLOT-{i:03d}"
-        db.execute("INSERT OR IGNORE INTO slots (slot_code, zone, type, location, occupied) VALUES (?, ?, ?, ?, ?)",
-                   (code, cfg.DEFAULT_ZONE_LIST[i % len(cfg.DEFAULT_ZONE_LIST)],
-                    cfg.DEFAULT_TYPE_LIST[i % len(cfg.DEFAULT_TYPE_LIST)],
-                    cfg.DEFAULT_LOCATION_LIST[i % len(cfg.DEFAULT_LOCATION_LIST)], 0), commit=True)
+    """Add SLOT-001..SLOT-n round-robin over the default zones, types and locations."""
+    rows = ((f"SLOT-{i:03d}",
+             cfg.DEFAULT_ZONE_LIST[i % len(cfg.DEFAULT_ZONE_LIST)],
+             cfg.DEFAULT_TYPE_LIST[i % len(cfg.DEFAULT_TYPE_LIST)],
+             cfg.DEFAULT_LOCATION_LIST[i % len(cfg.DEFAULT_LOCATION_LIST)], 0)
+            for i in range(1, n+1))
+    return db.executemany(INSERT_SLOT, rows)
+
+REQUIRED_CSV_COLUMNS = ("slot_code", "zone")
+
+def _validate_chunk(rows, seen_codes):
+    """
+    Split a chunk of (line_no, row) pairs into insertable tuples and (line_no, reason) rejections.
+    """
+    valid, rejected = [], []
+    for line_no, r in rows:
+        if None in r:
+            rejected.append((line_no, "too many fields"))
+            continue
+        slot_code = (r.get("slot_code") or "").strip()
+        zone = (r.get("zone") or "").strip()
+        if not slot_code:
+            rejected.append((line_no, "missing slot_code"))
+            continue
+        if not zone:
+            rejected.append((line_no, "missing zone"))
+            continue
+        if slot_code in seen_codes:
+            rejected.append((line_no, f"duplicate slot_code {slot_code} in file"))
+            continue
+        seen_codes.add(slot_code)
+        valid.append((slot_code, zone, (r.get("type") or "").strip() or None,
+                      (r.get("location") or "").strip() or None, 0))
+    return valid, rejected
+
+def import_from_csv(path, chunk_size=cfg.CSV_IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Stream a slot master CSV (columns: slot_code,zone,type,location) into the slots table.
 
-def import_from_csv(path):
-    # CSV expected columns: slot_code,zone,type,location
-    with open(path, newline='', encoding='utf-8') as f:
+    Rows are validated and inserted chunk by chunk with executemany, all inside one
+    transaction, so a failed import leaves the table untouched. Codes already in the
+    table are left as they are. `progress(rows_read, percent)` is called after every chunk.
+    Returns a dict with total, inserted, existing and rejected [(line_no, reason)].
+    """
+    report = {"total": 0, "inserted": 0, "existing": 0, "rejected": []}
+    seen_codes = set()
+    size = os.path.getsize(path) or 1
+    with open(path, newline='', encoding='utf-8-sig') as f:
         reader = csv.DictReader(f)
-        for r in reader:
-            slot_code = r.get("slot_code") or None
-            zone = r.get("zone") or None
-            type_ = r.get("type") or None
-            location = r.get("location") or None
-            db.execute("INSERT OR IGNORE INTO slots (slot_code, zone, type, location, occupied) VALUES (?, ?, ?, ?, ?)",
-                       (slot_code, zone, type_, location, 0), commit=True)
+        missing = [c for c in REQUIRED_CSV_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        rows = enumerate(reader, start=2)  # line 1 is the header
+        with db.transaction():
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                valid, rejected = _validate_chunk(chunk, seen_codes)
+                inserted = db.executemany("INSERT OR IGNORE INTO slots (slot_code, zone, type, location, occupied) VALUES (?, ?, ?, ?, ?)",
+                                          valid) if valid else 0
+                report["total"] += len(chunk)
+                report["inserted"] += inserted
+                report["existing"] += len(valid) - inserted
+                report["rejected"].extend(rejected)
+                if progress:
+                    progress(report["total"], min(99, f.buffer.tell() * 100 // size))
+    if progress:
+        progress(report["total"], 100)
+    return report
 
 if __name__ == "__main__":
     initialize_default_slots(30)
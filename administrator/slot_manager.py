@@ -4,6 +4,127 @@ from admin_gui import make_card, make_section_label, make_primary_button, make_g
 from database_manager import db
 import initialize_slots, system_config as cfg
 
+# Master CSV import worker
+class CsvImportThread(QtCore.QThread):
+    """Runs initialize_slots.import_from_csv off the Qt thread and reports back through signals."""
+    progress = QtCore.pyqtSignal(int, int)  # rows read, percent of file
+    done = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        try:
+            report = initialize_slots.import_from_csv(self.path, progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.done.emit(report)
+
+def describe_import(report):
+    """One-line summary of an import_from_csv report, naming the first few rejected lines."""
+    text = f"Imported {report['inserted']:,} of {report['total']:,} rows"
+    if report["existing"]:
+        text += f", {report['existing']:,} already present"
+    rejected = report["rejected"]
+    if rejected:
+        shown = "; ".join(f"line {line}: {reason}" for line, reason in rejected[:3])
+        more = f" (+{len(rejected) - 3} more)" if len(rejected) > 3 else ""
+        text += f", {len(rejected):,} rejected — {shown}{more}"
+    return text
+
+class CsvImportActionWindow(QtWidgets.QWidget):
+    """Master CSV import window; the import runs on a CsvImportThread and reports progress"""
+    STATUS_STYLE = """
+    QLabel#statusInfo { background: #eff6ff; border: 2px solid #3b82f6; border-radius: 10px; padding: 10px; }
+    QLabel#statusSuccess { background: #ecfdf5; border: 2px solid #10b981; border-radius: 10px; padding: 10px; }
+    QLabel#statusWarning { background: #fffbeb; border: 2px solid #f59e0b; border-radius: 10px; padding: 10px; }
+    QLabel#statusError { background: #fef2f2; border: 2px solid #ef4444; border-radius: 10px; padding: 10px; }
+    """
+
+    def __init__(self, path, on_done=None):
+        super().__init__()
+        self.setWindowTitle("GuideLo — Import Master CSV")
+        self.path = path
+        self.on_done = on_done
+        self.import_thread = None
+        self.setup_ui()
+        self.setStyleSheet(self.STATUS_STYLE)
+
+    def setup_ui(self):
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.setContentsMargins(12, 12, 12, 12)
+        main_layout.setSpacing(10)
+
+        main_layout.addWidget(make_section_label("Import Master CSV"))
+
+        card = make_card()
+        path_label = QtWidgets.QLabel(self.path)
+        path_label.setWordWrap(True)
+        card.layout().addWidget(path_label)
+
+        btn_row = QtWidgets.QHBoxLayout()
+        self.run_btn = make_primary_button("Run Import")
+        self.run_btn.clicked.connect(self.run_import)
+        btn_row.addWidget(self.run_btn)
+
+        self.close_btn = make_ghost_button("Back")
+        self.close_btn.clicked.connect(self.close)
+        btn_row.addWidget(self.close_btn)
+
+        card.layout().addLayout(btn_row)
+        main_layout.addWidget(card)
+        self.status = QtWidgets.QLabel("")
+        self.status.setWordWrap(True)
+        self.status.hide()
+        main_layout.addWidget(self.status)
+        main_layout.addStretch()
+        self.setLayout(main_layout)
+
+    def set_status(self, kind, text):
+        # kind is info, success, warning or error, matching the STATUS_STYLE rules
+        self.status.setObjectName(f"status{kind.title()}")
+        self.status.setText(text)
+        self.status.style().unpolish(self.status)
+        self.status.style().polish(self.status)
+        self.status.show()
+
+    def run_import(self):
+        self.run_btn.setText("Running...")
+        self.run_btn.setEnabled(False)
+        self.close_btn.setEnabled(False)
+        self.set_status("info", "Importing...")
+        self.import_thread = CsvImportThread(self.path, self)
+        self.import_thread.progress.connect(self.show_progress)
+        self.import_thread.done.connect(self.import_done)
+        self.import_thread.failed.connect(self.import_failed)
+        self.import_thread.start()
+
+    def show_progress(self, rows, percent):
+        self.set_status("info", f"Importing... {rows:,} rows read ({percent}%)")
+
+    def import_done(self, report):
+        self.close_btn.setEnabled(True)
+        self.set_status("warning" if report["rejected"] else "success", describe_import(report))
+        self.run_btn.setText("Completed")
+        if callable(self.on_done):
+            self.on_done()
+
+    def import_failed(self, error):
+        self.close_btn.setEnabled(True)
+        self.set_status("error", f"Error: {error}")
+        self.run_btn.setText("Run Import")
+        self.run_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        # keep the window (and its thread) alive until the import has committed
+        if self.import_thread is not None and self.import_thread.isRunning():
+            event.ignore()
+        else:
+            super().closeEvent(event)
+
 # Separate Add Slot Window (has Back button)
 class AddSlotWindow(QtWidgets.QWidget):
     def __init__(self, parent_refresh_fn=None):
@@ -118,8 +239,24 @@ class SlotManagerWindow(QtWidgets.QWidget):
     def import_csv(self):
         fname, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open CSV", "", "CSV Files (*.csv)")
         if fname:
-            initialize_slots.import_from_csv(fname)
-            self.refresh_slot_list()
+            self.csv_btn.setEnabled(False)
+            self.import_thread = CsvImportThread(fname, self)
+            self.import_thread.progress.connect(
+                lambda rows, percent: self.csv_btn.setText(f"Importing... {rows:,} rows ({percent}%)"))
+            self.import_thread.done.connect(self.import_done)
+            self.import_thread.failed.connect(self.import_failed)
+            self.import_thread.start()
+
+    def import_done(self, report):
+        self.csv_btn.setText("Import Slots from CSV")
+        self.csv_btn.setEnabled(True)
+        self.refresh_slot_list()
+        QtWidgets.QMessageBox.information(self, "CSV Import", describe_import(report))
+
+    def import_failed(self, error):
+        self.csv_btn.setText("Import Slots from CSV")
+        self.csv_btn.setEnabled(True)
+        QtWidgets.QMessageBox.critical(self, "CSV Import", f"Import failed: {error}")
 
     def open_add_slot_window(self):
         # open separate add slot window and pass refresh function
@@ -4,3 +4,12 @@ DB_PATH = "parking_system.db"
 DEFAULT_ZONE_LIST = ["A", "B", "C"]
 DEFAULT_TYPE_LIST = ["Car", "Bike", "EV"]
 DEFAULT_LOCATION_LIST = ["North", "South", "East", "West"]
+
+# SQLite tuning applied once per pooled connection (see database_manager.py)
+DB_SYNCHRONOUS = "NORMAL"           # safe with WAL; FULL fsyncs on every commit
+DB_CACHE_SIZE_KB = 20000            # page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024    # bytes of the DB file memory-mapped for reads
+DB_BUSY_TIMEOUT_MS = 5000
+
+# Rows validated and inserted per executemany call by initialize_slots.import_from_csv
+CSV_IMPORT_CHUNK_SIZE = 5000
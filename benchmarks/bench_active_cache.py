@@ -0,0 +1,73 @@
+"""
+Benchmark: gate lookups (is_vehicle_parked followed by get_parked_vehicle_info)
+through the active-vehicle LRU cache versus straight database reads.
+
+A lot with a few hundred parked cars sees a stream of gate checks, mostly
+for parked plates plus some for cars that are not inside, with a park or
+exit now and then to exercise invalidation. Reports time per gate check and
+the cache's hit/miss counters. Run from the repository root:
+
+    python -m benchmarks.bench_active_cache [checks]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.initialize_slots import seed_slots
+from parking_logic import allocator
+from database.active_cache import active_cache
+from database import fetch_records, update_records
+
+
+def uncached_lookup(plate):
+    row = repo.fetchone('SELECT 1 FROM active_vehicles WHERE vehicle_number = ?', (plate,))
+    if row is None:
+        return None
+    return repo.fetchone('SELECT slot_id, zone, entry_time FROM active_vehicles WHERE vehicle_number = ?',
+                         (plate,))
+
+
+def cached_lookup(plate):
+    if not fetch_records.is_vehicle_parked(plate):
+        return None
+    return fetch_records.get_parked_vehicle_info(plate)
+
+
+def run(checks, lookup, seed):
+    rng = random.Random(seed)
+    parked = [f'P{n:05d}' for n in range(300)]
+    start = time.perf_counter()
+    for n in range(checks):
+        if n % 200 == 0:
+            # a car leaves and another arrives
+            update_records.exit_vehicle(parked[n // 200 % len(parked)])
+            update_records.park_vehicle(parked[n // 200 % len(parked)], 'Car', 'Student', 'A')
+        plate = rng.choice(parked) if rng.random() < 0.8 else f'V{rng.randrange(2000):05d}'
+        lookup(plate)
+    return (time.perf_counter() - start) / checks
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'cache.db'))
+        initialize_database()
+        seed_slots({'A': {'count': 1000}}, top_up=True)
+        allocator.load()
+        for n in range(300):
+            update_records.park_vehicle(f'P{n:05d}', 'Car', 'Student', 'A')
+
+        print(f"  database: {run(checks, uncached_lookup, 1) * 1e6:6.1f} us per gate check")
+        print(f"     cache: {run(checks, cached_lookup, 1) * 1e6:6.1f} us per gate check")
+        stats = active_cache.stats()
+        print(f"cache hits {stats['hits']}, misses {stats['misses']}, evictions {stats['evictions']}, "
+              f"hit rate {stats['hit_rate']:.1%}")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
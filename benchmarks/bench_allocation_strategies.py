@@ -0,0 +1,61 @@
+"""
+Micro-benchmark: cost of each parking_logic allocation strategy versus lot size.
+
+Fills a lot to OCCUPANCY with typed slots in blocks and rows of ROW_SIZE,
+then churns it: each op releases a random parked slot and allocates one
+with the strategy under test, as a busy gate does. Each strategy runs on
+its own engine, so the per-op time includes only its own index. Run from
+the repository root:
+
+    python -m benchmarks.bench_allocation_strategies
+"""
+import random
+import time
+from parking_logic import AllocationEngine, STRATEGY_LABELS
+
+LOT_SIZES = [10_000, 100_000, 1_000_000]
+OCCUPANCY = 0.95
+OPS = 20_000
+# slot types come in blocks, as bays are painted, with untyped bays in between
+TYPE_BLOCK = 500
+SLOT_TYPES = ['Car', 'Bike', None, 'SUV']
+VEHICLE_TYPES = ['Car', 'Car', 'Bike', 'SUV']
+
+
+def build_rows(n_slots, seed=7):
+    rng = random.Random(seed)
+    return [(slot_id, 'A', 1 if rng.random() < OCCUPANCY else 0,
+             SLOT_TYPES[(slot_id - 1) // TYPE_BLOCK % len(SLOT_TYPES)], None)
+            for slot_id in range(1, n_slots + 1)]
+
+
+def bench_strategy(rows, strategy, seed=11):
+    rng = random.Random(seed)
+    engine = AllocationEngine()
+    start = time.perf_counter()
+    engine.load(rows)
+    engine.peek('A', strategy=strategy)
+    load_s = time.perf_counter() - start
+
+    parked = [slot_id for slot_id, _, is_occupied, _, _ in rows if is_occupied]
+    start = time.perf_counter()
+    for _ in range(OPS):
+        index = rng.randrange(len(parked))
+        engine.release('A', parked[index])
+        slot_id = engine.allocate('A', strategy=strategy, vehicle_type=rng.choice(VEHICLE_TYPES))
+        if slot_id is not None:
+            parked[index] = slot_id
+    return load_s, (time.perf_counter() - start) / OPS
+
+
+def main():
+    print(f"{'slots':>10} {'strategy':>20} {'load ms':>9} {'us/op':>7}")
+    for n_slots in LOT_SIZES:
+        rows = build_rows(n_slots)
+        for strategy in STRATEGY_LABELS:
+            load_s, op_s = bench_strategy(rows, strategy)
+            print(f"{n_slots:>10} {strategy:>20} {load_s * 1e3:>9.1f} {op_s * 1e6:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: a per-zone, per-day report (sessions, average and p95 stay)
+computed from parking_history versus read from the daily_summary rollups
+(database/rollups.py).
+
+Fills parking_history with a year of closed sessions in three zones, times
+the first full rollup, a catch-up after a day's worth of new exits, and the
+30-day report both ways. Run from the repository root:
+
+    python -m benchmarks.bench_daily_rollup [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from database.repository import repo
+from database.create_tables import initialize_database
+from database import fetch_records, rollups
+from utils import to_epoch
+
+DAYS = 365
+
+
+def fill_history(total, start, step):
+    with repo.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+            INSERT INTO parking_history
+                (vehicle_num, slot_id, zone, entry_time, exit_time, duration_min, entry_ts, exit_ts)
+            SELECT printf('BENCH%05d', i % 20000), i % 100 + 1, char(65 + i % 3),
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ?, 'unixepoch', 'localtime'),
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ? + (i * 7919 % 600) * 60, 'unixepoch', 'localtime'),
+                   i * 7919 % 600, ? + i * ?, ? + i * ? + (i * 7919 % 600) * 60
+            FROM n
+        ''', (total, start, step, start, step, start, step, start, step))
+
+
+def raw_report(start, end):
+    # what a report had to do without rollups: group and sort the raw sessions
+    cursor = repo.cursor()
+    cursor.execute('''
+        SELECT substr(entry_time, 1, 10), zone, duration_min FROM parking_history
+        WHERE entry_ts >= ? AND entry_ts < ? AND exit_ts IS NOT NULL
+    ''', (to_epoch(start), to_epoch(end + timedelta(days=1))))
+    groups = {}
+    for day, zone, duration in cursor:
+        groups.setdefault((day, zone), []).append(duration)
+    result = []
+    for key in sorted(groups):
+        durations = sorted(groups[key])
+        result.append((key, len(durations), sum(durations) / len(durations),
+                       durations[max(0, -(-len(durations) * 95 // 100) - 1)]))
+    return result
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'rollup.db'))
+        initialize_database()
+
+        now = int(time.time())
+        step = DAYS * 86400 // total
+        start = now - step * total
+        fill_history(total, start, step)
+        repo.execute('ANALYZE')
+
+        # the last day of exits arrives after the first rollup
+        begin = time.perf_counter()
+        rows = rollups.update_daily_summary(now=now - 86400)
+        print(f"initial rollup of {total:,} sessions: {time.perf_counter() - begin:.1f} s ({rows:,} rows)")
+        begin = time.perf_counter()
+        rollups.update_daily_summary(now=now)
+        print(f"catch-up on a day of exits: {(time.perf_counter() - begin) * 1000:.0f} ms")
+        begin = time.perf_counter()
+        rollups.update_daily_summary(now=now)
+        print(f"catch-up with nothing new: {(time.perf_counter() - begin) * 1000:.2f} ms")
+
+        end_day = date.today() - timedelta(days=2)
+        first_day = end_day - timedelta(days=29)
+        begin = time.perf_counter()
+        raw = raw_report(first_day, end_day)
+        raw_s = time.perf_counter() - begin
+        begin = time.perf_counter()
+        summary = fetch_records.get_daily_summary(first_day, end_day)
+        rollup_s = time.perf_counter() - begin
+
+        assert [(key, count) for key, count, _, _ in raw] == \
+            [((row['date'], row['zone']), row['sessions']) for row in summary if row['sessions']]
+        worst = max(abs(p95 - row['p95_duration_min'])
+                    for (_, _, _, p95), row in zip(raw, [r for r in summary if r['sessions']]))
+        print(f"30-day report ({len(summary)} zone-days): raw history {raw_s * 1000:.0f} ms, "
+              f"rollups {rollup_s * 1000:.1f} ms ({raw_s / rollup_s:,.0f}x); "
+              f"p95 within {worst} min of exact")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
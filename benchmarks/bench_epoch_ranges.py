@@ -0,0 +1,131 @@
+"""
+Benchmark: date-range queries on parking_history before and after the
+integer epoch columns of migration 7.
+
+Fills parking_history with sessions spread over the last 400 days (text
+timestamps only, as a database from before migration 7 has them), times
+migration 7's batched epoch backfill, then compares each query in its old form (DATE() /
+datetime() on the text columns) with its half-open range form on the
+indexed epoch columns. Run from the repository root:
+
+    python -m benchmarks.bench_epoch_ranges [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.migrations import MIGRATIONS, Backfill
+from database import fetch_records, delete_records
+from utils import to_epoch
+
+VEHICLES = 20_000
+DAYS = 400
+
+
+def fill_history(total):
+    start = to_epoch(datetime.now() - timedelta(days=DAYS))
+    step = DAYS * 86400 // total
+    with repo.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+            INSERT INTO vehicles_master (vehicle_number, vehicle_type, category, first_entry)
+            SELECT printf('BENCH%05d', i), 'Car', 'Student', '2024-01-01T00:00:00' FROM n
+        ''', (VEHICLES,))
+        # entry every `step` seconds, stays of 10 to 490 minutes, stored as local ISO text
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+            INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time, exit_time, duration_min)
+            SELECT printf('BENCH%05d', i % ?), i % 100 + 1, 'A',
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ?, 'unixepoch', 'localtime'),
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ? + (i % 49 + 1) * 600, 'unixepoch', 'localtime'),
+                   (i % 49 + 1) * 10
+            FROM n
+        ''', (total, VEHICLES, start, step, start, step))
+
+
+def run_epoch_backfill():
+    # migration 7's Backfill, one transaction per batch as migrate() runs it
+    steps = next(steps for version, _, steps in MIGRATIONS if version == 7)
+    backfill = next(step for step in steps if isinstance(step, Backfill))
+    with repo.transaction() as conn:
+        position = backfill.first(conn)
+    batches = 0
+    while position is not None:
+        with repo.transaction(immediate=True) as conn:
+            position = backfill.batch(conn, position)
+        batches += 1
+    return batches
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def rolled_back(sql, params):
+    def run():
+        conn = repo.connection()
+        conn.execute('BEGIN')
+        try:
+            return conn.execute(sql, params).rowcount
+        finally:
+            conn.rollback()
+    return run
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'history.db'))
+        initialize_database()
+
+        begin = time.perf_counter()
+        fill_history(total)
+        print(f"filled {total:,} sessions in {time.perf_counter() - begin:.1f} s")
+
+        begin = time.perf_counter()
+        batches = run_epoch_backfill()
+        print(f"epoch backfill: {time.perf_counter() - begin:.1f} s in {batches} batches")
+        repo.execute('ANALYZE')
+
+        day = date.today() - timedelta(days=100)
+        old, old_rows = timed(lambda: repo.fetchall('''
+            SELECT ph.vehicle_num, vm.vehicle_type, vm.category, ph.slot_id,
+                   ph.zone, ph.entry_time, ph.exit_time, ph.duration_min
+            FROM parking_history ph
+            JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
+            WHERE DATE(ph.entry_time) = ?
+            ORDER BY ph.entry_time
+        ''', (day.isoformat(),)))
+        new, new_rows = timed(lambda: fetch_records.get_parking_history_data(day))
+        assert len(old_rows) == len(new_rows), (len(old_rows), len(new_rows))
+        print(f"one day of history ({len(new_rows):,} rows): DATE(entry_time) {old * 1000:8.1f} ms, "
+              f"entry_ts range {new * 1000:6.1f} ms ({old / new:,.0f}x)")
+
+        cutoff = datetime.now() - timedelta(days=365)
+        old, old_count = timed(rolled_back(
+            'DELETE FROM parking_history WHERE exit_time IS NOT NULL AND datetime(exit_time) < ?',
+            (cutoff.strftime('%Y-%m-%d %H:%M:%S'),)), repeat=1)
+        new, new_count = timed(rolled_back(
+            'DELETE FROM parking_history WHERE exit_ts IS NOT NULL AND exit_ts < ?',
+            (to_epoch(cutoff),)), repeat=1)
+        print(f"retention delete ({new_count:,} rows): datetime(exit_time) {old:6.2f} s, "
+              f"exit_ts range {new:6.2f} s (rolled back; old form matched {old_count:,})")
+
+        begin = time.perf_counter()
+        deleted = delete_records.delete_old_history(days=365)
+        print(f"delete_old_history(365): {deleted:,} rows in {time.perf_counter() - begin:.2f} s")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: fitting the per-zone arrival/departure profiles
+(forecasting.py) and backtesting the occupancy forecast.
+
+Fills parking_history with a year of synthetic sessions following a
+weekday/weekend pattern with a morning rush, times the first fit, the
+incremental refresh, and a projection, then walks through the last two
+weeks making a forecast every three hours. Each forecast is compared with
+the occupancy the history actually shows 1 to 4 hours later, and against
+assuming occupancy stays as it is. Run from the repository root:
+
+    python -m benchmarks.bench_forecasting [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.history_columns import history_columns
+from forecasting import OccupancyForecaster, week_slots, BIN_S, WEEK_SLOTS
+
+WEEKS = 52
+BACKTEST_DAYS = 14
+
+# zone: (share of arrivals, mean stay in minutes)
+ZONES = {'A': (0.5, 180), 'B': (0.3, 420), 'C': (0.2, 60)}
+
+
+def arrival_shape():
+    # relative arrivals per week slot: busy weekday mornings, quiet nights and weekends
+    quarter = np.arange(WEEK_SLOTS) % 96 / 4
+    day = np.arange(WEEK_SLOTS) // 96
+    shape = 0.05 + np.exp(-((quarter - 8.5) / 1.0) ** 2) * 3 + np.exp(-((quarter - 13) / 2.0) ** 2)
+    return shape * np.where(day < 5, 1.0, 0.3)
+
+
+def fill_patterned_history(total, start):
+    rng = np.random.default_rng(7)
+    starts = np.arange(start, start + WEEKS * 7 * 86400, BIN_S)
+    shape = arrival_shape()[week_slots(starts)]
+    rows = []
+    for zone, (share, stay) in ZONES.items():
+        counts = rng.poisson(shape / shape.sum() * total * share)
+        entry = np.repeat(starts, counts) + rng.integers(0, BIN_S, counts.sum())
+        duration = np.maximum(rng.lognormal(np.log(stay) - 0.32, 0.8, len(entry)), 1).astype(np.int64)
+        plates = rng.integers(0, 50000, len(entry))
+        rows += [(f'SIM{plate:05d}', zone, entry_ts, entry_ts + minutes * 60, minutes)
+                 for plate, entry_ts, minutes in zip(plates.tolist(), entry.tolist(), duration.tolist())]
+    rows.sort(key=lambda row: row[2])
+    stamp = lambda seconds: datetime.fromtimestamp(seconds).isoformat()
+    with repo.transaction() as conn:
+        conn.executemany('''
+            INSERT INTO parking_history
+                (vehicle_num, slot_id, zone, entry_time, exit_time, duration_min, entry_ts, exit_ts)
+            VALUES (?, 0, ?, ?, ?, ?, ?, ?)
+        ''', [(plate, zone, stamp(entry_ts), stamp(exit_ts), minutes, entry_ts, exit_ts)
+              for plate, zone, entry_ts, exit_ts, minutes in rows])
+    return len(rows)
+
+
+def occupancy_at(cols, moments):
+    # cars parked at each moment, per zone: entered at or before it and not yet left
+    result = {}
+    for code, zone in enumerate(cols['zone_names']):
+        mine = cols['zone'] == code
+        entries, exits = np.sort(cols['entry_ts'][mine]), np.sort(cols['exit_ts'][mine])
+        result[zone] = np.searchsorted(entries, moments, 'right') - np.searchsorted(exits, moments, 'right')
+    return result
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'forecast.db'))
+        initialize_database()
+
+        now = int(time.time()) // BIN_S * BIN_S
+        start = now - WEEKS * 7 * 86400
+        sessions = fill_patterned_history(total, start)
+        history_columns.refresh()
+        cols = history_columns.columns(refresh=False)
+
+        origins = np.arange(now - BACKTEST_DAYS * 86400, now - 4 * 3600, 3 * 3600) + 60
+        forecaster = OccupancyForecaster()
+        begin = time.perf_counter()
+        bins = forecaster.refresh(origins[0])
+        print(f"first fit, {bins:,} quarter hours over {sessions:,} sessions: "
+              f"{(time.perf_counter() - begin) * 1000:.0f} ms")
+
+        horizons = np.arange(1, 5) * 3600
+        actual = occupancy_at(cols, np.add.outer(origins, np.r_[0, horizons]))
+        capacity = {zone: 10 ** 6 for zone in ZONES}  # the synthetic history never turns cars away
+        errors = {zone: [] for zone in ZONES}
+        refresh_s, project_s = [], []
+        for index, origin in enumerate(origins):
+            begin = time.perf_counter()
+            forecaster.refresh(origin)
+            refresh_s.append(time.perf_counter() - begin)
+            occupied = {zone: int(actual[zone][index, 0]) for zone in ZONES}
+            begin = time.perf_counter()
+            projection = forecaster.project(occupied, capacity, now=origin)
+            project_s.append(time.perf_counter() - begin)
+            for row in projection:
+                hourly = row['projected'][3::4]
+                errors[row['zone']].append((np.abs(hourly - actual[row['zone']][index, 1:]),
+                                            np.abs(occupied[row['zone']] - actual[row['zone']][index, 1:])))
+
+        print(f"incremental refresh (3 h of new history): {np.median(refresh_s) * 1000:.1f} ms; "
+              f"4 h projection: {np.median(project_s) * 1000:.1f} ms")
+        for zone, pairs in errors.items():
+            forecast = np.mean([error for error, _ in pairs], axis=0)
+            persistence = np.mean([error for _, error in pairs], axis=0)
+            mean = actual[zone][:, 0].mean()
+            print(f"zone {zone} (mean {mean:.0f} parked), mean abs error at +1..4 h over "
+                  f"{len(pairs)} forecasts: " + ', '.join(f"{f:.1f}" for f in forecast) +
+                  "; unchanged occupancy: " + ', '.join(f"{p:.1f}" for p in persistence))
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
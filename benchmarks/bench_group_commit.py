@@ -0,0 +1,85 @@
+"""
+Benchmark: per-call commits versus the GroupCommitWriter for session inserts.
+
+Several gate threads each record a stream of cars (vehicle upsert plus
+session insert). Both modes run with synchronous=FULL, so every reported
+write is durable when it returns. Reports throughput and per-car latency.
+Run from the repository root:
+
+    python -m benchmarks.bench_group_commit [gates] [cars_per_gate]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from database.repository import repo
+from database.create_tables import initialize_database
+from database import insert_records
+from database.group_commit import GroupCommitWriter
+
+
+def run_gates(gates, cars_per_gate, record_car):
+    latencies = []
+    lock = threading.Lock()
+
+    def gate(gate_id):
+        repo.connection().execute('PRAGMA synchronous = FULL')
+        mine = []
+        for n in range(cars_per_gate):
+            plate = f'G{gate_id:02d}C{n:05d}'
+            start = time.perf_counter()
+            record_car(plate, n % 50 + 1, datetime.now().isoformat())
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=gate, args=(i,)) for i in range(gates)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def per_call(plate, slot_id, now):
+    insert_records.add_vehicle(plate, 'Car', 'Student', now, slot_id)
+    insert_records.add_parking_session(plate, slot_id, 'A', now)
+
+
+def report(name, elapsed, latencies):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:>12}: {len(latencies) / elapsed:8.0f} cars/s, "
+          f"p50 {statistics.median(latencies) * 1000:6.2f} ms, p99 {p99 * 1000:6.2f} ms")
+
+
+def main():
+    gates = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    cars_per_gate = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'per_call.db'))
+        initialize_database()
+        report('per-call', *run_gates(gates, cars_per_gate, per_call))
+
+        repo.set_path(os.path.join(tmp, 'group.db'))
+        initialize_database()
+        with GroupCommitWriter() as writer:
+            def grouped(plate, slot_id, now):
+                vehicle = writer.add_vehicle(plate, 'Car', 'Student', now, slot_id)
+                session = writer.add_parking_session(plate, slot_id, 'A', now)
+                vehicle.result()
+                session.result()
+            elapsed, latencies = run_gates(gates, cars_per_gate, grouped)
+        report('group-commit', elapsed, latencies)
+        print(f"{writer.writes} writes in {writer.batches} commits "
+              f"({writer.writes / max(writer.batches, 1):.1f} per commit)")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
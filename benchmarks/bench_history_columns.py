@@ -0,0 +1,106 @@
+"""
+Benchmark: duration statistics and per-zone histograms over six months of
+parking history, from fetchall() rows versus the memory-mapped columns
+(database/history_columns.py).
+
+Fills parking_history with a year of sessions in three zones, times the
+initial mirror and an incremental refresh, then computes count, mean and
+p95 stay per zone plus hourly-bucket histograms both ways. Run from the
+repository root:
+
+    python -m benchmarks.bench_history_columns [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.history_columns import history_columns, duration_stats, zone_duration_histograms
+from benchmarks.bench_daily_rollup import fill_history
+from utils import to_epoch
+
+DAYS = 365
+BINS = list(range(0, 601, 60))
+
+
+def from_rows(start, end):
+    # the pre-cache way: rows into dicts, then Python per zone
+    cursor = repo.cursor()
+    cursor.execute('''
+        SELECT vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
+        FROM parking_history
+        WHERE entry_ts >= ? AND entry_ts < ? AND duration_min IS NOT NULL
+    ''', (to_epoch(start), to_epoch(end)))
+    columns = ['vehicle_num', 'slot_id', 'zone', 'entry_time', 'exit_time', 'duration_min']
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    by_zone = {}
+    for row in rows:
+        by_zone.setdefault(row['zone'], []).append(row['duration_min'])
+    stats, histograms = {}, {}
+    for zone, durations in by_zone.items():
+        durations.sort()
+        stats[zone] = (len(durations), sum(durations) / len(durations))
+        counts = [0] * (len(BINS) - 1)
+        for duration in durations:
+            counts[min(duration // 60, len(counts) - 1)] += 1
+        histograms[zone] = counts
+    return stats, histograms
+
+
+def from_columns(start, end):
+    stats = {zone: duration_stats(start, end, zone) for zone in ('A', 'B', 'C')}
+    return ({zone: (s['count'], s['mean']) for zone, s in stats.items()},
+            zone_duration_histograms(BINS, start, end))
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'history.db'))
+        initialize_database()
+
+        now = int(time.time())
+        step = DAYS * 86400 // total
+        fill_history(total - 10000, now - step * total, step)
+
+        begin = time.perf_counter()
+        history_columns.refresh()
+        print(f"initial mirror of {total - 10000:,} sessions: {time.perf_counter() - begin:.1f} s")
+        with repo.transaction() as conn:
+            conn.execute('''
+                INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time, exit_time,
+                                             duration_min, entry_ts, exit_ts)
+                SELECT vehicle_num, slot_id, zone, entry_time, exit_time, duration_min,
+                       entry_ts + 10000 * ?, exit_ts + 10000 * ?
+                FROM parking_history ORDER BY id DESC LIMIT 10000
+            ''', (step, step))
+        begin = time.perf_counter()
+        history_columns.refresh()
+        print(f"refresh after 10,000 new sessions: {(time.perf_counter() - begin) * 1000:.0f} ms")
+
+        end = datetime.now() - timedelta(days=7)
+        start = end - timedelta(days=182)
+        begin = time.perf_counter()
+        row_stats, row_histograms = from_rows(start, end)
+        rows_s = time.perf_counter() - begin
+        from_columns(start, end)
+        begin = time.perf_counter()
+        column_stats, column_histograms = from_columns(start, end)
+        columns_s = time.perf_counter() - begin
+
+        assert row_stats.keys() == column_stats.keys()
+        for zone in row_stats:
+            assert row_stats[zone][0] == column_stats[zone][0]
+            assert abs(row_stats[zone][1] - column_stats[zone][1]) < 1e-6
+            assert list(row_histograms[zone]) == list(column_histograms[zone])
+        print(f"six months, stats + histograms for 3 zones ({sum(c for c, _ in row_stats.values()):,} sessions): "
+              f"rows {rows_s * 1000:.0f} ms, columns {columns_s * 1000:.1f} ms ({rows_s / columns_s:,.0f}x)")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
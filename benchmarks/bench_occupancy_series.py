@@ -0,0 +1,91 @@
+"""
+Benchmark: "how full was zone B at 9am on weekdays over the last year",
+answered by replaying parking_history versus from the hourly occupancy
+series (database/occupancy.py, migration 10).
+
+Fills parking_history with a year of sessions in three zones, times the
+replay that builds the series for existing history, then answers the
+question both ways and checks that they agree. Run from the repository
+root:
+
+    python -m benchmarks.bench_occupancy_series [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.occupancy import get_occupancy_series, rebuild_occupancy_series, hour_start
+
+DAYS = 365
+
+
+def fill_history(total, start, step):
+    with repo.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+            INSERT INTO parking_history
+                (vehicle_num, slot_id, zone, entry_time, exit_time, duration_min, entry_ts, exit_ts)
+            SELECT printf('BENCH%05d', i % 20000), i % 100 + 1, char(65 + i % 3), '', '',
+                   i * 7919 % 600, ? + i * ?, ? + i * ? + (i * 7919 % 600) * 60
+            FROM n
+        ''', (total, start, step, start, step))
+
+
+def nine_am_weekdays(first, stop):
+    hours = np.arange(first, stop, 3600)
+    local = [datetime.fromtimestamp(int(hour)) for hour in hours]
+    return hours[[moment.hour == 9 and moment.weekday() < 5 for moment in local]]
+
+
+def from_history(zone, moments):
+    # occupancy at each moment: sessions entered at or before it and not yet left
+    rows = np.array(repo.fetchall('SELECT entry_ts, exit_ts FROM parking_history WHERE zone = ?',
+                                  (zone,)), dtype=np.float64)
+    entries = np.sort(rows[:, 0])
+    exits = np.sort(np.nan_to_num(rows[:, 1], nan=np.inf))
+    return np.searchsorted(entries, moments, 'right') - np.searchsorted(exits, moments, 'right')
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'occupancy.db'))
+        initialize_database()
+
+        now = int(time.time())
+        step = DAYS * 86400 // total
+        fill_history(total, now - step * total, step)
+
+        begin = time.perf_counter()
+        rebuild_occupancy_series()
+        rows = repo.fetchvalue('SELECT COUNT(*) FROM occupancy_hourly')
+        print(f"replay of {total:,} sessions into the series: {time.perf_counter() - begin:.1f} s "
+              f"({rows:,} zone-hours)")
+
+        first, stop = hour_start(now - DAYS * 86400), hour_start(now - 86400)
+        moments = nine_am_weekdays(first, stop)
+
+        begin = time.perf_counter()
+        replayed = from_history('B', moments)
+        history_s = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        series = get_occupancy_series('B', first, stop)
+        opening = np.concatenate(([series['close'][0]], series['close'][:-1]))
+        at_nine = opening[np.searchsorted(series['hour'], moments)]
+        series_s = time.perf_counter() - begin
+
+        assert np.array_equal(replayed, at_nine), (replayed[:10], at_nine[:10])
+        print(f"zone B at 9am on {len(moments)} weekdays: history replay {history_s * 1000:.0f} ms, "
+              f"series {series_s * 1000:.1f} ms ({history_s / series_s:,.0f}x); "
+              f"mean {at_nine.mean():.1f} occupied")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: per-keystroke plate suggestions (database/plate_search.py) over a
+large vehicles_master table.
+
+Loads synthetic historical plates, parks a few hundred of them, then types
+plates one character at a time, including misread ones (O/0, B/8 swaps and
+a wrong character), and reports suggestion latency per keystroke. Run from
+the repository root:
+
+    python -m benchmarks.bench_plate_search [historical_plates]
+"""
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.initialize_slots import seed_slots
+from parking_logic import allocator
+from database import update_records
+from database.plate_search import suggest_plates
+
+STATES = ['MH', 'KA', 'DL', 'TN', 'GJ', 'UP', 'RJ', 'AP', 'KL', 'WB']
+
+
+def random_plate(rng):
+    return (f"{rng.choice(STATES)}{rng.randint(1, 50):02d}"
+            f"{rng.choice(string.ascii_uppercase)}{rng.choice(string.ascii_uppercase)}{rng.randint(1, 9999):04d}")
+
+
+def misread(plate, rng):
+    swaps = {'0': 'O', 'O': '0', '8': 'B', 'B': '8', '1': 'I'}
+    chars = list(plate)
+    i = rng.randrange(len(chars))
+    chars[i] = swaps.get(chars[i], rng.choice(string.ascii_uppercase + string.digits))
+    return ''.join(chars)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'plates.db'))
+        initialize_database()
+        seed_slots({'A': {'count': 500}}, top_up=True)
+        allocator.load()
+
+        start = time.perf_counter()
+        plates = list({random_plate(rng) for _ in range(total)})
+        # one INSERT ... SELECT per chunk: the plate_index trigger's FTS5 writes
+        # slow down badly when a single transaction runs many separate statements
+        with repo.transaction() as conn:
+            for i in range(0, len(plates), 100_000):
+                conn.execute('''
+                    INSERT INTO vehicles_master (vehicle_number, vehicle_type, category, first_entry)
+                    SELECT value, 'Car', 'Student', '2024-01-01T08:00:00' FROM json_each(?)
+                ''', (json.dumps(plates[i:i + 100_000]),))
+        print(f"indexed {len(plates):,} historical plates in {time.perf_counter() - start:.1f} s")
+        for plate in rng.sample(plates, 300):
+            update_records.park_vehicle(plate, 'Car', 'Student', 'A')
+
+        latencies, found = [], [0, 0]
+        targets = rng.sample(plates, 300)
+        for n, plate in enumerate(targets):
+            typed = misread(plate, rng) if n % 2 else plate
+            for end in range(1, len(typed) + 1):
+                start = time.perf_counter()
+                suggestions = suggest_plates(typed[:end])
+                latencies.append(time.perf_counter() - start)
+            found[n % 2] += plate in [s['plate'] for s in suggestions]
+
+        latencies.sort()
+        print(f"{len(latencies)} keystrokes: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms")
+        print(f"intended plate suggested for {found[0]} of {len(targets) // 2} typed correctly, "
+              f"{found[1]} of {len(targets) // 2} misread")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
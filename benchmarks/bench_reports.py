@@ -0,0 +1,61 @@
+"""
+Benchmark: recomputing a year of peak-hour heatmaps and dwell-time
+percentiles (reports.build_report) from the memory-mapped history columns.
+
+Fills parking_history with a year of sessions in three zones and three
+categories, mirrors it once, then times build_report() with the mirror up
+to date, which is what the dashboard's Reports tab pays per refresh. Run
+from the repository root:
+
+    python -m benchmarks.bench_reports [sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.history_columns import history_columns
+from benchmarks.bench_daily_rollup import fill_history
+import reports
+
+DAYS = 365
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'reports.db'))
+        initialize_database()
+
+        now = int(time.time())
+        step = DAYS * 86400 // total
+        fill_history(total, now - step * total, step)
+        with repo.transaction() as conn:
+            conn.execute('''
+                INSERT INTO vehicles_master (vehicle_number, vehicle_type, category, first_entry)
+                SELECT DISTINCT vehicle_num, 'Car',
+                       CASE CAST(substr(vehicle_num, 6) AS INTEGER) % 3
+                           WHEN 0 THEN 'Student' WHEN 1 THEN 'Faculty' ELSE 'VIP' END,
+                       '2024-01-01T00:00:00'
+                FROM parking_history
+            ''')
+
+        begin = time.perf_counter()
+        history_columns.refresh()
+        print(f"mirror of {total:,} sessions: {time.perf_counter() - begin:.1f} s")
+
+        timings = []
+        for _ in range(5):
+            begin = time.perf_counter()
+            report = reports.build_report()
+            timings.append(time.perf_counter() - begin)
+        print(f"build_report over {DAYS} days ({int(report['arrivals'].sum()):,} arrivals, "
+              f"{len(report['dwell'])} dwell rows): best {min(timings) * 1000:.0f} ms, "
+              f"worst {max(timings) * 1000:.0f} ms")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
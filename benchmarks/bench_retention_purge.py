@@ -0,0 +1,117 @@
+"""
+Benchmark: gate latency while old parking history is purged, single DELETE
+versus the batched retention purge (database/retention.py).
+
+Fills parking_history with sessions spread over three years, then on two
+copies of that database runs park/exit cycles from gate threads while
+one year's retention is enforced, first with the old single DELETE and
+then with purge_history(). Reports park/exit latency percentiles (the
+gate transaction waits for the write lock) and the purge time, and fails
+if the purge leaves gate p99 above PURGE_TARGET_MS. Run from the
+repository root:
+
+    python -m benchmarks.bench_retention_purge [sessions] [gates]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from database.repository import repo
+from database.create_tables import initialize_database
+from parking_logic import allocator
+from database import update_records
+from database.retention import purge_history, PURGE_TARGET_MS
+from utils import to_epoch
+
+DAYS = 3 * 365
+RETENTION_DAYS = 365
+
+
+def fill_history(total):
+    start = to_epoch(datetime.now() - timedelta(days=DAYS))
+    step = DAYS * 86400 // total
+    with repo.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+            INSERT INTO parking_history
+                (vehicle_num, slot_id, zone, entry_time, exit_time, duration_min, entry_ts, exit_ts)
+            SELECT printf('OLD%06d', i % 50000), i % 100 + 1, 'A',
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ?, 'unixepoch', 'localtime'),
+                   strftime('%Y-%m-%dT%H:%M:%S', ? + i * ? + 3600, 'unixepoch', 'localtime'),
+                   60, ? + i * ?, ? + i * ? + 3600
+            FROM n
+        ''', (total, start, step, start, step, start, step, start, step))
+
+
+def gate(number, stop, latencies):
+    plate = f'GATE{number:02d}'
+    while not stop.is_set():
+        for call in (lambda: update_records.park_vehicle(plate, 'Car', 'Student', 'A'),
+                     lambda: update_records.exit_vehicle(plate)):
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+        time.sleep(0.002)
+
+
+def run(path, gates, purge):
+    repo.set_path(path)
+    allocator.load()
+    stop, latencies = threading.Event(), []
+    threads = [threading.Thread(target=gate, args=(n, stop, latencies)) for n in range(gates)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    latencies.clear()
+    started = time.perf_counter()
+    deleted = purge()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    repo.close()
+    latencies.sort()
+    return deleted, elapsed, latencies
+
+
+def single_delete():
+    cutoff = to_epoch(datetime.now() - timedelta(days=RETENTION_DAYS))
+    with repo.transaction(immediate=True) as conn:
+        return conn.execute('DELETE FROM parking_history WHERE exit_ts IS NOT NULL AND exit_ts < ?',
+                            (cutoff,)).rowcount
+
+
+def report(name, deleted, elapsed, latencies):
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{name:>16}: {deleted:,} deleted in {elapsed:6.2f} s | {len(latencies):,} gate calls, "
+          f"p50 {pct(0.5):6.1f} ms, p99 {pct(0.99):7.1f} ms, max {latencies[-1] * 1000:7.1f} ms")
+    return pct(0.99)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    gates = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'base.db')
+        repo.set_path(base)
+        initialize_database()
+        begin = time.perf_counter()
+        fill_history(total)
+        repo.execute('ANALYZE')
+        repo.close()
+        print(f"filled {total:,} sessions over {DAYS} days in {time.perf_counter() - begin:.1f} s")
+        for name in ('delete.db', 'purge.db'):
+            shutil.copy(base, os.path.join(tmp, name))
+
+        report('single DELETE', *run(os.path.join(tmp, 'delete.db'), gates, single_delete))
+        p99 = report('purge_history', *run(os.path.join(tmp, 'purge.db'), gates,
+                                           lambda: purge_history(RETENTION_DAYS)['deleted']))
+        assert p99 <= PURGE_TARGET_MS, f"gate p99 {p99:.1f} ms during the purge, target {PURGE_TARGET_MS} ms"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: layout-driven slot seeding (database/initialize_slots.py) versus
+the old one-execute-per-slot loop, on a fresh database.
+
+Seeds a lot of the given size split 50/30/20 over zones A/B/C, then runs the
+seeder a second time to show it is idempotent. Run from the repository root:
+
+    python -m benchmarks.bench_seed_slots [slots]
+"""
+import os
+import sys
+import tempfile
+import time
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.initialize_slots import seed_slots
+
+
+def one_by_one(layout):
+    with repo.transaction() as conn:
+        for zone, spec in layout.items():
+            for _ in range(spec['count']):
+                conn.execute('INSERT INTO slots (zone, is_occupied) VALUES (?, ?)', (zone, 0))
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    layout = {
+        'A': {'count': total // 2, 'types': ('Car', 'Bike'), 'locations': ('North', 'South')},
+        'B': {'count': total * 3 // 10, 'types': ('Car', 'EV')},
+        'C': {'count': total - total // 2 - total * 3 // 10},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'loop.db'))
+        initialize_database()
+        repo.execute('DELETE FROM slots')
+        start = time.perf_counter()
+        one_by_one(layout)
+        print(f"execute per slot: {time.perf_counter() - start:6.2f} s for {total:,} slots")
+
+        repo.set_path(os.path.join(tmp, 'seed.db'))
+        initialize_database()
+        repo.execute('DELETE FROM slots')
+        start = time.perf_counter()
+        seeded = seed_slots(layout)
+        print(f"     seed_slots: {time.perf_counter() - start:6.2f} s for {sum(seeded.values()):,} slots")
+        start = time.perf_counter()
+        again = seed_slots(layout, top_up=True)
+        print(f"   second run: {time.perf_counter() - start:6.2f} s, {sum(again.values())} slots added")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark: free-slot allocation cost versus lot size.
+
+Compares the in-memory AllocationEngine with the SQL lookup park_vehicle used
+before (SELECT ... WHERE zone=? AND is_occupied=0 LIMIT 1 on an unindexed
+slots table). Run from the repository root:
+
+    python -m benchmarks.bench_slot_allocator
+"""
+import random
+import sqlite3
+import time
+from parking_logic import AllocationEngine
+
+LOT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+OCCUPANCY = 0.95
+ALLOCATOR_OPS = 20_000
+SQL_OPS = 200
+
+
+def build_rows(n_slots, seed=7):
+    rng = random.Random(seed)
+    # one big zone so the lookup has to cover the whole lot
+    return [(slot_id, 'A', 1 if rng.random() < OCCUPANCY else 0, None, None) for slot_id in range(1, n_slots + 1)]
+
+
+def bench_allocator(rows):
+    allocator = AllocationEngine()
+    allocator.load(rows)
+    # strategy indexes are built on first use; keep that out of the timing
+    allocator.peek('A')
+    allocator.peek('A', prefer_corner=True)
+    start = time.perf_counter()
+    for i in range(ALLOCATOR_OPS):
+        slot_id = allocator.allocate('A', prefer_corner=(i % 2 == 1))
+        allocator.release('A', slot_id)
+    return (time.perf_counter() - start) / ALLOCATOR_OPS
+
+
+def bench_sql_scan(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''CREATE TABLE slots (slot_id INTEGER PRIMARY KEY AUTOINCREMENT, zone TEXT NOT NULL,
+                    is_occupied BOOLEAN NOT NULL DEFAULT 0, vehicle_num TEXT, entry_time DATETIME)''')
+    conn.executemany('INSERT INTO slots (slot_id, zone, is_occupied) VALUES (?, ?, ?)', [row[:3] for row in rows])
+    # occupy the front of the lot, as happens during the day
+    conn.execute('UPDATE slots SET is_occupied = 1 WHERE slot_id <= ?', (len(rows) // 2,))
+    start = time.perf_counter()
+    for _ in range(SQL_OPS):
+        conn.execute('SELECT slot_id FROM slots WHERE zone=? AND is_occupied=0 LIMIT 1', ('A',)).fetchone()
+    elapsed = (time.perf_counter() - start) / SQL_OPS
+    conn.close()
+    return elapsed
+
+
+def main():
+    print(f"{'slots':>10} {'allocator us/op':>16} {'SQL scan us/op':>15}")
+    for n_slots in LOT_SIZES:
+        rows = build_rows(n_slots)
+        alloc_us = bench_allocator(rows) * 1e6
+        sql_us = bench_sql_scan(rows) * 1e6
+        print(f"{n_slots:>10} {alloc_us:>16.2f} {sql_us:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
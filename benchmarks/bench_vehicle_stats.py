@@ -0,0 +1,135 @@
+"""
+Benchmark: a vehicle's profile (visits, mean and spread of its stays,
+last visit, favourite zone) computed from its history versus read from the
+running aggregates on vehicles_master (database/vehicle_stats.py,
+migration 11).
+
+Fills parking_history with a year of sessions for 20,000 vehicles, times
+the bulk backfill, then closes the last sessions one exit at a time with
+and without the trigger that maintains the aggregates, and checks that
+the trigger's running values agree with a fresh backfill. Run from the
+repository root:
+
+    python -m benchmarks.bench_vehicle_stats [sessions]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from database.repository import repo
+from database.create_tables import initialize_database
+from database.fetch_records import get_vehicle_history_page
+from database.vehicle_stats import rebuild_vehicle_stats, get_vehicle_stats
+from benchmarks.bench_daily_rollup import fill_history
+
+DAYS = 365
+VEHICLES = 20000
+
+# sessions at the end of the history closed one at a time (fewer than
+# VEHICLES, so no vehicle has two of them open)
+EXITS = 2000
+
+STATS = 'SELECT vehicle_number, visits, avg_duration, duration_m2, last_visit, favourite_zone FROM vehicles_master'
+
+
+def reopen(sessions):
+    with repo.transaction() as conn:
+        conn.executemany('UPDATE parking_history SET exit_time = NULL, exit_ts = NULL, duration_min = NULL '
+                         'WHERE id = ?', [(row[0],) for row in sessions])
+
+
+def close_one_by_one(sessions):
+    # the UPDATE exit_vehicle() runs, one write transaction per exit
+    timings = []
+    for _, vehicle, exit_time, exit_ts, duration in sessions:
+        begin = time.perf_counter()
+        with repo.transaction(immediate=True) as conn:
+            conn.execute('''
+                UPDATE parking_history SET exit_time = ?, exit_ts = ?, duration_min = ?
+                WHERE vehicle_num = ? AND exit_time IS NULL
+            ''', (exit_time, exit_ts, duration, vehicle))
+        timings.append(time.perf_counter() - begin)
+    return statistics.mean(timings) * 1e6
+
+
+def from_history(vehicle):
+    # what a profile took before: page through the vehicle's sessions
+    durations, zones, last_visit, after = [], Counter(), None, None
+    while True:
+        page = get_vehicle_history_page(vehicle, after=after)
+        for row in page['rows']:
+            durations.append(row['duration_min'])
+            zones[row['zone']] += 1
+            last_visit = max(last_visit or row['exit_time'], row['exit_time'])
+        after = page['next']
+        if not after:
+            break
+    return len(durations), statistics.mean(durations), statistics.stdev(durations), last_visit, zones
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo.set_path(os.path.join(tmp, 'vehicle_stats.db'))
+        initialize_database()
+
+        now = int(time.time())
+        step = DAYS * 86400 // total
+        fill_history(total, now - step * total, step)
+        with repo.transaction() as conn:
+            conn.execute('''
+                INSERT INTO vehicles_master (vehicle_number, vehicle_type, category, first_entry)
+                SELECT DISTINCT vehicle_num, 'Car', 'Staff', '' FROM parking_history
+            ''')
+        sessions = repo.fetchall('''
+            SELECT id, vehicle_num, exit_time, exit_ts, duration_min FROM parking_history
+            ORDER BY id DESC LIMIT ?
+        ''', (EXITS,))
+        sessions.sort(key=lambda row: (row[3], row[0]))
+        reopen(sessions)
+
+        begin = time.perf_counter()
+        rebuild_vehicle_stats()
+        print(f"backfill of {total - EXITS:,} sessions for {VEHICLES:,} vehicles: "
+              f"{time.perf_counter() - begin:.1f} s")
+
+        with_trigger = close_one_by_one(sessions)
+        running = {row[0]: row[1:] for row in repo.fetchall(STATS)}
+        rebuild_vehicle_stats()
+        rebuilt = {row[0]: row[1:] for row in repo.fetchall(STATS)}
+        for vehicle, (visits, mean, m2, last_visit, favourite) in rebuilt.items():
+            have = running[vehicle]
+            assert (have[0], have[3], have[4]) == (visits, last_visit, favourite), (vehicle, have, rebuilt[vehicle])
+            assert abs(have[1] - mean) < 1e-9 * max(1, mean) and abs(have[2] - m2) < 1e-9 * max(1, m2), \
+                (vehicle, have, rebuilt[vehicle])
+
+        reopen(sessions)
+        repo.execute('DROP TRIGGER trg_history_close_vehicle_stats')
+        without_trigger = close_one_by_one(sessions)
+        print(f"closing a session: {with_trigger:.0f} us with the running stats, "
+              f"{without_trigger:.0f} us without; running stats match a fresh backfill")
+
+        sample = random.Random(1).sample(sorted(rebuilt), 50)
+        begin = time.perf_counter()
+        scanned = [from_history(vehicle) for vehicle in sample]
+        history_s = (time.perf_counter() - begin) / len(sample)
+        begin = time.perf_counter()
+        stored = [get_vehicle_stats(vehicle) for vehicle in sample]
+        stats_s = (time.perf_counter() - begin) / len(sample)
+
+        for (visits, mean, stdev, last_visit, zones), stats in zip(scanned, stored):
+            assert visits == stats['visits'] and dict(zones) == stats['zone_visits']
+            assert abs(mean - stats['avg_duration_min']) < 1e-9 * mean
+            assert abs(stdev - stats['stddev_duration_min']) < 1e-6 * stdev
+            assert last_visit == stats['last_visit']
+        print(f"profile of a vehicle with ~{total // VEHICLES} visits: history {history_s * 1000:.1f} ms, "
+              f"running stats {stats_s * 1000:.3f} ms ({history_s / stats_s:,.0f}x)")
+        repo.close()
+
+
+if __name__ == '__main__':
+    main()
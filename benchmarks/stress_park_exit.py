@@ -0,0 +1,112 @@
+"""
+Multi-process stress test for the park/exit engine in database/update_records.py.
+
+Several processes act as gate terminals on one shared database file. Each
+one parks and exits vehicles in a small zone, so they constantly compete
+for the same slots and the write lock. Afterwards the database is checked
+for double allocations and inconsistent rows, and sustained entries per
+second are reported. Run from the repository root:
+
+    python -m benchmarks.stress_park_exit [terminals] [seconds]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from database.repository import repo
+from database.create_tables import initialize_database
+from database import update_records
+
+ZONE = 'A'
+
+
+def terminal(db_path, terminal_id, seconds, results):
+    repo.set_path(db_path)
+    rng = random.Random(terminal_id)
+    parked = []
+    counts = {'parked': 0, 'exited': 0, 'no_slot': 0, 'already_parked': 0, 'error': 0, 'not_found': 0}
+    deadline = time.monotonic() + seconds
+    n = 0
+    while time.monotonic() < deadline:
+        if parked and (rng.random() < 0.45 or len(parked) > 20):
+            plate = parked.pop(rng.randrange(len(parked)))
+            status = update_records.exit_vehicle(plate)['status']
+        else:
+            n += 1
+            plate = f'T{terminal_id:02d}V{n:06d}'
+            status = update_records.park_vehicle(plate, 'Car', 'Student', ZONE)['status']
+            if status == 'parked':
+                parked.append(plate)
+        counts[status] += 1
+    results.put(counts)
+
+
+def check_consistency():
+    """
+    Return a list of invariant violations (empty when the data is consistent)
+    """
+    problems = []
+    doubles = repo.fetchall('''
+        SELECT slot_id, COUNT(*) FROM active_vehicles GROUP BY slot_id HAVING COUNT(*) > 1
+    ''')
+    if doubles:
+        problems.append(f"slots held by more than one vehicle: {doubles}")
+    mismatched = repo.fetchvalue('''
+        SELECT COUNT(*) FROM active_vehicles av
+        LEFT JOIN slots s ON s.slot_id = av.slot_id
+        WHERE s.is_occupied IS NOT 1 OR s.vehicle_num IS NOT av.vehicle_number
+    ''')
+    if mismatched:
+        problems.append(f"{mismatched} active vehicles do not match their slot row")
+    occupied, active, open_sessions = repo.fetchone('''
+        SELECT (SELECT COUNT(*) FROM slots WHERE is_occupied = 1),
+               (SELECT COUNT(*) FROM active_vehicles),
+               (SELECT COUNT(*) FROM parking_history WHERE exit_time IS NULL)
+    ''')
+    if not occupied == active == open_sessions:
+        problems.append(f"occupied={occupied} active={active} open sessions={open_sessions}")
+    return problems
+
+
+def main():
+    terminals = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.db')
+        repo.set_path(db_path)
+        initialize_database()
+        repo.close()
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        workers = [ctx.Process(target=terminal, args=(db_path, i, seconds, results))
+                   for i in range(terminals)]
+        for w in workers:
+            w.start()
+        totals = {}
+        for _ in workers:
+            for status, count in results.get().items():
+                totals[status] = totals.get(status, 0) + count
+        for w in workers:
+            w.join()
+
+        repo.set_path(db_path)
+        problems = check_consistency()
+        repo.close()
+
+    print(f"{terminals} terminals for {seconds:.0f}s: {totals}")
+    print(f"sustained entries/s: {totals['parked'] / seconds:.1f}, "
+          f"exits/s: {totals['exited'] / seconds:.1f}")
+    if problems:
+        print("INCONSISTENT:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("zero double allocations; slots, active_vehicles and open sessions agree")
+
+
+if __name__ == '__main__':
+    main()
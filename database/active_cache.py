@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# Plates kept; a lot's worth of parked cars plus recent lookups of cars
+# that are not parked fit comfortably
+ACTIVE_CACHE_SIZE = 4096
+
+
+class ActiveVehicleCache:
+    """
+    LRU cache of active_vehicles rows by plate.
+
+    Misses load the row from the database; "not parked" is cached too, since
+    the entry gate mostly looks up cars that are not inside. The least
+    recently used plate is evicted once max_size plates are cached.
+
+    Writers call invalidate(plate) after their commit, and the dashboard
+    calls clear() when the change monitor reports that another terminal
+    wrote active_vehicles. A load that was already running when an
+    invalidation happened is not stored, so it cannot put stale data back.
+    """
+
+    def __init__(self, max_size=ACTIVE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self, vehicle_number):
+        row = repo.fetchone('''
+            SELECT slot_id, zone, entry_time
+            FROM active_vehicles
+            WHERE vehicle_number = ?
+        ''', (vehicle_number,))
+        if row is None:
+            return None
+        return {'slot_id': row[0], 'zone': row[1], 'entry_time': row[2]}
+
+    def get(self, vehicle_number):
+        """
+        Return the vehicle's active row as a dict, or None when it is not parked
+        """
+        with self._lock:
+            if vehicle_number in self._entries:
+                self._entries.move_to_end(vehicle_number)
+                self.hits += 1
+                info = self._entries[vehicle_number]
+                return dict(info) if info is not None else None
+            self.misses += 1
+            generation = self._generation
+
+        info = self._load(vehicle_number)
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[vehicle_number] = info
+                self._entries.move_to_end(vehicle_number)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return dict(info) if info is not None else None
+
+    def invalidate(self, vehicle_number):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(vehicle_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+# shared instance used by fetch_records and invalidated by every writer of active_vehicles
+active_cache = ActiveVehicleCache()
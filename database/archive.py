@@ -0,0 +1,169 @@
+import glob
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from utils import setup_logging
+import logging
+from database.repository import repo
+from database.retention import run_history_batches, PURGE_TARGET_MS
+
+# Closed sessions older than the archive age move out of parking_history
+# into one SQLite file per entry month, <db name>_archive/history_YYYY-MM.db
+# beside the live database, so the live table (and its page cache) only
+# holds recent months. Rows are copied in the same rowid batches as the
+# retention purge, each batch written to its partitions before it is
+# deleted from the live table; a batch repeated after a crash is ignored
+# by id. Archived rows keep the vehicle type and category they had when
+# archived, so a partition is readable on its own.
+
+# sessions that exited longer ago than this are archived
+ARCHIVE_AFTER_DAYS = 180
+
+ARCHIVE_DIR_SUFFIX = '_archive'
+PARTITION_PREFIX = 'history_'
+
+PARTITION_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS parking_history (
+           id INTEGER PRIMARY KEY,
+           vehicle_num TEXT NOT NULL,
+           vehicle_type TEXT,
+           category TEXT,
+           slot_id INTEGER NOT NULL,
+           zone TEXT NOT NULL,
+           entry_time DATETIME NOT NULL,
+           exit_time DATETIME,
+           duration_min INTEGER,
+           entry_ts INTEGER,
+           exit_ts INTEGER
+       )''',
+    # get_vehicle_history and get_history_page, newest first
+    '''CREATE INDEX IF NOT EXISTS idx_history_vehicle_entry
+       ON parking_history (vehicle_num, entry_time, id)''',
+    '''CREATE INDEX IF NOT EXISTS idx_history_entry
+       ON parking_history (entry_time, id)''',
+    # get_parking_history_data: one day by entry_ts
+    '''CREATE INDEX IF NOT EXISTS idx_history_entry_ts
+       ON parking_history (entry_ts)''',
+]
+
+
+class HistoryArchive:
+    """
+    Monthly partition files of archived parking_history rows.
+
+    Keeps one connection per thread and partition, like the repository does
+    for the live database; close() closes them all.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def directory(self):
+        """
+        Archive directory of the database the repository points at
+        """
+        return os.path.splitext(repo.db_path)[0] + ARCHIVE_DIR_SUFFIX
+
+    def _path(self, month):
+        return os.path.join(self.directory(), f'{PARTITION_PREFIX}{month}.db')
+
+    def months(self):
+        """
+        Archived months ('YYYY-MM'), newest first
+        """
+        names = glob.glob(os.path.join(glob.escape(self.directory()), f'{PARTITION_PREFIX}*.db'))
+        return sorted((os.path.basename(name)[len(PARTITION_PREFIX):-3] for name in names),
+                      reverse=True)
+
+    def _connection(self, month):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        path = self._path(month)
+        conn = connections.get(path)
+        if conn is None:
+            os.makedirs(self.directory(), exist_ok=True)
+            conn = sqlite3.connect(path)
+            for statement in PARTITION_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            with self._lock:
+                self._connections.append(conn)
+            connections[path] = conn
+        return conn
+
+    def fetch(self, month, sql, params=()):
+        """
+        Run a read against one month's partition
+        """
+        return self._connection(month).execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+    def _copy_batch(self, conn, start, end, cutoff):
+        # the same rows the batch DELETE that follows removes
+        rows = conn.execute('''
+            SELECT ph.id, ph.vehicle_num, vm.vehicle_type, vm.category, ph.slot_id, ph.zone,
+                   ph.entry_time, ph.exit_time, ph.duration_min, ph.entry_ts, ph.exit_ts
+            FROM parking_history ph
+            LEFT JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
+            WHERE ph.id >= ? AND ph.id < ? AND ph.exit_ts IS NOT NULL AND +ph.exit_ts < ?
+        ''', (start, end, cutoff)).fetchall()
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row[6][:7]].append(row)
+        for month, month_rows in by_month.items():
+            partition = self._connection(month)
+            with partition:
+                partition.executemany('''
+                    INSERT OR IGNORE INTO parking_history
+                        (id, vehicle_num, vehicle_type, category, slot_id, zone,
+                         entry_time, exit_time, duration_min, entry_ts, exit_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', month_rows)
+
+    def archive_history(self, days=ARCHIVE_AFTER_DAYS, progress=None, should_stop=None,
+                        target_ms=PURGE_TARGET_MS):
+        """
+        Move closed sessions that exited more than `days` ago into the monthly partitions
+
+        Runs like retention.purge_history (bounded batches, resumable,
+        progress and should_stop callbacks). Returns a dict with 'archived',
+        'batches', 'resumed' and 'complete'.
+        """
+        result = run_history_batches('archive_history', days, self._copy_batch,
+                                     progress, should_stop, target_ms)
+        result['archived'] = result.pop('deleted')
+        return result
+
+
+# single shared instance
+archive = HistoryArchive()
+
+
+if __name__ == '__main__':
+    setup_logging()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+
+    def show(archived, scanned, total):
+        print(f"\r{archived:,} archived, {scanned * 100 // total}% scanned", end='', flush=True)
+
+    try:
+        summary = archive.archive_history(days, progress=show)
+    except KeyboardInterrupt:
+        summary = {'complete': False}
+    print()
+    print(summary if summary['complete'] else 'Stopped; run again to resume')
@@ -3,33 +3,31 @@ import sqlite3
 import hashlib
 from utils import setup_logging
 import logging
+from database.repository import repo
 
 def create_default_admin():
     """
     Create default admin user if it doesn't exist
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Create users table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'staff'
-            )
-        ''')
-
-        # Create default admin user (username: admin, password: admin123)
-        admin_password = hashlib.sha256('admin123'.encode()).hexdigest()
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, password_hash, role)
-            VALUES (?, ?, ?)
-        ''', ('admin', admin_password, 'admin'))
-
-        conn.commit()
-        conn.close()
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Create users table if it doesn't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL,
+                    role TEXT NOT NULL DEFAULT 'staff'
+                )
+            ''')
+
+            # Create default admin user (username: admin, password: admin123)
+            admin_password = hashlib.sha256('admin123'.encode()).hexdigest()
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (username, password_hash, role)
+                VALUES (?, ?, ?)
+            ''', ('admin', admin_password, 'admin'))
 
     except Exception as e:
         print(f"Error creating default admin: {e}")
@@ -43,13 +41,11 @@ def authenticate_user(username, password):
         password_hash = hashlib.sha256(password.encode()).hexdigest()
 
         # Check credentials
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        cursor = repo.cursor()
 
         cursor.execute('SELECT role FROM users WHERE username = ? AND password_hash = ?',
                       (username, password_hash))
         result = cursor.fetchone()
-        conn.close()
 
         return result[0] if result else None
 
@@ -64,16 +60,13 @@ def create_user(username, password, role='staff'):
     try:
         password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO users (username, password_hash, role)
-            VALUES (?, ?, ?)
-        ''', (username, password_hash, role))
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO users (username, password_hash, role)
+                VALUES (?, ?, ?)
+            ''', (username, password_hash, role))
         return True
 
     except sqlite3.IntegrityError:
@@ -94,14 +87,11 @@ def change_password(username, old_password, new_password):
         # Hash new password
         new_password_hash = hashlib.sha256(new_password.encode()).hexdigest()
 
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        cursor.execute('UPDATE users SET password_hash = ? WHERE username = ?',
-                      (new_password_hash, username))
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            cursor.execute('UPDATE users SET password_hash = ? WHERE username = ?',
+                          (new_password_hash, username))
         return True
 
     except Exception as e:
@@ -0,0 +1,58 @@
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# How often the GUI asks the monitor for changes
+POLL_INTERVAL_MS = 500
+
+
+class ChangeMonitor:
+    """
+    Cheap detection of committed changes, from this terminal or any other.
+
+    poll() first checks PRAGMA data_version on a dedicated connection. It
+    only moves when another connection committed, and reading it touches no
+    table pages, so polling an idle lot costs next to nothing. When it moves,
+    the trigger-maintained change_counters rows (migration 4) tell which
+    tables were written, and poll() returns those table names.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+
+    def _read_counters(self):
+        return dict(self._conn.execute('SELECT topic, version FROM change_counters'))
+
+    def poll(self):
+        """
+        Return the set of watched tables changed since the previous poll
+        (empty on the first poll, which only records the starting point)
+        """
+        try:
+            if self._conn is None:
+                self._conn = repo.dedicated_connection()
+                self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+                self._versions = self._read_counters()
+                return set()
+
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return set()
+            self._data_version = data_version
+
+            versions = self._read_counters()
+            changed = {topic for topic, version in versions.items()
+                       if self._versions.get(topic) != version}
+            self._versions = versions
+            return changed
+
+        except Exception as e:
+            logging.error(f"Error polling for database changes: {e}")
+            return set()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,74 @@
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# The zone_counters and stat_counters tables (migration 5) are kept up to
+# date by triggers on slots and vehicles_master, so dashboard stats are
+# small reads instead of scans. These functions recount from the base
+# tables to catch and repair any drift (e.g. rows edited with triggers
+# dropped, or a database restored from an old copy).
+
+ZONE_RECOUNT = '''
+    SELECT zone, COUNT(*), COALESCE(SUM(is_occupied), 0) FROM slots GROUP BY zone
+'''
+VEHICLE_RECOUNT = 'SELECT COUNT(*) FROM vehicles_master'
+
+
+def check_counters():
+    """
+    Compare the counters with a full recount; returns a list of differences (empty when consistent)
+    """
+    problems = []
+    with repo.transaction(immediate=False) as conn:
+        # one read transaction, so counters and recount see the same snapshot
+        expected = {zone: (total, occupied) for zone, total, occupied in conn.execute(ZONE_RECOUNT)}
+        stored = {zone: (total, occupied) for zone, total, occupied
+                  in conn.execute('SELECT zone, total, occupied FROM zone_counters')}
+        vehicles = conn.execute(VEHICLE_RECOUNT).fetchone()[0]
+        stored_vehicles = conn.execute(
+            "SELECT value FROM stat_counters WHERE name = 'vehicles'").fetchone()
+
+    for zone in sorted(set(expected) | set(stored)):
+        want = expected.get(zone, (0, 0))
+        have = stored.get(zone, (0, 0))
+        if want != have:
+            problems.append(f"zone {zone}: counters say total={have[0]} occupied={have[1]}, "
+                            f"slots have total={want[0]} occupied={want[1]}")
+    if stored_vehicles is None or stored_vehicles[0] != vehicles:
+        problems.append(f"vehicles: counter says {stored_vehicles[0] if stored_vehicles else None}, "
+                        f"vehicles_master has {vehicles}")
+    return problems
+
+
+def rebuild_counters():
+    """
+    Recompute every counter from the base tables in one transaction
+    """
+    with repo.transaction() as conn:
+        conn.execute('DELETE FROM zone_counters')
+        conn.execute(f'INSERT INTO zone_counters (zone, total, occupied) {ZONE_RECOUNT}')
+        conn.execute(f"INSERT OR REPLACE INTO stat_counters (name, value) SELECT 'vehicles', ({VEHICLE_RECOUNT})")
+
+
+def verify_counters(repair=True):
+    """
+    Check the counters and, if they drifted, rebuild them; returns the differences found
+    """
+    try:
+        problems = check_counters()
+        if problems:
+            logging.warning(f"Occupancy counters drifted: {'; '.join(problems)}")
+            if repair:
+                rebuild_counters()
+                logging.info("Occupancy counters rebuilt")
+        return problems
+
+    except Exception as e:
+        logging.error(f"Error verifying occupancy counters: {e}")
+        return []
+
+
+if __name__ == '__main__':
+    setup_logging()
+    problems = verify_counters()
+    print('\n'.join(problems) if problems else 'Counters match the slots and vehicles_master tables')
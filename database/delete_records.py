@@ -1,27 +1,21 @@
 
-import sqlite3
 from datetime import datetime, timedelta
 from utils import setup_logging
 import logging
+from database.repository import repo
+from parking_logic import allocator
+from database.active_cache import active_cache
+from database.retention import purge_history
 
 def delete_old_history(days=90):
     """
     Delete parking history older than specified days
+
+    Runs the batched, resumable retention purge (retention.purge_history),
+    so gates keep parking while a large backlog is deleted.
     """
     try:
-        cutoff_date = datetime.now() - timedelta(days=days)
-
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            DELETE FROM parking_history 
-            WHERE exit_time IS NOT NULL AND datetime(exit_time) < ?
-        ''', (cutoff_date.isoformat(),))
-
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted_count = purge_history(days)['deleted']
 
         logging.info(f"Deleted {deleted_count} old history records")
         return deleted_count
@@ -35,18 +29,16 @@ def delete_user(username):
     Delete a user account
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
         # Don't delete the admin user
         if username.lower() == 'admin':
             return False
 
-        cursor.execute('DELETE FROM users WHERE username = ?', (username,))
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
 
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            cursor.execute('DELETE FROM users WHERE username = ?', (username,))
+
+            deleted = cursor.rowcount > 0
 
         return deleted
 
@@ -59,34 +51,42 @@ def delete_vehicle_data(vehicle_number):
     Delete all data for a specific vehicle (use with caution)
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Remove from active vehicles if present
-        cursor.execute('DELETE FROM active_vehicles WHERE vehicle_number = ?', 
-                      (vehicle_number,))
-
-        # Remove from vehicle preferences
-        cursor.execute('DELETE FROM vehicle_preferences WHERE vehicle_number = ?', 
-                      (vehicle_number,))
-
-        # Remove from parking history
-        cursor.execute('DELETE FROM parking_history WHERE vehicle_num = ?', 
-                      (vehicle_number,))
-
-        # Remove from vehicles master
-        cursor.execute('DELETE FROM vehicles_master WHERE vehicle_number = ?', 
-                      (vehicle_number,))
-
-        # Free any slots occupied by this vehicle
-        cursor.execute('''
-            UPDATE slots 
-            SET is_occupied = 0, vehicle_num = NULL, entry_time = NULL 
-            WHERE vehicle_num = ?
-        ''', (vehicle_number,))
-
-        conn.commit()
-        conn.close()
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Remove from active vehicles if present
+            cursor.execute('DELETE FROM active_vehicles WHERE vehicle_number = ?', 
+                          (vehicle_number,))
+
+            # Remove from vehicle preferences
+            cursor.execute('DELETE FROM vehicle_preferences WHERE vehicle_number = ?', 
+                          (vehicle_number,))
+
+            # Remove from parking history
+            cursor.execute('DELETE FROM parking_history WHERE vehicle_num = ?', 
+                          (vehicle_number,))
+
+            # Remove from per-zone visit counts
+            cursor.execute('DELETE FROM vehicle_zone_visits WHERE vehicle_number = ?',
+                          (vehicle_number,))
+
+            # Remove from vehicles master
+            cursor.execute('DELETE FROM vehicles_master WHERE vehicle_number = ?', 
+                          (vehicle_number,))
+
+            # Free any slots occupied by this vehicle
+            cursor.execute('SELECT slot_id, zone FROM slots WHERE vehicle_num = ?',
+                          (vehicle_number,))
+            freed_slots = cursor.fetchall()
+            cursor.execute('''
+                UPDATE slots 
+                SET is_occupied = 0, vehicle_num = NULL, entry_time = NULL 
+                WHERE vehicle_num = ?
+            ''', (vehicle_number,))
+
+        for slot_id, zone in freed_slots:
+            allocator.release(zone, slot_id)
+        active_cache.invalidate(vehicle_number)
 
         logging.info(f"Deleted all data for vehicle {vehicle_number}")
         return True
@@ -100,24 +100,28 @@ def cleanup_orphaned_records():
     Clean up orphaned records in database
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Remove active vehicles that don't have slots
-        cursor.execute('''
-            DELETE FROM active_vehicles 
-            WHERE slot_id NOT IN (SELECT slot_id FROM slots)
-        ''')
-
-        # Remove parking history for non-existent vehicles
-        cursor.execute('''
-            DELETE FROM parking_history 
-            WHERE vehicle_num NOT IN (SELECT vehicle_number FROM vehicles_master)
-        ''')
-
-        conn.commit()
-        conn.close()
-
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Remove active vehicles that don't have slots
+            cursor.execute('''
+                DELETE FROM active_vehicles 
+                WHERE slot_id NOT IN (SELECT slot_id FROM slots)
+            ''')
+
+            # Remove parking history for non-existent vehicles
+            cursor.execute('''
+                DELETE FROM parking_history 
+                WHERE vehicle_num NOT IN (SELECT vehicle_number FROM vehicles_master)
+            ''')
+
+            # Remove per-zone visit counts for non-existent vehicles
+            cursor.execute('''
+                DELETE FROM vehicle_zone_visits
+                WHERE vehicle_number NOT IN (SELECT vehicle_number FROM vehicles_master)
+            ''')
+
+        active_cache.clear()
         logging.info("Orphaned records cleaned up")
         return True
 
@@ -132,14 +136,14 @@ def clear_daily_summaries(older_than_days=30):
     try:
         cutoff_date = datetime.now().date() - timedelta(days=older_than_days)
 
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('DELETE FROM daily_summary WHERE date < ?', (cutoff_date,))
 
-        cursor.execute('DELETE FROM daily_summary WHERE date < ?', (cutoff_date,))
+            deleted_count = cursor.rowcount
 
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+            cursor.execute('DELETE FROM daily_duration_hist WHERE date < ?', (cutoff_date,))
 
         logging.info(f"Deleted {deleted_count} old daily summary records")
         return deleted_count
@@ -1,34 +1,34 @@
 
-import sqlite3
-from datetime import datetime, date
-from utils import setup_logging
+from datetime import datetime, date, timedelta
+from utils import setup_logging, to_epoch
 import logging
+from database.repository import repo
+from parking_logic import allocator
+from database.active_cache import active_cache
+from database.archive import archive
+from database.rollups import update_daily_summary, duration_percentile
+
+# rows per history page (get_history_page / get_vehicle_history_page)
+HISTORY_PAGE_SIZE = 200
+
+HISTORY_PAGE_COLUMNS = ['id', 'vehicle_num', 'vehicle_type', 'category', 'slot_id',
+                        'zone', 'entry_time', 'exit_time', 'duration_min']
 
 def get_dashboard_stats():
     """
     Get dashboard statistics
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Get total slots
-        cursor.execute('SELECT COUNT(*) FROM slots')
-        total_slots = cursor.fetchone()[0]
-
-        # Get occupied slots
-        cursor.execute('SELECT COUNT(*) FROM slots WHERE is_occupied = 1')
-        occupied_slots = cursor.fetchone()[0]
+        # Trigger-maintained counters (one row per zone) instead of scans
+        total_slots, occupied_slots, total_vehicles = repo.fetchone('''
+            SELECT COALESCE(SUM(total), 0), COALESCE(SUM(occupied), 0),
+                   COALESCE((SELECT value FROM stat_counters WHERE name = 'vehicles'), 0)
+            FROM zone_counters
+        ''')
 
         # Calculate available slots
         available_slots = total_slots - occupied_slots
 
-        # Get total unique vehicles
-        cursor.execute('SELECT COUNT(DISTINCT vehicle_number) FROM vehicles_master')
-        total_vehicles = cursor.fetchone()[0]
-
-        conn.close()
-
         return {
             'total_slots': total_slots,
             'occupied_slots': occupied_slots,
@@ -50,21 +50,16 @@ def get_zone_stats():
     Get zone-wise statistics
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        cursor = repo.cursor()
 
         cursor.execute('''
-            SELECT zone, 
-                   COUNT(*) as total,
-                   SUM(CASE WHEN is_occupied = 1 THEN 1 ELSE 0 END) as occupied,
-                   SUM(CASE WHEN is_occupied = 0 THEN 1 ELSE 0 END) as available
-            FROM slots 
-            GROUP BY zone
+            SELECT zone, total, occupied, total - occupied as available
+            FROM zone_counters
+            WHERE total > 0
             ORDER BY zone
         ''')
 
         result = cursor.fetchall()
-        conn.close()
         return result
 
     except Exception as e:
@@ -76,61 +71,41 @@ def get_active_vehicles():
     Get currently parked vehicles
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        cursor = repo.cursor()
 
         cursor.execute('''
             SELECT av.vehicle_number, vm.vehicle_type, vm.category, 
                    'Slot ' || av.slot_id || ' (Zone ' || av.zone || ')',
-                   datetime(av.entry_time, 'localtime')
+                   datetime(av.entry_time)
             FROM active_vehicles av
             JOIN vehicles_master vm ON av.vehicle_number = vm.vehicle_number
             ORDER BY av.entry_time DESC
         ''')
 
         result = cursor.fetchall()
-        conn.close()
         return result
 
     except Exception as e:
         logging.error(f"Error getting active vehicles: {e}")
         return []
 
-def find_available_slot(zone, prefer_corner=False, prefer_front=False):
+def find_available_slot(zone, prefer_corner=False, prefer_front=False, strategy=None, vehicle_type=None):
     """
     Find available slot in specified zone
+
+    Served from the in-memory free-slot index instead of scanning the
+    slots table: the slot the named parking_logic strategy would give
+    (DEFAULT_STRATEGY by default). prefer_corner selects 'corner' and
+    prefer_front 'nearest' (lowest id first); corner wins if both are set.
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        if prefer_corner:
-            # Prefer higher slot numbers (corner slots)
-            cursor.execute('''
-                SELECT slot_id FROM slots 
-                WHERE zone = ? AND is_occupied = 0 
-                ORDER BY slot_id DESC LIMIT 1
-            ''', (zone,))
-        elif prefer_front:
-            # Prefer lower slot numbers (front slots)
-            cursor.execute('''
-                SELECT slot_id FROM slots 
-                WHERE zone = ? AND is_occupied = 0 
-                ORDER BY slot_id ASC LIMIT 1
-            ''', (zone,))
-        else:
-            # Default: first available slot
-            cursor.execute('''
-                SELECT slot_id FROM slots 
-                WHERE zone = ? AND is_occupied = 0 
-                LIMIT 1
-            ''', (zone,))
-
-        result = cursor.fetchone()
-        conn.close()
-
-        if result:
-            return {'slot_id': result[0]}
+        if strategy is None and prefer_front and not prefer_corner:
+            strategy = 'nearest'
+        slot_id = allocator.peek(zone, prefer_corner=prefer_corner,
+                                 strategy=strategy, vehicle_type=vehicle_type)
+
+        if slot_id is not None:
+            return {'slot_id': slot_id}
         return None
 
     except Exception as e:
@@ -142,69 +117,122 @@ def is_vehicle_parked(vehicle_number):
     Check if vehicle is currently parked
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT 1 FROM active_vehicles WHERE vehicle_number = ?', 
-                      (vehicle_number,))
-        result = cursor.fetchone()
-        conn.close()
-
-        return result is not None
+        return active_cache.get(vehicle_number) is not None
 
     except Exception as e:
         logging.error(f"Error checking if vehicle is parked: {e}")
         return False
 
-def get_vehicle_history(vehicle_number):
+def get_history_page(after=None, limit=HISTORY_PAGE_SIZE, vehicle_number=None, closed_only=False):
     """
-    Get parking history for a specific vehicle
+    Get one page of parking history, newest entry first
+
+    Keyset pagination: `after` is the cursor returned with the previous
+    page, the (entry_time, id) of its last row. Each page is an index range
+    scan of `limit` rows however far back it starts, instead of an OFFSET
+    that re-reads every row before it. Archived months (database/archive.py)
+    are read after the live table as the page reaches back to them.
+    Returns {'rows': [...], 'next': cursor}, with 'next' None once there
+    are no older rows.
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
-            FROM parking_history 
-            WHERE vehicle_num = ? AND exit_time IS NOT NULL
-            ORDER BY entry_time DESC
-        ''', (vehicle_number,))
+        conditions, params = [], []
+        if vehicle_number is not None:
+            conditions.append('ph.vehicle_num = ?')
+            params.append(vehicle_number)
+        if closed_only:
+            conditions.append('ph.exit_time IS NOT NULL')
+        if after is not None:
+            conditions.append('(ph.entry_time, ph.id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        cursor = repo.cursor()
+
+        cursor.execute(f'''
+            SELECT ph.id, ph.vehicle_num, vm.vehicle_type, vm.category, ph.slot_id,
+                   ph.zone, ph.entry_time, ph.exit_time, ph.duration_min
+            FROM parking_history ph
+            LEFT JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
+            {where}
+            ORDER BY ph.entry_time DESC, ph.id DESC
+            LIMIT ?
+        ''', (*params, limit))
 
-        columns = ['vehicle_num', 'slot_id', 'zone', 'entry_time', 'exit_time', 'duration_min']
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
+        rows = [dict(zip(HISTORY_PAGE_COLUMNS, row)) for row in cursor.fetchall()]
+        rows = _add_archived_rows(rows, where, params, limit, after)
+        last = rows[-1] if len(rows) == limit else None
 
-        return result
+        return {'rows': rows, 'next': (last['entry_time'], last['id']) if last else None}
 
     except Exception as e:
-        logging.error(f"Error getting vehicle history: {e}")
-        return []
+        logging.error(f"Error getting history page: {e}")
+        return {'rows': [], 'next': None}
+
+def _add_archived_rows(rows, where, params, limit, after):
+    """
+    Merge archived sessions into a page read from the live table
+
+    A partition holds the sessions entered in one month, so partitions are
+    read newest first only until the page is full with rows entered after
+    the next one.
+    """
+    seen = {row['id'] for row in rows}
+    for month in archive.months():
+        if after is not None and month > after[0][:7]:
+            continue
+        if len(rows) >= limit and rows[limit - 1]['entry_time'][:7] > month:
+            break
+        for row in archive.fetch(month, f'''
+            SELECT ph.id, ph.vehicle_num, ph.vehicle_type, ph.category, ph.slot_id,
+                   ph.zone, ph.entry_time, ph.exit_time, ph.duration_min
+            FROM parking_history ph
+            {where}
+            ORDER BY ph.entry_time DESC, ph.id DESC
+            LIMIT ?
+        ''', (*params, limit)):
+            # a batch interrupted between archive and delete leaves a row in both
+            if row[0] not in seen:
+                seen.add(row[0])
+                rows.append(dict(zip(HISTORY_PAGE_COLUMNS, row)))
+        rows.sort(key=lambda row: (row['entry_time'], row['id']), reverse=True)
+        del rows[limit:]
+    return rows
+
+def get_vehicle_history(vehicle_number):
+    """
+    Get parking history for a specific vehicle
+
+    Every completed session, newest first, as dicts of vehicle_num,
+    slot_id, zone, entry_time, exit_time and duration_min; read a page at
+    a time, archived months included. Use get_vehicle_history_page() to
+    show it a page at a time.
+    """
+    columns = ['vehicle_num', 'slot_id', 'zone', 'entry_time', 'exit_time', 'duration_min']
+    result, after = [], None
+    while True:
+        page = get_vehicle_history_page(vehicle_number, after)
+        result.extend({name: row[name] for name in columns} for row in page['rows'])
+        after = page['next']
+        if after is None:
+            return result
+
+def get_vehicle_history_page(vehicle_number, after=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Get one page of completed parking sessions for a specific vehicle (see get_history_page)
+    """
+    return get_history_page(after, limit, vehicle_number=vehicle_number, closed_only=True)
 
 def get_parked_vehicle_info(vehicle_number):
     """
     Get current parking information for a vehicle
+
+    Served from the active-vehicle LRU cache, so a gate asking
+    is_vehicle_parked() and then this for the same plate reads the
+    database once.
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT slot_id, zone, entry_time
-            FROM active_vehicles 
-            WHERE vehicle_number = ?
-        ''', (vehicle_number,))
-
-        result = cursor.fetchone()
-        conn.close()
-
-        if result:
-            return {
-                'slot_id': result[0],
-                'zone': result[1],
-                'entry_time': result[2]
-            }
-        return None
+        return active_cache.get(vehicle_number)
 
     except Exception as e:
         logging.error(f"Error getting parked vehicle info: {e}")
@@ -213,30 +241,102 @@ def get_parked_vehicle_info(vehicle_number):
 def get_parking_history_data(target_date=None):
     """
     Get parking history data for reports
+
+    Sessions entered on target_date (a date or 'YYYY-MM-DD'): a half-open
+    range on the indexed entry_ts column, from that midnight up to the
+    next one, rather than DATE(entry_time) evaluated on every row. Days
+    in an archived month also read that month's partition.
     """
     try:
         if not target_date:
             target_date = date.today()
+        elif isinstance(target_date, str):
+            target_date = date.fromisoformat(target_date)
+        day_range = (to_epoch(target_date), to_epoch(target_date + timedelta(days=1)))
 
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        cursor = repo.cursor()
 
         cursor.execute('''
             SELECT ph.vehicle_num, vm.vehicle_type, vm.category, ph.slot_id, 
-                   ph.zone, ph.entry_time, ph.exit_time, ph.duration_min
+                   ph.zone, ph.entry_time, ph.exit_time, ph.duration_min, ph.id
             FROM parking_history ph
             JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
-            WHERE DATE(ph.entry_time) = ?
-            ORDER BY ph.entry_time
-        ''', (target_date,))
+            WHERE ph.entry_ts >= ? AND ph.entry_ts < ?
+            ORDER BY ph.entry_ts
+        ''', day_range)
+        rows = cursor.fetchall()
+
+        month = target_date.strftime('%Y-%m')
+        if month in archive.months():
+            seen = {row[-1] for row in rows}
+            rows += [row for row in archive.fetch(month, '''
+                SELECT vehicle_num, vehicle_type, category, slot_id,
+                       zone, entry_time, exit_time, duration_min, id
+                FROM parking_history
+                WHERE entry_ts >= ? AND entry_ts < ?
+            ''', day_range) if row[-1] not in seen]
+            rows.sort(key=lambda row: row[5])
 
         columns = ['vehicle_num', 'vehicle_type', 'category', 'slot_id', 
                   'zone', 'entry_time', 'exit_time', 'duration_min']
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
+        result = [dict(zip(columns, row)) for row in rows]
 
         return result
 
     except Exception as e:
         logging.error(f"Error getting parking history data: {e}")
         return []
+
+def get_daily_summary(start_date=None, end_date=None, zone=None):
+    """
+    Get per-zone daily rollups for reports, start_date to end_date inclusive
+
+    Dates are dates or 'YYYY-MM-DD' (both default to today). Reads the
+    daily_summary rollups, brought up to date first, instead of the raw
+    history. Each row has date, zone, sessions, avg_duration_min,
+    p95_duration_min (to DURATION_BUCKET_MIN), peak_occupied, total_slots,
+    occupied and available; the last three are the zone's latest snapshot
+    of that day, None for a day no snapshot was taken on.
+    """
+    try:
+        start_date = str(start_date or date.today())
+        end_date = str(end_date or start_date)
+        update_daily_summary()
+
+        zone_filter, params = ('AND zone = ?', (zone,)) if zone else ('', ())
+        cursor = repo.cursor()
+
+        buckets = {}
+        cursor.execute(f'''
+            SELECT date, zone, bucket, sessions FROM daily_duration_hist
+            WHERE date >= ? AND date <= ? {zone_filter}
+        ''', (start_date, end_date, *params))
+        for day, day_zone, bucket, sessions in cursor.fetchall():
+            buckets.setdefault((day, day_zone), {})[bucket] = sessions
+
+        cursor.execute(f'''
+            SELECT date, zone, sessions, total_duration_min, peak_occupied,
+                   total_slots, occupied, available
+            FROM daily_summary
+            WHERE date >= ? AND date <= ? {zone_filter}
+            ORDER BY date, zone
+        ''', (start_date, end_date, *params))
+
+        result = []
+        for day, day_zone, sessions, total_duration, peak, total_slots, occupied, available in cursor.fetchall():
+            result.append({
+                'date': day,
+                'zone': day_zone,
+                'sessions': sessions,
+                'avg_duration_min': total_duration / sessions if sessions else None,
+                'p95_duration_min': duration_percentile(buckets.get((day, day_zone), {}), 0.95),
+                'peak_occupied': peak,
+                'total_slots': total_slots,
+                'occupied': occupied,
+                'available': available
+            })
+        return result
+
+    except Exception as e:
+        logging.error(f"Error getting daily summary: {e}")
+        return []
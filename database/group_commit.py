@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from utils import setup_logging
+import logging
+from database.repository import repo, retry_on_busy
+from parking_logic import allocator
+from database.active_cache import active_cache
+from database.insert_records import write_vehicle, write_parking_session
+
+# A batch is committed when it reaches MAX_BATCH writes or MAX_DELAY_MS after
+# its first write arrived, whichever comes first.
+MAX_DELAY_MS = 2
+MAX_BATCH = 256
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Opt-in group-commit writer for session inserts.
+
+    Gates submit writes from any thread; a single writer thread collects
+    what arrives within a few milliseconds and commits it as one
+    transaction, so a rush of cars costs one fsync per batch instead of two
+    per car. The writer connection runs with synchronous=FULL, and every
+    submit returns a concurrent.futures.Future that resolves only after the
+    batch's COMMIT returned, so ``future.result()`` (or
+    ``await asyncio.wrap_future(future)``) means the write is durable.
+    Each write runs in its own savepoint: one failing write fails only its
+    own future.
+    """
+
+    def __init__(self, max_delay_ms=MAX_DELAY_MS, max_batch=MAX_BATCH, synchronous='FULL'):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batches = 0
+        self.writes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Commit everything already submitted, then stop the writer thread
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, write, *args, after_commit=None):
+        """
+        Queue write(conn, *args) for the next batch and return its Future
+        """
+        if self._thread is None:
+            raise RuntimeError('GroupCommitWriter is not running; call start() first')
+        future = Future()
+        self._queue.put((write, args, after_commit, future))
+        return future
+
+    def add_vehicle(self, vehicle_number, vehicle_type, category, entry_time, slot_id):
+        return self.submit(write_vehicle, vehicle_number, vehicle_type, category, entry_time, slot_id)
+
+    def add_parking_session(self, vehicle_number, slot_id, zone, entry_time):
+        def after_commit():
+            allocator.occupy(zone, slot_id)
+            active_cache.invalidate(vehicle_number)
+        return self.submit(write_parking_session, vehicle_number, slot_id, zone, entry_time,
+                           after_commit=after_commit)
+
+    def _run(self):
+        repo.connection().execute(f'PRAGMA synchronous = {self.synchronous}')
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        batch = [entry for entry in batch if entry[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        def write_batch():
+            outcomes = []
+            with repo.transaction(immediate=True) as conn:
+                for write, args, after_commit, future in batch:
+                    try:
+                        with repo.transaction():
+                            outcomes.append((future, after_commit, write(conn, *args), None))
+                    except Exception as e:
+                        outcomes.append((future, None, None, e))
+            return outcomes
+
+        try:
+            outcomes = retry_on_busy(write_batch, f"group commit of {len(batch)} writes")
+        except Exception as e:
+            logging.error(f"Error committing write batch: {e}")
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, after_commit, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+                continue
+            if after_commit is not None:
+                try:
+                    after_commit()
+                except Exception as e:
+                    # the write is committed either way; a failing callback must not stop the writer
+                    logging.error(f"Error in after-commit callback: {e}")
+            future.set_result(result)
@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import numpy as np
+from utils import setup_logging, to_epoch
+import logging
+from database.repository import repo
+
+# Columnar mirror of parking_history for analysis: one flat binary file per
+# column in <db name>_columns/ beside the database, read back as
+# memory-mapped NumPy arrays, so scans over months of sessions run
+# vectorized without building a Python tuple per row.
+#
+# refresh() appends the rows past the id watermark (zone and category stored
+# as small integer codes) and fills in the exit time and duration of rows
+# that were still open when they were appended. meta.json, replaced atomically after the
+# column files are written, holds the row count, watermark, code tables and
+# column list (a mirror written with other columns is rebuilt);
+# bytes past the count are left over from an interrupted refresh and cut
+# off on the next one. Rows stay in the mirror when the live table is
+# purged or archived: ids are AUTOINCREMENT, so only a sequence behind the
+# watermark means a new history, and the mirror is rebuilt. A rebuild
+# renames fresh files over the old ones rather than truncating them, as
+# readers may still hold views on the old ones. A row deleted while its session was still open in
+# the mirror (admin delete, or closed and purged between two refreshes) has
+# no exit to copy, so it is tombstoned as DELETED instead of being looked
+# up again on every refresh.
+
+CACHE_DIR_SUFFIX = '_columns'
+
+# name -> dtype of each column file; zone and category are codes into the
+# name lists in meta.json, so up to 256 of each
+COLUMNS = {
+    'id': np.int64,
+    'slot_id': np.int32,
+    'zone': np.uint8,
+    'category': np.uint8,
+    'entry_ts': np.int64,
+    'exit_ts': np.int64,
+    'duration_min': np.int32,
+}
+
+# duration_min of a session that has not exited yet (its exit_ts is 0)
+OPEN = -1
+# duration_min of a tombstoned session (its exit_ts is -1, so it is neither
+# parked nor departed at any time); closed sessions have duration_min >= 0
+DELETED = -2
+
+# history rows read per query while appending
+REFRESH_CHUNK = 100000
+
+
+class HistoryColumns:
+    """
+    Memory-mapped columns of parking_history, kept up to date by refresh()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def directory(self):
+        return os.path.splitext(repo.db_path)[0] + CACHE_DIR_SUFFIX
+
+    def _file(self, name):
+        return os.path.join(self.directory(), f'{name}.bin')
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.directory(), 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._empty_meta()
+
+    def _empty_meta(self):
+        return {'count': 0, 'watermark': 0, 'zones': [], 'categories': [''], 'columns': list(COLUMNS)}
+
+    def _save_meta(self, meta):
+        path = os.path.join(self.directory(), 'meta.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def _reset(self):
+        # the emptied meta.json goes first, so no reader maps the new files with the old count
+        meta = self._empty_meta()
+        self._save_meta(meta)
+        for name in COLUMNS:
+            path = self._file(name)
+            open(path + '.tmp', 'wb').close()
+            os.replace(path + '.tmp', path)
+        return meta
+
+    def _map(self, name, count, mode='r'):
+        if not count:
+            return np.zeros(0, COLUMNS[name])
+        return np.memmap(self._file(name), COLUMNS[name], mode, shape=(count,))
+
+    def _append(self, meta, rows):
+        zones = {zone: code for code, zone in enumerate(meta['zones'])}
+        categories = {category: code for code, category in enumerate(meta['categories'])}
+        for _, _, zone, category, _, _, _ in rows:
+            if zone not in zones:
+                zones[zone] = len(meta['zones'])
+                meta['zones'].append(zone)
+            category = category or ''
+            if category not in categories:
+                categories[category] = len(meta['categories'])
+                meta['categories'].append(category)
+
+        values = {
+            'id': [row[0] for row in rows],
+            'slot_id': [row[1] for row in rows],
+            'zone': [zones[row[2]] for row in rows],
+            'category': [categories[row[3] or ''] for row in rows],
+            'entry_ts': [row[4] or 0 for row in rows],
+            'exit_ts': [row[5] or 0 for row in rows],
+            'duration_min': [OPEN if row[6] is None else row[6] for row in rows],
+        }
+        for name, dtype in COLUMNS.items():
+            with open(self._file(name), 'ab') as f:
+                np.array(values[name], dtype).tofile(f)
+        meta['count'] += len(rows)
+        meta['watermark'] = rows[-1][0]
+        self._save_meta(meta)
+
+    def _close_sessions(self, meta):
+        # sessions that were open when appended and have exited, or been deleted, since
+        durations = self._map('duration_min', meta['count'], 'r+')
+        exits = self._map('exit_ts', meta['count'], 'r+')
+        positions = np.flatnonzero(durations == OPEN)
+        if not len(positions):
+            return 0
+        ids = self._map('id', meta['count'])[positions]
+        closed = 0
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500].tolist()
+            rows = repo.fetchall(f'''
+                SELECT id, duration_min, COALESCE(exit_ts, 0) FROM parking_history
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            # every id in the chunk is at or below the watermark, so a missing one was deleted
+            gone = np.ones(len(chunk), bool)
+            if rows:
+                found = np.array([(row_id, OPEN if duration is None else duration, exit_ts)
+                                  for row_id, duration, exit_ts in rows], dtype=np.int64)
+                index = np.searchsorted(ids[start:start + 500], found[:, 0])
+                gone[index] = False
+                ended = found[:, 1] != OPEN
+                where = positions[start + index[ended]]
+                durations[where] = found[ended, 1]
+                exits[where] = found[ended, 2]
+                closed += int(ended.sum())
+            if gone.any():
+                where = positions[start + np.flatnonzero(gone)]
+                durations[where] = DELETED
+                exits[where] = -1
+                closed += int(gone.sum())
+        durations.flush()
+        exits.flush()
+        return closed
+
+    def refresh(self):
+        """
+        Append new history rows and close finished sessions; returns (appended, closed)
+        """
+        with self._lock:
+            os.makedirs(self.directory(), exist_ok=True)
+            meta = self._load_meta()
+            if meta.get('columns') != list(COLUMNS):
+                # written with another set of columns
+                meta = self._reset()
+            elif meta['watermark'] > repo.fetchvalue(
+                    "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'parking_history'"):
+                # a new history (e.g. a recreated database) under the mirror
+                logging.warning("History columns are ahead of parking_history; rebuilding")
+                meta = self._reset()
+            # bytes past the count, which no reader maps, are cut off in place
+            for name, dtype in COLUMNS.items():
+                path = self._file(name)
+                with open(path, 'ab'):
+                    pass
+                os.truncate(path, meta['count'] * np.dtype(dtype).itemsize)
+
+            appended = 0
+            while True:
+                rows = repo.fetchall('''
+                    SELECT ph.id, ph.slot_id, ph.zone, vm.category, ph.entry_ts, ph.exit_ts, ph.duration_min
+                    FROM parking_history ph
+                    LEFT JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
+                    WHERE ph.id > ?
+                    ORDER BY ph.id
+                    LIMIT ?
+                ''', (meta['watermark'], REFRESH_CHUNK))
+                if not rows:
+                    break
+                self._append(meta, rows)
+                appended += len(rows)
+
+            closed = self._close_sessions(meta)
+            if appended or closed:
+                logging.info(f"History columns: {appended} rows appended, {closed} sessions closed")
+            return appended, closed
+
+    def columns(self, refresh=True):
+        """
+        Read-only memory-mapped arrays of every mirrored session, by column name
+
+        Also returns 'zone_names' and 'category_names', the strings behind
+        the zone and category codes. duration_min is OPEN (-1) for sessions
+        that have not exited and DELETED (-2) for tombstoned ones.
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            meta = self._load_meta()
+            result = {name: self._map(name, meta['count']) for name in COLUMNS}
+        result['zone_names'] = meta['zones']
+        result['category_names'] = meta['categories']
+        return result
+
+
+# single shared instance
+history_columns = HistoryColumns()
+
+
+def duration_stats(start=None, end=None, zone=None):
+    """
+    Count, mean, median, p95 and longest duration (minutes) of the closed
+    sessions entered between start and end (datetimes, dates or ISO
+    strings; open-ended when None), optionally in one zone
+    """
+    cols = history_columns.columns()
+    mask = cols['duration_min'] >= 0
+    if start is not None:
+        mask &= cols['entry_ts'] >= to_epoch(start)
+    if end is not None:
+        mask &= cols['entry_ts'] < to_epoch(end)
+    if zone is not None:
+        if zone not in cols['zone_names']:
+            return {'count': 0, 'mean': None, 'median': None, 'p95': None, 'max': None}
+        mask &= cols['zone'] == cols['zone_names'].index(zone)
+
+    durations = cols['duration_min'][mask]
+    if not len(durations):
+        return {'count': 0, 'mean': None, 'median': None, 'p95': None, 'max': None}
+    median, p95 = np.percentile(durations, [50, 95])
+    return {'count': int(len(durations)), 'mean': float(durations.mean()),
+            'median': float(median), 'p95': float(p95), 'max': int(durations.max())}
+
+
+def zone_duration_histograms(bins, start=None, end=None):
+    """
+    Histogram of closed-session durations per zone: {zone: counts}, with
+    `bins` the bin edges in minutes as for numpy.histogram
+    """
+    cols = history_columns.columns()
+    mask = cols['duration_min'] >= 0
+    if start is not None:
+        mask &= cols['entry_ts'] >= to_epoch(start)
+    if end is not None:
+        mask &= cols['entry_ts'] < to_epoch(end)
+    zones, durations = cols['zone'][mask], cols['duration_min'][mask]
+    return {name: np.histogram(durations[zones == code], bins)[0]
+            for code, name in enumerate(cols['zone_names'])}
+
+
+if __name__ == '__main__':
+    setup_logging()
+    appended, closed = history_columns.refresh()
+    print(f"{appended} rows appended, {closed} sessions closed in {history_columns.directory()}")
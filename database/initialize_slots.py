@@ -0,0 +1,74 @@
+from utils import setup_logging
+import logging
+from database.repository import repo
+from parking_logic import allocator
+
+# Lot layout: zone -> slot count plus optional slot types and locations.
+# Types and locations are laid out in contiguous blocks over each zone's
+# slots in the order given (e.g. the last quarter of a zone as 'EV').
+DEFAULT_LAYOUT = {
+    'A': {'count': 50},  # Student
+    'B': {'count': 30},  # Faculty
+    'C': {'count': 20},  # VIP
+}
+
+# Inserts n rows of one (zone, slot_type, location) segment; the rows are
+# generated inside SQLite instead of being bound one by one from Python.
+INSERT_SEGMENT = '''
+    WITH RECURSIVE pos(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM pos WHERE i < ?)
+    INSERT INTO slots (zone, slot_type, location) SELECT ?, ?, ? FROM pos
+'''
+
+
+def layout_segments(spec, start=0):
+    """
+    Split positions start..count-1 of a zone into runs sharing a slot type and
+    location; returns [(first, end, slot_type, location)]
+    """
+    count = spec['count']
+    types = spec.get('types') or (None,)
+    locations = spec.get('locations') or (None,)
+    # position i gets types[i * len(types) // count]; a block k starts at ceil(k * count / len)
+    cuts = {start, count}
+    for n in (len(types), len(locations)):
+        cuts.update(-(-k * count // n) for k in range(1, n))
+    cuts = sorted(c for c in cuts if start <= c <= count)
+    return [(first, end, types[first * len(types) // count], locations[first * len(locations) // count])
+            for first, end in zip(cuts, cuts[1:]) if first < end]
+
+
+def seed_slots(layout=None, top_up=False):
+    """
+    Seed an empty slots table with the layout, in one transaction.
+
+    A lot that already has slots is left alone, so slots an administrator
+    removed, or a lot laid out differently, stay as they are across starts.
+    With top_up (an explicit admin action, e.g. this module's CLI) every
+    zone of the layout is topped up to its count instead: zones that have
+    their slots get nothing, raising a count adds only the missing slots.
+    Returns {zone: slots inserted}.
+    """
+    layout = layout or DEFAULT_LAYOUT
+    inserted = {}
+    with repo.transaction() as conn:
+        if not top_up and conn.execute('SELECT 1 FROM slots LIMIT 1').fetchone():
+            return inserted
+        existing = dict(conn.execute('SELECT zone, COUNT(*) FROM slots GROUP BY zone'))
+        for zone, spec in layout.items():
+            inserted[zone] = 0
+            for first, end, slot_type, location in layout_segments(spec, existing.get(zone, 0)):
+                conn.execute(INSERT_SEGMENT, (end - first, zone, slot_type, location))
+                inserted[zone] += end - first
+
+    if any(inserted.values()):
+        logging.info(f"Seeded parking slots: {inserted}")
+        if allocator.loaded:
+            allocator.load()
+    return inserted
+
+
+if __name__ == '__main__':
+    setup_logging()
+    from database.create_tables import initialize_database
+    initialize_database()
+    print(f"Slots added: {seed_slots(top_up=True)}")
@@ -1,39 +1,62 @@
 
-import sqlite3
 from datetime import datetime
-from utils import setup_logging
+from utils import setup_logging, to_epoch
 import logging
+from database.repository import repo
+from parking_logic import allocator
+from database.active_cache import active_cache
 
-def add_vehicle(vehicle_number, vehicle_type, category, entry_time, slot_id):
+def write_vehicle(conn, vehicle_number, vehicle_type, category, entry_time, slot_id):
     """
-    Add or update vehicle in vehicles_master table
+    Upsert a vehicles_master row on an open transaction
     """
-    try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+    cursor = conn.cursor()
 
-        # Check if vehicle already exists
-        cursor.execute('SELECT first_entry FROM vehicles_master WHERE vehicle_number = ?', 
-                      (vehicle_number,))
-        existing = cursor.fetchone()
+    # Check if vehicle already exists
+    cursor.execute('SELECT first_entry FROM vehicles_master WHERE vehicle_number = ?', 
+                  (vehicle_number,))
+    existing = cursor.fetchone()
 
-        if existing:
-            # Update existing vehicle
-            cursor.execute('''
-                UPDATE vehicles_master 
-                SET vehicle_type = ?, category = ?, last_slot = ?
-                WHERE vehicle_number = ?
-            ''', (vehicle_type, category, f'Slot {slot_id}', vehicle_number))
-        else:
-            # Insert new vehicle
-            cursor.execute('''
-                INSERT INTO vehicles_master 
-                (vehicle_number, vehicle_type, category, first_entry, last_slot)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (vehicle_number, vehicle_type, category, entry_time, f'Slot {slot_id}'))
+    if existing:
+        # Update existing vehicle
+        cursor.execute('''
+            UPDATE vehicles_master 
+            SET vehicle_type = ?, category = ?, last_slot = ?
+            WHERE vehicle_number = ?
+        ''', (vehicle_type, category, f'Slot {slot_id}', vehicle_number))
+    else:
+        # Insert new vehicle
+        cursor.execute('''
+            INSERT INTO vehicles_master 
+            (vehicle_number, vehicle_type, category, first_entry, last_slot)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (vehicle_number, vehicle_type, category, entry_time, f'Slot {slot_id}'))
 
-        conn.commit()
-        conn.close()
+def write_parking_session(conn, vehicle_number, slot_id, zone, entry_time):
+    """
+    Insert the history and active_vehicles rows of a new session on an open transaction
+    """
+    cursor = conn.cursor()
+
+    # Add to parking history
+    cursor.execute('''
+        INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time, entry_ts)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (vehicle_number, slot_id, zone, entry_time, to_epoch(entry_time)))
+
+    # Add to active vehicles
+    cursor.execute('''
+        INSERT OR REPLACE INTO active_vehicles (vehicle_number, slot_id, zone, entry_time)
+        VALUES (?, ?, ?, ?)
+    ''', (vehicle_number, slot_id, zone, entry_time))
+
+def add_vehicle(vehicle_number, vehicle_type, category, entry_time, slot_id):
+    """
+    Add or update vehicle in vehicles_master table
+    """
+    try:
+        with repo.transaction() as conn:
+            write_vehicle(conn, vehicle_number, vehicle_type, category, entry_time, slot_id)
         return True
 
     except Exception as e:
@@ -43,25 +66,17 @@ def add_vehicle(vehicle_number, vehicle_type, category, entry_time, slot_id):
 def add_parking_session(vehicle_number, slot_id, zone, entry_time):
     """
     Add parking session to history and active_vehicles tables
+
+    Commits on its own; gates with many concurrent sessions can batch
+    commits through database.group_commit.GroupCommitWriter instead.
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Add to parking history
-        cursor.execute('''
-            INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time)
-            VALUES (?, ?, ?, ?)
-        ''', (vehicle_number, slot_id, zone, entry_time))
+        with repo.transaction() as conn:
+            write_parking_session(conn, vehicle_number, slot_id, zone, entry_time)
 
-        # Add to active vehicles
-        cursor.execute('''
-            INSERT OR REPLACE INTO active_vehicles (vehicle_number, slot_id, zone, entry_time)
-            VALUES (?, ?, ?, ?)
-        ''', (vehicle_number, slot_id, zone, entry_time))
-
-        conn.commit()
-        conn.close()
+        # Keep the free-slot index and the active-vehicle cache in step with the new session
+        allocator.occupy(zone, slot_id)
+        active_cache.invalidate(vehicle_number)
         return True
 
     except Exception as e:
@@ -76,26 +91,23 @@ def add_user_log(username, action, timestamp=None):
         timestamp = datetime.now().isoformat()
 
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-
-        # Create user_logs table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                action TEXT NOT NULL,
-                timestamp DATETIME NOT NULL
-            )
-        ''')
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO user_logs (username, action, timestamp)
-            VALUES (?, ?, ?)
-        ''', (username, action, timestamp))
+            # Create user_logs table if it doesn't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    timestamp DATETIME NOT NULL
+                )
+            ''')
 
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO user_logs (username, action, timestamp)
+                VALUES (?, ?, ?)
+            ''', (username, action, timestamp))
         return True
 
     except Exception as e:
@@ -105,19 +117,24 @@ def add_user_log(username, action, timestamp=None):
 def add_daily_summary(date, zone, total_slots, occupied, available):
     """
     Add daily summary record
+
+    Sets the occupancy snapshot only; the session rollups and peak of the
+    row (see rollups.py) are kept.
     """
     try:
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
+        with repo.transaction() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO daily_summary 
-            (date, zone, total_slots, occupied, available)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (date, zone, total_slots, occupied, available))
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO daily_summary 
+                (date, zone, total_slots, occupied, available, peak_occupied)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (date, zone) DO UPDATE SET
+                    total_slots = excluded.total_slots,
+                    occupied = excluded.occupied,
+                    available = excluded.available,
+                    peak_occupied = MAX(peak_occupied, excluded.occupied)
+            ''', (date, zone, total_slots, occupied, available, occupied))
         return True
 
     except Exception as e:
@@ -0,0 +1,604 @@
+import logging
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from utils import setup_logging
+from database.repository import repo, retry_on_busy
+from database.plate_search import normalized_plate_sql
+from database.rollups import day_peak_sql
+
+# Tables whose writes bump a row in change_counters (see change_monitor.py).
+# Part of migration 4: watch further tables in a new migration.
+WATCHED_TABLES = ('slots', 'active_vehicles', 'parking_history', 'vehicles_master')
+
+# Rows of slot_changes kept (migration 13); a terminal further behind than
+# this reloads its whole slot index instead of replaying the log
+SLOT_CHANGES_KEPT = 10000
+
+
+def _slot_change_log(event, slot):
+    # each write logs the slot and trims the log to SLOT_CHANGES_KEPT rows
+    when = 'WHEN OLD.is_occupied IS NOT NEW.is_occupied' if event.startswith('UPDATE') else ''
+    name = event.split()[0].lower()
+    return f'''CREATE TRIGGER IF NOT EXISTS trg_slots_{name}_log
+               AFTER {event} ON slots {when}
+               BEGIN
+                   INSERT INTO slot_changes (slot_id) VALUES ({slot}.slot_id);
+                   DELETE FROM slot_changes WHERE seq <= last_insert_rowid() - {SLOT_CHANGES_KEPT};
+               END'''
+
+
+def _change_counter_triggers(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            topic TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table in WATCHED_TABLES:
+        conn.execute('INSERT OR IGNORE INTO change_counters (topic) VALUES (?)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_changed
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE topic = '{table}';
+                END
+            ''')
+
+
+def _plate_index(conn):
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS plate_index
+            USING fts5(norm, plate UNINDEXED, tokenize = 'trigram')
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 (or older than 3.34): search matches parked plates only
+        logging.warning(f"Plate search index not created: {e}")
+        return
+    new_norm = normalized_plate_sql('NEW.vehicle_number')
+    old_norm = normalized_plate_sql('OLD.vehicle_number')
+    insert = f'INSERT INTO plate_index (norm, plate) VALUES ({new_norm}, NEW.vehicle_number)'
+    # GLOB without wildcards is an exact match the trigram index can serve
+    delete = f'DELETE FROM plate_index WHERE norm GLOB {old_norm} AND plate = OLD.vehicle_number'
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_vehicles_insert_plate AFTER INSERT ON vehicles_master
+        BEGIN {insert}; END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_vehicles_delete_plate AFTER DELETE ON vehicles_master
+        BEGIN {delete}; END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_vehicles_rename_plate AFTER UPDATE OF vehicle_number ON vehicles_master
+        WHEN OLD.vehicle_number IS NOT NEW.vehicle_number
+        BEGIN {delete}; {insert}; END
+    ''')
+    conn.execute(f'''
+        INSERT INTO plate_index (norm, plate)
+        SELECT {normalized_plate_sql('vehicle_number')}, vehicle_number FROM vehicles_master
+    ''')
+
+
+# A Backfill step fills in existing rows after a schema change without
+# holding the write lock for the whole table. migrate() commits the steps
+# before it, then calls batch(conn, position) in a short write transaction
+# of its own per batch, starting from first(conn), until it returns None;
+# the steps after it and the version bump commit with that last batch.
+# The position is kept in maintenance_state as '<job>.next', so a stopped
+# migration resumes where it left off, and terminals migrating at the same
+# time share the batches. One Backfill per migration.
+Backfill = namedtuple('Backfill', 'job first batch')
+
+# parking_history ids covered per backfill batch
+BACKFILL_BATCH_IDS = 50000
+
+# pause between backfill batches; at least as long as the last batch held
+# the lock, so gate terminals get at least half of the time
+BACKFILL_MIN_PAUSE_S = 0.005
+
+MAINTENANCE_STATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS maintenance_state (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID
+'''
+
+
+def _history_start(conn):
+    return conn.execute('SELECT MIN(id) FROM parking_history').fetchone()[0]
+
+
+def _history_batches(fill):
+    # batch() calling fill(conn, start, end) on the next BACKFILL_BATCH_IDS ids;
+    # the last batch is the one that reaches the highest id there is now
+    def batch(conn, start):
+        end = start + BACKFILL_BATCH_IDS
+        fill(conn, start, end)
+        last = conn.execute('SELECT MAX(id) FROM parking_history').fetchone()[0]
+        return end if last is not None and last >= end else None
+    return batch
+
+
+def _fill_epoch_columns(conn, start, end):
+    # The 'utc' modifier reads the stored text as local time, like
+    # utils.to_epoch(); the fraction is cut off first because strftime()
+    # rounds it, to_epoch() truncates. Rows written since the columns were
+    # added already have them and get the same values again.
+    conn.execute('''
+        UPDATE parking_history
+        SET entry_ts = CAST(strftime('%s', substr(entry_time, 1, 19), 'utc') AS INTEGER),
+            exit_ts = CAST(strftime('%s', substr(exit_time, 1, 19), 'utc') AS INTEGER)
+        WHERE id >= ? AND id < ?
+    ''', (start, end))
+
+
+def _peak_occupancy_trigger(event, peak):
+    name = event.split()[0].lower()
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS trg_zone_counters_{name}_daily
+        AFTER {event} ON zone_counters
+        BEGIN
+            INSERT INTO daily_summary (date, zone, total_slots, occupied, available, peak_occupied)
+            VALUES (date('now', 'localtime'), NEW.zone, NEW.total, NEW.occupied,
+                    NEW.total - NEW.occupied, {peak})
+            ON CONFLICT (date, zone) DO UPDATE SET
+                total_slots = excluded.total_slots,
+                occupied = excluded.occupied,
+                available = excluded.available,
+                peak_occupied = MAX(peak_occupied, excluded.peak_occupied);
+        END
+    '''
+
+
+def _occupancy_start(conn):
+    from database.occupancy import replay_start
+    return replay_start(conn)
+
+
+def _occupancy_batch(conn, start):
+    # the hours before the trigger exists, replayed from parking_history;
+    # the last batch commits together with the trigger
+    from database.occupancy import replay_batch
+    return replay_batch(conn, start)
+
+
+def _vehicle_stats(conn, start, end):
+    # sessions closed before the trigger counted them (see its WHEN clause)
+    from database.vehicle_stats import add_vehicle_stats
+    add_vehicle_stats(conn, start, end)
+
+
+# Versioned schema changes, applied in order on top of the tables created by
+# create_tables.initialize_database(). The applied version is stored in
+# PRAGMA user_version, so existing databases pick up new entries on the next
+# start without a rebuild. Append new migrations; never edit applied ones.
+#
+# Each entry is (version, description, steps); a step is an SQL string, a
+# callable taking the connection or a Backfill.
+MIGRATIONS = [
+    (1, 'hot-path indexes for slot lookup, open sessions, vehicle history and retention', [
+        # find_available_slot / park: free slot in a zone, lowest or highest id first
+        '''CREATE INDEX IF NOT EXISTS idx_slots_zone_free
+           ON slots (zone, is_occupied, slot_id)''',
+        # exit: the one open session of a vehicle (partial, stays tiny)
+        '''CREATE INDEX IF NOT EXISTS idx_history_open_sessions
+           ON parking_history (vehicle_num) WHERE exit_time IS NULL''',
+        # get_vehicle_history: closed sessions of a vehicle, newest first
+        '''CREATE INDEX IF NOT EXISTS idx_history_vehicle_entry
+           ON parking_history (vehicle_num, entry_time)''',
+        # delete_old_history: closed sessions by exit time
+        '''CREATE INDEX IF NOT EXISTS idx_history_exit_time
+           ON parking_history (exit_time) WHERE exit_time IS NOT NULL''',
+    ]),
+    (2, 'slot type and location columns for layout-driven seeding', [
+        'ALTER TABLE slots ADD COLUMN slot_type TEXT',
+        'ALTER TABLE slots ADD COLUMN location TEXT',
+    ]),
+    (3, 'keyset index for paging through history newest first', [
+        # get_history_page: ORDER BY entry_time DESC, id DESC from a (entry_time, id) cursor
+        '''CREATE INDEX IF NOT EXISTS idx_history_entry
+           ON parking_history (entry_time, id)''',
+    ]),
+    (4, 'per-table change counters maintained by triggers', [
+        _change_counter_triggers,
+    ]),
+    (5, 'occupancy counters per zone and vehicle count, maintained by triggers', [
+        '''CREATE TABLE IF NOT EXISTS zone_counters (
+               zone TEXT PRIMARY KEY,
+               total INTEGER NOT NULL DEFAULT 0,
+               occupied INTEGER NOT NULL DEFAULT 0
+           ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS stat_counters (
+               name TEXT PRIMARY KEY,
+               value INTEGER NOT NULL DEFAULT 0
+           ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_slots_insert_count
+           AFTER INSERT ON slots
+           BEGIN
+               INSERT INTO zone_counters (zone, total, occupied) VALUES (NEW.zone, 1, NEW.is_occupied)
+               ON CONFLICT (zone) DO UPDATE SET total = total + 1, occupied = occupied + excluded.occupied;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_slots_delete_count
+           AFTER DELETE ON slots
+           BEGIN
+               UPDATE zone_counters SET total = total - 1, occupied = occupied - OLD.is_occupied
+               WHERE zone = OLD.zone;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_slots_update_count
+           AFTER UPDATE OF zone, is_occupied ON slots
+           WHEN OLD.zone IS NOT NEW.zone OR OLD.is_occupied IS NOT NEW.is_occupied
+           BEGIN
+               UPDATE zone_counters SET total = total - 1, occupied = occupied - OLD.is_occupied
+               WHERE zone = OLD.zone;
+               INSERT INTO zone_counters (zone, total, occupied) VALUES (NEW.zone, 1, NEW.is_occupied)
+               ON CONFLICT (zone) DO UPDATE SET total = total + 1, occupied = occupied + excluded.occupied;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_vehicles_insert_count
+           AFTER INSERT ON vehicles_master
+           BEGIN
+               UPDATE stat_counters SET value = value + 1 WHERE name = 'vehicles';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_vehicles_delete_count
+           AFTER DELETE ON vehicles_master
+           BEGIN
+               UPDATE stat_counters SET value = value - 1 WHERE name = 'vehicles';
+           END''',
+        # starting values for existing data
+        '''INSERT OR REPLACE INTO zone_counters (zone, total, occupied)
+           SELECT zone, COUNT(*), COALESCE(SUM(is_occupied), 0) FROM slots GROUP BY zone''',
+        '''INSERT OR REPLACE INTO stat_counters (name, value)
+           SELECT 'vehicles', COUNT(*) FROM vehicles_master''',
+    ]),
+    (6, 'FTS5 trigram index of normalized plates for partial and fuzzy search', [
+        _plate_index,
+    ]),
+    (7, 'integer epoch entry/exit columns on parking_history for range queries', [
+        'ALTER TABLE parking_history ADD COLUMN entry_ts INTEGER',
+        'ALTER TABLE parking_history ADD COLUMN exit_ts INTEGER',
+        Backfill('epoch_columns', _history_start, _history_batches(_fill_epoch_columns)),
+        # get_parking_history_data: sessions entered in [day start, next day start)
+        '''CREATE INDEX IF NOT EXISTS idx_history_entry_ts
+           ON parking_history (entry_ts)''',
+        # delete_old_history: closed sessions by exit time
+        '''CREATE INDEX IF NOT EXISTS idx_history_exit_ts
+           ON parking_history (exit_ts) WHERE exit_ts IS NOT NULL''',
+        # superseded by idx_history_exit_ts
+        'DROP INDEX IF EXISTS idx_history_exit_time',
+    ]),
+    (8, 'progress of resumable maintenance jobs', [
+        # e.g. the retention purge's cutoff and next history id (see retention.py)
+        MAINTENANCE_STATE_TABLE,
+    ]),
+    (9, 'incremental daily_summary rollups: session counts, durations and peak occupancy', [
+        # filled from parking_history past a watermark by rollups.update_daily_summary()
+        'ALTER TABLE daily_summary ADD COLUMN sessions INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE daily_summary ADD COLUMN total_duration_min INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE daily_summary ADD COLUMN peak_occupied INTEGER NOT NULL DEFAULT 0',
+        # sessions per duration bucket, for percentiles without the raw rows
+        '''CREATE TABLE IF NOT EXISTS daily_duration_hist (
+               date DATE NOT NULL,
+               zone TEXT NOT NULL,
+               bucket INTEGER NOT NULL,
+               sessions INTEGER NOT NULL,
+               PRIMARY KEY (date, zone, bucket)
+           ) WITHOUT ROWID''',
+        # occupancy snapshot and peak of the day on every counter change; OLD
+        # counts too, as it was the occupancy at midnight on a day's first change
+        _peak_occupancy_trigger('UPDATE OF occupied, total', 'MAX(OLD.occupied, NEW.occupied)'),
+        _peak_occupancy_trigger('INSERT', 'NEW.occupied'),
+    ]),
+    (10, 'hourly occupancy series per zone, appended by a trigger on zone_counters', [
+        '''CREATE TABLE IF NOT EXISTS occupancy_hourly (
+               zone TEXT NOT NULL,
+               hour_ts INTEGER NOT NULL,
+               opening INTEGER NOT NULL,
+               closing INTEGER NOT NULL,
+               low INTEGER NOT NULL,
+               high INTEGER NOT NULL,
+               delta_seconds INTEGER NOT NULL,
+               PRIMARY KEY (zone, hour_ts)
+           ) WITHOUT ROWID''',
+        # the hours so far; the trigger takes over in the same transaction as the last batch
+        Backfill('occupancy_replay', _occupancy_start, _occupancy_batch),
+        '''CREATE TRIGGER IF NOT EXISTS trg_zone_counters_update_hourly
+           AFTER UPDATE OF occupied ON zone_counters
+           WHEN OLD.occupied IS NOT NEW.occupied
+           BEGIN
+               INSERT INTO occupancy_hourly (zone, hour_ts, opening, closing, low, high, delta_seconds)
+               SELECT NEW.zone, t - (local_t % 3600), OLD.occupied, NEW.occupied,
+                      MIN(OLD.occupied, NEW.occupied), MAX(OLD.occupied, NEW.occupied),
+                      (NEW.occupied - OLD.occupied) * (3600 - local_t % 3600)
+               FROM (SELECT CAST(strftime('%s', 'now') AS INTEGER) AS t,
+                            CAST(strftime('%s', 'now', 'localtime') AS INTEGER) AS local_t)
+               WHERE true
+               ON CONFLICT (zone, hour_ts) DO UPDATE SET
+                   closing = excluded.closing,
+                   low = MIN(low, excluded.low),
+                   high = MAX(high, excluded.high),
+                   delta_seconds = delta_seconds + excluded.delta_seconds;
+           END''',
+    ]),
+    (11, 'running per-vehicle session stats, updated by a trigger as sessions close', [
+        # see vehicle_stats.py; avg_duration (from create_tables) holds the running mean
+        'ALTER TABLE vehicles_master ADD COLUMN visits INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE vehicles_master ADD COLUMN duration_m2 REAL NOT NULL DEFAULT 0',
+        'ALTER TABLE vehicles_master ADD COLUMN last_visit DATETIME',
+        'ALTER TABLE vehicles_master ADD COLUMN favourite_zone TEXT',
+        '''CREATE TABLE IF NOT EXISTS vehicle_zone_visits (
+               vehicle_number TEXT NOT NULL,
+               zone TEXT NOT NULL,
+               visits INTEGER NOT NULL,
+               PRIMARY KEY (vehicle_number, zone)
+           ) WITHOUT ROWID''',
+        # one Welford step per closed session; the SET expressions all read
+        # the old row, so it is written in terms of the old count and mean.
+        # While the backfill below runs, sessions at or past its position are
+        # left to it: they are closed by the time it gets there
+        '''CREATE TRIGGER IF NOT EXISTS trg_history_close_vehicle_stats
+           AFTER UPDATE OF duration_min ON parking_history
+           WHEN OLD.duration_min IS NULL AND NEW.duration_min IS NOT NULL
+             AND NEW.id < COALESCE((SELECT value FROM maintenance_state
+                                    WHERE name = 'vehicle_stats.next'), NEW.id + 1)
+           BEGIN
+               INSERT INTO vehicle_zone_visits (vehicle_number, zone, visits)
+               VALUES (NEW.vehicle_num, NEW.zone, 1)
+               ON CONFLICT (vehicle_number, zone) DO UPDATE SET visits = visits + 1;
+               UPDATE vehicles_master SET
+                   visits = visits + 1,
+                   avg_duration = COALESCE(avg_duration, 0)
+                       + (NEW.duration_min - COALESCE(avg_duration, 0)) / (visits + 1.0),
+                   duration_m2 = duration_m2
+                       + (NEW.duration_min - COALESCE(avg_duration, 0))
+                       * (NEW.duration_min - COALESCE(avg_duration, 0)) * visits / (visits + 1.0),
+                   last_visit = NEW.exit_time,
+                   favourite_zone = CASE
+                       WHEN favourite_zone IS NULL OR favourite_zone = NEW.zone
+                         OR (SELECT visits FROM vehicle_zone_visits
+                             WHERE vehicle_number = NEW.vehicle_num AND zone = NEW.zone)
+                          > COALESCE((SELECT visits FROM vehicle_zone_visits
+                                      WHERE vehicle_number = NEW.vehicle_num AND zone = favourite_zone), 0)
+                       THEN NEW.zone ELSE favourite_zone END
+               WHERE vehicle_number = NEW.vehicle_num;
+           END''',
+        Backfill('vehicle_stats', _history_start, _history_batches(_vehicle_stats)),
+    ]),
+    (12, 'daily_summary snapshot columns nullable: only a day seen live has a snapshot', [
+        # SQLite cannot drop NOT NULL in place: rebuild the table, with the
+        # triggers that write to it dropped meanwhile
+        'DROP TRIGGER IF EXISTS trg_zone_counters_update_daily',
+        'DROP TRIGGER IF EXISTS trg_zone_counters_insert_daily',
+        '''CREATE TABLE daily_summary_new (
+               date DATE NOT NULL,
+               zone TEXT NOT NULL,
+               total_slots INTEGER,
+               occupied INTEGER,
+               available INTEGER,
+               sessions INTEGER NOT NULL DEFAULT 0,
+               total_duration_min INTEGER NOT NULL DEFAULT 0,
+               peak_occupied INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (date, zone)
+           )''',
+        '''INSERT INTO daily_summary_new
+               (date, zone, total_slots, occupied, available, sessions, total_duration_min, peak_occupied)
+           SELECT date, zone, total_slots, occupied, available, sessions, total_duration_min, peak_occupied
+           FROM daily_summary''',
+        'DROP TABLE daily_summary',
+        'ALTER TABLE daily_summary_new RENAME TO daily_summary',
+        _peak_occupancy_trigger('UPDATE OF occupied, total', 'MAX(OLD.occupied, NEW.occupied)'),
+        _peak_occupancy_trigger('INSERT', 'NEW.occupied'),
+        # past days the rollup created with a made-up empty lot: sessions
+        # entered but no peak, as no counter change was seen that day
+        f'''UPDATE daily_summary
+            SET total_slots = NULL, occupied = NULL, available = NULL,
+                peak_occupied = {day_peak_sql('daily_summary.date', 'daily_summary.zone')}
+            WHERE sessions > 0 AND peak_occupied = 0 AND date < date('now', 'localtime')''',
+    ]),
+    (13, 'log of changed slots, so terminals resync their slot index incrementally', [
+        # read by AllocationEngine.sync(): the slots whose occupancy changed,
+        # or that were added or removed, in commit order
+        '''CREATE TABLE IF NOT EXISTS slot_changes (
+               seq INTEGER PRIMARY KEY,
+               slot_id INTEGER NOT NULL
+           )''',
+        _slot_change_log('UPDATE OF is_occupied', 'NEW'),
+        _slot_change_log('INSERT', 'NEW'),
+        _slot_change_log('DELETE', 'OLD'),
+    ]),
+]
+
+# Queries on the gate and maintenance paths that must stay index-backed.
+# check_query_plans() fails if any of them plans a full table scan.
+HOT_QUERIES = {
+    'find_available_slot': (
+        'SELECT slot_id FROM slots WHERE zone = ? AND is_occupied = 0 ORDER BY slot_id LIMIT 1',
+        ('A',)),
+    'find_available_slot_corner': (
+        'SELECT slot_id FROM slots WHERE zone = ? AND is_occupied = 0 ORDER BY slot_id DESC LIMIT 1',
+        ('A',)),
+    'slot_changes_since': (
+        '''SELECT c.seq, c.slot_id, s.zone, s.is_occupied
+           FROM slot_changes c LEFT JOIN slots s ON s.slot_id = c.slot_id
+           WHERE c.seq > ? ORDER BY c.seq''',
+        (0,)),
+    'get_vehicle_history': (
+        '''SELECT vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
+           FROM parking_history WHERE vehicle_num = ? AND exit_time IS NOT NULL
+           ORDER BY entry_time DESC''',
+        ('MH01AB1234',)),
+    'history_page': (
+        '''SELECT id, vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
+           FROM parking_history WHERE (entry_time, id) < (?, ?)
+           ORDER BY entry_time DESC, id DESC LIMIT 200''',
+        ('2024-01-01T10:00:00', 1000)),
+    'vehicle_history_page': (
+        '''SELECT id, vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
+           FROM parking_history WHERE vehicle_num = ? AND (entry_time, id) < (?, ?)
+           ORDER BY entry_time DESC, id DESC LIMIT 200''',
+        ('MH01AB1234', '2024-01-01T10:00:00', 1000)),
+    'close_open_session': (
+        '''UPDATE parking_history SET exit_time = ?, exit_ts = ?, duration_min = ?
+           WHERE vehicle_num = ? AND exit_time IS NULL''',
+        ('2024-01-01T10:00:00', 1704103200, 0, 'MH01AB1234')),
+    'history_for_day': (
+        '''SELECT vehicle_num, slot_id, zone, entry_time, exit_time, duration_min
+           FROM parking_history WHERE entry_ts >= ? AND entry_ts < ?
+           ORDER BY entry_ts''',
+        (1704067200, 1704153600)),
+    'purge_history_end': (
+        'SELECT MAX(id) FROM parking_history WHERE entry_ts < ?',
+        (1704067200,)),
+    'purge_history_batch': (
+        '''DELETE FROM parking_history
+           WHERE id >= ? AND id < ? AND exit_ts IS NOT NULL AND +exit_ts < ?''',
+        (1, 5001, 1704067200)),
+    'archive_history_batch': (
+        '''SELECT ph.id, ph.vehicle_num, vm.vehicle_type, vm.category, ph.slot_id, ph.zone,
+                  ph.entry_time, ph.exit_time, ph.duration_min, ph.entry_ts, ph.exit_ts
+           FROM parking_history ph
+           LEFT JOIN vehicles_master vm ON ph.vehicle_num = vm.vehicle_number
+           WHERE ph.id >= ? AND ph.id < ? AND ph.exit_ts IS NOT NULL AND +ph.exit_ts < ?''',
+        (1, 5001, 1704067200)),
+}
+
+# "SCAN parking_history" without "USING ... INDEX" means every row is visited
+TABLE_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def get_schema_version(conn=None):
+    conn = conn or repo.connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _run_steps(conn, steps):
+    for step in steps:
+        if callable(step):
+            step(conn)
+        else:
+            conn.execute(step)
+
+
+def _backfill_batch(version, steps, split):
+    # one batch in its own transaction; the last one finishes the migration.
+    # Returns (next position or None, whether this call applied the version)
+    key = f'{steps[split].job}.next'
+    with repo.transaction(immediate=True) as conn:
+        row = conn.execute('SELECT value FROM maintenance_state WHERE name = ?', (key,)).fetchone()
+        if get_schema_version(conn) >= version or row is None:
+            # another terminal finished it
+            return None, False
+        position = steps[split].batch(conn, row[0])
+        if position is not None:
+            conn.execute('UPDATE maintenance_state SET value = ? WHERE name = ?', (position, key))
+            return position, False
+        conn.execute('DELETE FROM maintenance_state WHERE name = ?', (key,))
+        _run_steps(conn, steps[split + 1:])
+        conn.execute(f'PRAGMA user_version = {version}')
+        return None, True
+
+
+def _apply(version, steps):
+    """
+    Apply one migration; returns False when another terminal applied it first
+    """
+    split = next((i for i, step in enumerate(steps) if isinstance(step, Backfill)), None)
+    with repo.transaction(immediate=True) as conn:
+        # another terminal may have migrated while we waited for the lock
+        if get_schema_version(conn) >= version:
+            return False
+        if split is None:
+            _run_steps(conn, steps)
+            conn.execute(f'PRAGMA user_version = {version}')
+            return True
+
+        key = f'{steps[split].job}.next'
+        conn.execute(MAINTENANCE_STATE_TABLE)
+        resumed = conn.execute('SELECT 1 FROM maintenance_state WHERE name = ?', (key,)).fetchone()
+        if not resumed:
+            _run_steps(conn, steps[:split])
+            start = steps[split].first(conn)
+            if start is None:
+                # nothing to backfill
+                _run_steps(conn, steps[split + 1:])
+                conn.execute(f'PRAGMA user_version = {version}')
+                return True
+            conn.execute('INSERT INTO maintenance_state (name, value) VALUES (?, ?)', (key, start))
+
+    if resumed:
+        logging.info(f"Resuming backfill {steps[split].job} of migration {version}")
+    last_log = time.monotonic()
+    while True:
+        started = time.perf_counter()
+        position, applied = retry_on_busy(lambda: _backfill_batch(version, steps, split),
+                                          f'{steps[split].job} backfill')
+        held = time.perf_counter() - started
+        if position is None:
+            return applied
+        if time.monotonic() - last_log >= 5:
+            logging.info(f"Backfill {steps[split].job} of migration {version}: at {position}")
+            last_log = time.monotonic()
+        # let waiting gate transactions take the lock before the next batch
+        time.sleep(max(BACKFILL_MIN_PAUSE_S, held))
+
+
+def migrate(target=None):
+    """
+    Apply pending migrations, one transaction per version, or for a
+    migration with a Backfill, one per batch
+    """
+    applied = []
+    current = get_schema_version()
+    for version, description, steps in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+        if _apply(version, steps):
+            logging.info(f"Applied migration {version}: {description}")
+            applied.append(version)
+
+    if applied:
+        # refresh planner statistics so new (partial) indexes are preferred;
+        # the analysis limit keeps this to a sample on large tables
+        conn = repo.connection()
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('ANALYZE')
+    return applied
+
+
+def explain(sql, params=()):
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a statement
+    """
+    rows = repo.fetchall('EXPLAIN QUERY PLAN ' + sql, params)
+    return [row[3] for row in rows]
+
+
+def check_query_plans(queries=None):
+    """
+    Return {query name: plan lines} for hot queries that plan a full table scan
+    """
+    failures = {}
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        plan = explain(sql, params)
+        if any(TABLE_SCAN.match(line) for line in plan):
+            failures[name] = plan
+    return failures
+
+
+def assert_query_plans(queries=None):
+    """
+    Raise AssertionError naming every hot query that falls back to a table scan
+    """
+    failures = check_query_plans(queries)
+    if failures:
+        details = '; '.join(f"{name}: {' / '.join(plan)}" for name, plan in failures.items())
+        raise AssertionError(f"Hot queries use full table scans: {details}")
+
+
+if __name__ == '__main__':
+    setup_logging()
+    from database.create_tables import initialize_database
+    initialize_database()
+    assert_query_plans()
+    print(f"Schema version {get_schema_version()}; all hot queries are index-backed")
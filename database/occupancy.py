@@ -0,0 +1,203 @@
+import time
+from datetime import datetime
+import numpy as np
+from utils import setup_logging, to_epoch
+import logging
+from database.repository import repo
+
+# occupancy_hourly (migration 10) holds one row per zone and local clock
+# hour in which the zone's occupancy changed, appended by a trigger on
+# zone_counters as cars park and leave:
+#   hour_ts         Unix time the hour starts
+#   opening         occupied slots when the hour started
+#   closing         occupied slots after the hour's last change
+#   low, high       fewest / most occupied slots during the hour
+#   delta_seconds   sum over the hour's changes of change * seconds left in
+#                   the hour, so the time-weighted mean is
+#                   opening + delta_seconds / 3600
+# Hours without a row had no change and stay at the previous closing.
+
+# Migration 10 replays the history in batches of REPLAY_BATCH_S, one write
+# transaction each, up to where the trigger takes over. Batches stay
+# REPLAY_LAG_S behind the clock, so a park stamped before it waited out a
+# busy database cannot land in hours already replayed; the last batch
+# replays everything from its start on, in the trigger's transaction.
+REPLAY_BATCH_S = 86400
+REPLAY_LAG_S = 300
+
+
+def hour_start(value):
+    """
+    Unix time at which the local clock hour containing `value` (datetime, date,
+    ISO string or Unix seconds) started
+    """
+    seconds = value if isinstance(value, (int, float)) else to_epoch(value)
+    moment = datetime.fromtimestamp(seconds).replace(minute=0, second=0, microsecond=0)
+    return to_epoch(moment)
+
+
+def get_occupancy_series(zone, start, end):
+    """
+    Hourly occupancy of a zone for the hours from start up to (not including) end
+
+    start and end are datetimes, dates, ISO strings or Unix seconds.
+    Returns NumPy arrays of equal length: 'hour' (int64 Unix time each hour
+    starts), 'mean' (float64, time-weighted), 'low', 'high' and 'close'
+    (int32 occupied slots).
+    """
+    first, stop = hour_start(start), hour_start(end)
+    hours = np.arange(first, stop, 3600, dtype=np.int64)
+    series = {'hour': hours, 'mean': np.zeros(len(hours)),
+              'low': np.zeros(len(hours), np.int32), 'high': np.zeros(len(hours), np.int32),
+              'close': np.zeros(len(hours), np.int32)}
+    if not len(hours):
+        return series
+
+    try:
+        # occupancy going into the range: the last closing before it
+        before = repo.fetchvalue('''
+            SELECT closing FROM occupancy_hourly
+            WHERE zone = ? AND hour_ts < ?
+            ORDER BY hour_ts DESC LIMIT 1
+        ''', (zone, first), 0)
+        rows = np.array(repo.fetchall('''
+            SELECT hour_ts, opening, closing, low, high, delta_seconds
+            FROM occupancy_hourly
+            WHERE zone = ? AND hour_ts >= ? AND hour_ts < ?
+            ORDER BY hour_ts
+        ''', (zone, first, stop)), dtype=np.int64).reshape(-1, 6)
+
+    except Exception as e:
+        logging.error(f"Error getting occupancy series: {e}")
+        return series
+
+    # carry each hour's closing forward over the hours without changes;
+    # position -1, before the first row, picks `before` off the end
+    index = (rows[:, 0] - first) // 3600
+    position = np.full(len(hours), -1)
+    position[index] = np.arange(len(rows))
+    carried = np.append(rows[:, 2], before)[np.maximum.accumulate(position)]
+
+    series['close'][:] = carried
+    series['low'][:] = carried
+    series['high'][:] = carried
+    series['mean'][:] = carried
+    series['low'][index] = rows[:, 3]
+    series['high'][index] = rows[:, 4]
+    series['mean'][index] = rows[:, 1] + rows[:, 5] / 3600
+    return series
+
+
+def _local_hour_starts(seconds):
+    # hour starts for an array of Unix times, looked up once per distinct
+    # quarter hour rather than per event (UTC offsets are whole quarter hours)
+    quarters, inverse = np.unique(seconds // 900, return_inverse=True)
+    starts = np.array([hour_start(int(quarter) * 900) for quarter in quarters], dtype=np.int64)
+    return starts[inverse]
+
+
+def replay_history(conn, start=None, stop=None):
+    """
+    Add the series implied by the sessions in parking_history: +1 at each
+    entry, -1 at each exit, exits first within a second
+
+    start and stop (local hour starts, Unix seconds) limit it to the events
+    in [start, stop), continuing from each zone's closing before start.
+    """
+    if start is None:
+        rows = conn.execute('''
+            SELECT zone, entry_ts, exit_ts, id FROM parking_history WHERE entry_ts IS NOT NULL
+        ''').fetchall()
+        entries = [(zone, entry, row_id) for zone, entry, _, row_id in rows]
+        exits = [(zone, exit_ts, row_id) for zone, _, exit_ts, row_id in rows if exit_ts is not None]
+    else:
+        stop = stop if stop is not None else 1 << 62
+        entries = conn.execute('''
+            SELECT zone, entry_ts, id FROM parking_history WHERE entry_ts >= ? AND entry_ts < ?
+        ''', (start, stop)).fetchall()
+        exits = conn.execute('''
+            SELECT zone, exit_ts, id FROM parking_history WHERE exit_ts >= ? AND exit_ts < ?
+        ''', (start, stop)).fetchall()
+    if not entries and not exits:
+        return
+    zones = sorted({row[0] for row in entries} | {row[0] for row in exits})
+    codes = {zone: code for code, zone in enumerate(zones)}
+    events = entries + exits
+    zone = np.array([codes[row[0]] for row in events], dtype=np.int64)
+    t = np.array([row[1] for row in events], dtype=np.int64)
+    d = np.concatenate((np.ones(len(entries), np.int64), -np.ones(len(exits), np.int64)))
+    ids = np.array([row[2] for row in events], dtype=np.int64)
+    order = np.lexsort((ids, d, t, zone))
+    zone, t, d = zone[order], t[order], d[order]
+
+    # occupancy going into the range per zone: the last closing before it
+    before = np.zeros(len(zones), np.int64)
+    if start is not None:
+        for code, name in enumerate(zones):
+            row = conn.execute('''
+                SELECT closing FROM occupancy_hourly
+                WHERE zone = ? AND hour_ts < ?
+                ORDER BY hour_ts DESC LIMIT 1
+            ''', (name, start)).fetchone()
+            before[code] = row[0] if row else 0
+
+    # running occupancy per zone, then one group per (zone, hour)
+    occupied = np.cumsum(d)
+    zone_start = np.flatnonzero(np.r_[True, zone[1:] != zone[:-1]])
+    occupied -= np.repeat(occupied[zone_start] - d[zone_start] - before[zone[zone_start]],
+                          np.diff(np.r_[zone_start, len(zone)]))
+    hour = _local_hour_starts(t)
+    starts = np.flatnonzero(np.r_[True, (zone[1:] != zone[:-1]) | (hour[1:] != hour[:-1])])
+    ends = np.r_[starts[1:], len(zone)] - 1
+
+    opening = occupied[starts] - d[starts]
+    records = zip((zones[code] for code in zone[starts]), hour[starts].tolist(),
+                  opening.tolist(), occupied[ends].tolist(),
+                  np.minimum(np.minimum.reduceat(occupied, starts), opening).tolist(),
+                  np.maximum(np.maximum.reduceat(occupied, starts), opening).tolist(),
+                  np.add.reduceat(d * (hour + 3600 - t), starts).tolist())
+    conn.executemany('''
+        INSERT INTO occupancy_hourly (zone, hour_ts, opening, closing, low, high, delta_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (zone, hour_ts) DO UPDATE SET
+            closing = excluded.closing,
+            low = MIN(low, excluded.low),
+            high = MAX(high, excluded.high),
+            delta_seconds = delta_seconds + excluded.delta_seconds
+    ''', records)
+
+
+def replay_start(conn):
+    """
+    Hour start of the first entry in parking_history, or None when it is empty
+    """
+    first = conn.execute('SELECT MIN(entry_ts) FROM parking_history').fetchone()[0]
+    return hour_start(first) if first is not None else None
+
+
+def replay_batch(conn, start):
+    """
+    replay_history() for the REPLAY_BATCH_S from `start`; returns where the
+    next batch starts, or None once it has replayed everything from `start` on
+    """
+    stop = hour_start(start + REPLAY_BATCH_S)
+    if stop > time.time() - REPLAY_LAG_S:
+        replay_history(conn, start)
+        return None
+    replay_history(conn, start, stop)
+    return stop
+
+
+def rebuild_occupancy_series():
+    """
+    Recompute the series from parking_history (e.g. after the trigger was dropped)
+    """
+    with repo.transaction() as conn:
+        conn.execute('DELETE FROM occupancy_hourly')
+        replay_history(conn)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    rebuild_occupancy_series()
+    print(f"{repo.fetchvalue('SELECT COUNT(*) FROM occupancy_hourly')} occupancy hours rebuilt")
@@ -0,0 +1,266 @@
+import threading
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# Characters a gate operator (or a camera) commonly confuses, folded to one
+# form on both sides, so 'MH01AB1234', 'MHO1AB1234' and 'mh-01-ab-1234' all
+# normalize alike. plate_index rows are normalized with the same rules in
+# SQL (normalized_plate_sql); migration 6 froze them, so changing this map
+# needs a migration that rebuilds plate_index. Folding only finds
+# candidates: real plates differ in these letters ('KA01AD1234' and
+# 'KA01A01234'), so suggestions are ranked on the plain plate (upper case,
+# separators dropped) and a match that needs folding is a near-miss.
+CONFUSABLES = {'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1',
+               'Z': '2', 'S': '5', 'G': '6', 'B': '8'}
+IGNORED = ' -'
+
+_PLAIN = str.maketrans(
+    {**{chr(c): chr(c - 32) for c in range(ord('a'), ord('z') + 1)},
+     **{ch: None for ch in IGNORED}})
+_NORMALIZE = dict(_PLAIN)
+_NORMALIZE.update({ord(k): v for k, v in CONFUSABLES.items()})
+_NORMALIZE.update({ord(k.lower()): v for k, v in CONFUSABLES.items()})
+
+SUGGESTION_LIMIT = 10
+
+# historical candidates fetched per query before ranking
+CANDIDATE_LIMIT = 100
+
+# ... and per half of a possibly misread input
+HALF_CANDIDATE_LIMIT = 100
+
+# candidates (most trigrams shared with the input first) given the edit-distance check
+FUZZY_CANDIDATES = 40
+
+
+def plain_plate(plate):
+    return plate.translate(_PLAIN)
+
+
+def normalize_plate(plate):
+    return plate.translate(_NORMALIZE)
+
+
+def normalized_plate_sql(column):
+    """
+    SQL expression normalizing `column` exactly like normalize_plate()
+    """
+    expr = f'upper({column})'
+    for ch in IGNORED:
+        expr = f"replace({expr}, '{ch}', '')"
+    for k, v in CONFUSABLES.items():
+        expr = f"replace({expr}, '{k}', '{v}')"
+    return expr
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def substring_distance(query, text):
+    """
+    Fewest edits turning `query` into some substring of `text`.
+
+    Sellers' dynamic program computed a column at a time with Myers'
+    bit-vector method: the column for each text character is a handful of
+    integer operations on bitmasks over the query, instead of a Python
+    loop over every (query, text) cell.
+    """
+    m = len(query)
+    if not m:
+        return 0
+    peq = {}
+    for i, ch in enumerate(query):
+        peq[ch] = peq.get(ch, 0) | 1 << i
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    best = m
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # shifting in 0 rather than 1 lets a match start anywhere in the text
+        ph = ph << 1 & mask
+        mh = mh << 1 & mask
+        pv = mh | ~(xv | ph) & mask
+        mv = ph & xv
+        if score < best:
+            best = score
+    return best
+
+
+class PlateTrie:
+    """
+    Prefix tree over normalized plates; each node lists the plates ending there
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, normalized, plate):
+        node = self.root
+        for ch in normalized:
+            node = node.setdefault(ch, {})
+        node.setdefault('', []).append(plate)
+
+    def with_prefix(self, prefix, limit):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.get('', ()))
+            stack.extend(child for key, child in node.items() if key)
+        return found[:limit]
+
+
+class PlateSearch:
+    """
+    Ranked plate suggestions for partial or misread input.
+
+    Parked plates live in an in-memory trie (rebuilt when the
+    active_vehicles change counter moves), so prefixes are answered
+    without touching the database. Historical plates come from the FTS5
+    trigram table plate_index (migration 6) over vehicles_master: a
+    substring phrase query, and for a likely misread a query for either half
+    of the input, since one wrong character leaves the other half intact.
+    Suggestions are ranked parked first, then exact, prefix and substring
+    matches of the plain plate, then fuzzy matches by edit distance between
+    the normalized plates (a confusable swap costs nothing there, so it
+    ranks first) and then between the plain ones; only the candidates
+    sharing the most trigrams with the input get the edit-distance check.
+
+    Typing narrows the search: once a phrase query returns fewer than
+    CANDIDATE_LIMIT rows it is the complete set of plates containing that
+    input, so later keystrokes that still contain it filter those rows in
+    memory until vehicles_master changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trie = PlateTrie()
+        self._active = {}
+        self._version = None
+        self._indexed = None
+        self._narrowed = None  # (vehicles_master version, query, every row containing it)
+
+    def _versions(self):
+        return dict(repo.fetchall(
+            "SELECT topic, version FROM change_counters WHERE topic IN ('active_vehicles', 'vehicles_master')"))
+
+    def _active_plates(self, version):
+        with self._lock:
+            if version != self._version:
+                trie, active = PlateTrie(), {}
+                for (plate,) in repo.fetchall('SELECT vehicle_number FROM active_vehicles'):
+                    normalized = normalize_plate(plate)
+                    trie.insert(normalized, plate)
+                    active[plate] = normalized
+                self._trie, self._active, self._version = trie, active, version
+            return self._trie, self._active
+
+    def _has_index(self):
+        if self._indexed is None:
+            # migration 6 skips plate_index when SQLite was built without FTS5
+            self._indexed = repo.fetchvalue(
+                "SELECT 1 FROM sqlite_master WHERE name = 'plate_index'") is not None
+        return self._indexed
+
+    def _substring_matches(self, query, version):
+        with self._lock:
+            narrowed = self._narrowed
+        if narrowed is not None and narrowed[0] == version and narrowed[1] in query:
+            return [row for row in narrowed[2] if query in row[1]]
+        rows = repo.fetchall('SELECT plate, norm FROM plate_index WHERE plate_index MATCH ? LIMIT ?',
+                             (f'"{query}"', CANDIDATE_LIMIT))
+        if len(rows) < CANDIDATE_LIMIT:
+            with self._lock:
+                self._narrowed = (version, query, rows)
+        return rows
+
+    def _historical(self, query, version):
+        def match(phrase, limit):
+            return repo.fetchall('SELECT plate, norm FROM plate_index WHERE plate_index MATCH ? LIMIT ?',
+                                 (f'"{phrase}"', limit))
+
+        if len(query) < 3 or not self._has_index():
+            # trigram queries need three characters; shorter input only matches parked plates
+            return []
+        rows = self._substring_matches(query, version)
+        if len(rows) < SUGGESTION_LIMIT and len(query) >= 6:
+            half = len(query) // 2
+            rows += match(query[:half], HALF_CANDIDATE_LIMIT) + match(query[half:], HALF_CANDIDATE_LIMIT)
+        return rows
+
+    def suggest(self, text, limit=SUGGESTION_LIMIT):
+        query = normalize_plate(text)
+        if not query or '"' in query:
+            return []
+        versions = self._versions()
+        trie, active = self._active_plates(versions.get('active_vehicles'))
+
+        candidates = {plate: active[plate] for plate in trie.with_prefix(query, CANDIDATE_LIMIT)}
+        if len(query) >= 6:
+            # same halves test as for historical plates, so misread parked plates are found too
+            halves = (query[:len(query) // 2], query[len(query) // 2:])
+            candidates.update((plate, norm) for plate, norm in active.items()
+                              if halves[0] in norm or halves[1] in norm)
+        else:
+            candidates.update((plate, norm) for plate, norm in active.items() if query in norm)
+        for plate, norm in self._historical(query, versions.get('vehicles_master')):
+            candidates.setdefault(plate, norm)
+
+        typed = plain_plate(text)
+        ranked, fuzzy = [], []
+        for plate, norm in candidates.items():
+            plain = plain_plate(plate)
+            if plain == typed:
+                ranked.append((plate not in active, 0, 0, 0, len(norm), plate))
+            elif plain.startswith(typed):
+                ranked.append((plate not in active, 1, 0, 0, len(norm), plate))
+            elif typed in plain:
+                ranked.append((plate not in active, 2, 0, 0, len(norm), plate))
+            else:
+                fuzzy.append((plate, norm))
+
+        max_distance = 1 if len(query) < 8 else 2
+        grams = trigrams(query)
+        fuzzy.sort(key=lambda item: (item[0] not in active, -len(grams & trigrams(item[1]))))
+        found = 0
+        for plate, norm in fuzzy[:FUZZY_CANDIDATES]:
+            distance = substring_distance(query, norm)
+            if distance <= max_distance:
+                ranked.append((plate not in active, 3, distance, substring_distance(typed, plain_plate(plate)),
+                               len(norm), plate))
+                found += 1
+                if found == limit:
+                    break
+        ranked.sort()
+        return [{'plate': plate, 'active': not inactive, 'match': ('exact', 'prefix', 'substring', 'fuzzy')[tier]}
+                for inactive, tier, _, _, _, plate in ranked[:limit]]
+
+
+plate_search = PlateSearch()
+
+
+def suggest_plates(text, limit=SUGGESTION_LIMIT):
+    """
+    Ranked plate suggestions for the exit tab (see PlateSearch)
+    """
+    try:
+        return plate_search.suggest(text, limit)
+
+    except Exception as e:
+        logging.error(f"Error searching plates: {e}")
+        return []
@@ -0,0 +1,198 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = 'parking_system.db'
+
+# How long a connection waits on a locked database before raising
+BUSY_TIMEOUT_MS = 5000
+
+# Attempts (each waiting up to BUSY_TIMEOUT_MS) before a locked database is
+# reported to the caller, and the base of the backoff between them
+BUSY_RETRIES = 5
+RETRY_BACKOFF_S = 0.05
+
+# Compiled statements kept per connection; every query in the database
+# package is a constant string, so they are prepared once and reused
+STATEMENT_CACHE_SIZE = 256
+
+
+class Repository:
+    """
+    Shared data-access object for the parking tables.
+
+    Owns one long-lived connection per thread, the statement cache on that
+    connection, and transactions. Connections run in autocommit mode and
+    every write goes through transaction(), which nests: the outermost block
+    issues BEGIN/COMMIT and inner blocks become SAVEPOINTs, so several
+    record functions called inside one ``with repo.transaction():`` share a
+    single unit of work.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path,
+                               timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def dedicated_connection(self):
+        """
+        Open a connection outside the per-thread pool, e.g. for a poller
+        that must see commits made by this process's other connections;
+        close() still closes it
+        """
+        return self._connect()
+
+    def connection(self):
+        """
+        Return this thread's connection, opening it on first use
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def close(self):
+        """
+        Close all connections (e.g. before switching to another database file)
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # owned by another thread; it is dropped with that thread
+                pass
+        self._local = threading.local()
+
+    def set_path(self, db_path):
+        """
+        Point the repository at another database file
+        """
+        self.close()
+        self.db_path = db_path
+
+    def in_transaction(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """
+        Unit of work: commit on success, roll back on error.
+
+        By default the write lock is taken up front (BEGIN IMMEDIATE): a
+        deferred transaction that reads and then writes cannot wait for the
+        lock and fails straight away with SQLITE_BUSY when another connection
+        committed in between. Pass ``immediate=False`` for read-only units of
+        work. Only the outermost block decides.
+        """
+        conn = self.connection()
+        depth = self._local.depth
+        if depth == 0:
+            conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        else:
+            conn.execute(f'SAVEPOINT uow_{depth}')
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth = depth
+            if not conn.in_transaction:
+                # SQLite already rolled the whole transaction back (e.g. SQLITE_FULL)
+                pass
+            elif depth == 0:
+                conn.execute('ROLLBACK')
+            else:
+                conn.execute(f'ROLLBACK TO uow_{depth}')
+                conn.execute(f'RELEASE uow_{depth}')
+            raise
+        else:
+            # a failed COMMIT or RELEASE (e.g. SQLITE_BUSY) leaves the transaction
+            # open: roll it back before depth says there is none, so a retry can BEGIN
+            try:
+                if depth == 0:
+                    conn.execute('COMMIT')
+                else:
+                    conn.execute(f'RELEASE uow_{depth}')
+            except BaseException:
+                if conn.in_transaction:
+                    if depth == 0:
+                        conn.execute('ROLLBACK')
+                    else:
+                        conn.execute(f'ROLLBACK TO uow_{depth}')
+                        conn.execute(f'RELEASE uow_{depth}')
+                raise
+            finally:
+                self._local.depth = depth
+
+    def execute(self, sql, params=()):
+        """
+        Run a write statement in its own (or the enclosing) transaction and return the cursor
+        """
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        with self.transaction() as conn:
+            return conn.executemany(sql, seq_of_params)
+
+    def cursor(self):
+        """
+        Cursor on this thread's connection, for reads outside an explicit transaction
+        """
+        return self.connection().cursor()
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def fetchvalue(self, sql, params=(), default=None):
+        """
+        Return the first column of the first row, or default when there is no row
+        """
+        row = self.fetchone(sql, params)
+        return row[0] if row else default
+
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_busy(work, description='write'):
+    """
+    Run work() and retry with jittered exponential backoff while the database is locked
+    """
+    for attempt in range(BUSY_RETRIES):
+        try:
+            return work()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == BUSY_RETRIES - 1:
+                raise
+            delay = RETRY_BACKOFF_S * (2 ** attempt) * (0.5 + random.random())
+            logging.warning(f"Database busy during {description}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+# single shared instance used by the record modules
+repo = Repository()
@@ -0,0 +1,163 @@
+import sys
+import time
+from datetime import datetime, timedelta
+from utils import setup_logging, to_epoch
+import logging
+from database.repository import repo, retry_on_busy
+
+# The retention purge deletes closed parking_history sessions older than
+# the cutoff a rowid range at a time, each range in its own short write
+# transaction, so park/exit at the gates wait for one batch at most instead
+# of the whole purge. Progress (cutoff and next id) is committed with every
+# batch in maintenance_state (migration 8): after a crash or a stop the next
+# run resumes where this one left off. The archiver (database/archive.py)
+# runs the same batches with a step that copies each range out first.
+
+# bounds of the id range deleted per batch; the first batch is the smallest
+PURGE_MIN_BATCH_IDS = 500
+PURGE_MAX_BATCH_IDS = 200000
+
+# gate wait (p99) the purge is tuned to stay under. A gate that finds the
+# lock taken polls it through SQLite's busy handler, whose sleeps grow (1,
+# 2, 5, 10 ms ...), so batches hold the write lock for at most this
+# fraction of the target, triggers and commit included
+PURGE_TARGET_MS = 20
+PURGE_HOLD_FRACTION = 0.15
+
+# pause between batches; at least twice as long as the last batch held the
+# lock, so a gate between two busy-handler sleeps still finds it free
+PURGE_MIN_PAUSE_S = 0.005
+
+
+def _state_keys(job):
+    return f'{job}.cutoff', f'{job}.next_id'
+
+
+def _load_state(job):
+    cutoff_key, next_key = _state_keys(job)
+    state = dict(repo.fetchall('SELECT name, value FROM maintenance_state WHERE name IN (?, ?)',
+                               (cutoff_key, next_key)))
+    if cutoff_key in state and next_key in state:
+        return state[cutoff_key], state[next_key]
+    return None
+
+
+def _save_state(conn, job, cutoff, next_id):
+    conn.executemany('INSERT OR REPLACE INTO maintenance_state (name, value) VALUES (?, ?)',
+                     zip(_state_keys(job), (cutoff, next_id)))
+
+
+def _clear_state(job):
+    repo.execute('DELETE FROM maintenance_state WHERE name IN (?, ?)', _state_keys(job))
+
+
+def _delete_batch(job, start, end, cutoff, before_delete):
+    # returns (rows deleted, seconds the write lock was held: from BEGIN
+    # IMMEDIATE returning to COMMIT returning, so the delete triggers' work
+    # is counted but waiting for the lock is not)
+    def attempt():
+        with repo.transaction(immediate=True) as conn:
+            locked = time.perf_counter()
+            if before_delete is not None:
+                before_delete(conn, start, end, cutoff)
+            # +exit_ts keeps the planner on the rowid range instead of the exit_ts index
+            deleted = conn.execute('''
+                DELETE FROM parking_history
+                WHERE id >= ? AND id < ? AND exit_ts IS NOT NULL AND +exit_ts < ?
+            ''', (start, end, cutoff)).rowcount
+            _save_state(conn, job, cutoff, end)
+        return deleted, time.perf_counter() - locked
+    return retry_on_busy(attempt, f'{job} batch')
+
+
+def purge_history(days=90, progress=None, should_stop=None, target_ms=PURGE_TARGET_MS):
+    """
+    Delete closed sessions that exited more than `days` ago, in bounded batches.
+
+    An interrupted purge is resumed with its original cutoff. progress, if
+    given, is called after each batch with (deleted so far, ids scanned,
+    ids to scan); should_stop() is checked before each batch, and a stopped
+    purge resumes on the next call. The batch size adapts so each batch
+    keeps gate waits under `target_ms`. Returns a dict with
+    'deleted', 'batches', 'resumed' and 'complete'.
+    """
+    return run_history_batches('purge_history', days, None, progress, should_stop, target_ms)
+
+
+def run_history_batches(job, days, before_delete=None, progress=None, should_stop=None,
+                        target_ms=PURGE_TARGET_MS):
+    """
+    Batch loop behind purge_history(), resumable under the name `job`
+
+    before_delete(conn, start, end, cutoff), if given, runs in each batch's
+    transaction ahead of the DELETE of ids [start, end).
+    """
+    state = _load_state(job)
+    resumed = state is not None
+    if resumed:
+        cutoff, next_id = state
+        logging.info(f"Resuming {job} from id {next_id}")
+    else:
+        cutoff = to_epoch(datetime.now() - timedelta(days=days))
+        next_id = repo.fetchvalue('SELECT MIN(id) FROM parking_history')
+
+    # a session entered after the cutoff cannot have exited before it
+    end_id = repo.fetchvalue('SELECT MAX(id) FROM parking_history WHERE entry_ts < ?', (cutoff,))
+    result = {'deleted': 0, 'batches': 0, 'resumed': resumed, 'complete': False}
+    if next_id is None or end_id is None or next_id > end_id:
+        _clear_state(job)
+        result['complete'] = True
+        return result
+
+    # start small and grow: the cost of a batch is only known once one has run
+    first_id, batch = next_id, PURGE_MIN_BATCH_IDS
+    hold_ms = target_ms * PURGE_HOLD_FRACTION
+    last_log = time.monotonic()
+    while next_id <= end_id:
+        if should_stop is not None and should_stop():
+            logging.info(f"{job} stopped at id {next_id}; the next run resumes there")
+            return result
+
+        end = min(next_id + batch, end_id + 1)
+        deleted, held = _delete_batch(job, next_id, end, cutoff, before_delete)
+        result['deleted'] += deleted
+        result['batches'] += 1
+        next_id = end
+
+        # keep each batch near the lock-time target
+        if held * 1000 > hold_ms:
+            batch = max(PURGE_MIN_BATCH_IDS, int(batch * hold_ms / (held * 1000) * 0.8))
+        elif held * 1000 < hold_ms / 2:
+            batch = min(PURGE_MAX_BATCH_IDS, batch * 2)
+
+        if progress is not None:
+            progress(result['deleted'], next_id - first_id, end_id + 1 - first_id)
+        if time.monotonic() - last_log >= 5:
+            logging.info(f"{job}: {result['deleted']} deleted, "
+                         f"id {next_id} of {end_id}, batch {batch} ids")
+            last_log = time.monotonic()
+
+        # move the batch out of the WAL now rather than in a gate's commit
+        # (autocheckpoint), then let waiting gate transactions take the lock
+        repo.connection().execute('PRAGMA wal_checkpoint(PASSIVE)')
+        time.sleep(max(PURGE_MIN_PAUSE_S, 2 * held))
+
+    _clear_state(job)
+    result['complete'] = True
+    logging.info(f"{job} done: {result['deleted']} sessions deleted in {result['batches']} batches")
+    return result
+
+
+if __name__ == '__main__':
+    setup_logging()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+
+    def show(deleted, scanned, total):
+        print(f"\r{deleted:,} deleted, {scanned * 100 // total}% scanned", end='', flush=True)
+
+    try:
+        summary = purge_history(days, progress=show)
+    except KeyboardInterrupt:
+        summary = {'complete': False}
+    print()
+    print(summary if summary['complete'] else 'Stopped; run again to resume')
@@ -0,0 +1,141 @@
+import time
+from utils import setup_logging
+import logging
+from database.repository import repo, retry_on_busy
+
+# daily_summary (migration 9) holds per-zone, per-day aggregates so reports
+# do not scan parking_history. Sessions are rolled up once they are closed:
+# update_daily_summary() adds the sessions that exited since the watermark
+# (an exit_ts kept in maintenance_state) to the row of the day they entered,
+# along with a histogram of their durations in daily_duration_hist.
+# Peak occupancy and the occupied/available snapshot are kept up to date by
+# a trigger on zone_counters instead. A row the rollup creates takes its
+# peak from the hourly occupancy series (database/occupancy.py, replayed
+# from the history's entry and exit times), and a snapshot only if it is
+# today's; days before have none (NULL, migration 12). Sessions archived
+# or purged before their first rollup are not counted.
+
+WATERMARK = 'daily_rollup.exit_ts'
+
+# exit_ts seconds rolled up per transaction, so catching up on a long
+# history holds the write lock in short steps
+ROLLUP_WINDOW_S = 86400
+
+# sessions that exited within this many seconds are left for the next run,
+# so a write still in flight with an older exit_ts is not skipped
+ROLLUP_LAG_S = 60
+
+# width of a daily_duration_hist bucket; percentiles are given to this resolution
+DURATION_BUCKET_MIN = 5
+
+
+def day_peak_sql(day, zone):
+    """
+    SQL expression for the most slots of a zone occupied during a local day
+    ('YYYY-MM-DD'), from occupancy_hourly: the day's highest hour, or the
+    occupancy carried into it. day and zone are qualified column names.
+    """
+    # the 'utc' modifier reads the date as local midnight, like utils.to_epoch()
+    midnight = f"CAST(strftime('%s', {day}, 'utc') AS INTEGER)"
+    next_midnight = f"CAST(strftime('%s', {day}, '+1 day', 'utc') AS INTEGER)"
+    return f'''MAX(
+        COALESCE((SELECT oh.closing FROM occupancy_hourly oh
+                  WHERE oh.zone = {zone} AND oh.hour_ts < {midnight}
+                  ORDER BY oh.hour_ts DESC LIMIT 1), 0),
+        COALESCE((SELECT MAX(oh.high) FROM occupancy_hourly oh
+                  WHERE oh.zone = {zone} AND oh.hour_ts >= {midnight} AND oh.hour_ts < {next_midnight}), 0))'''
+
+
+def _roll_window(conn, start, end):
+    rolled = conn.execute(f'''
+        INSERT INTO daily_summary
+            (date, zone, total_slots, occupied, available, peak_occupied, sessions, total_duration_min)
+        SELECT d.day, d.zone,
+               CASE WHEN d.day = date('now', 'localtime') THEN zc.total END,
+               CASE WHEN d.day = date('now', 'localtime') THEN zc.occupied END,
+               CASE WHEN d.day = date('now', 'localtime') THEN zc.total - zc.occupied END,
+               {day_peak_sql('d.day', 'd.zone')},
+               d.sessions, d.total_duration
+        FROM (SELECT substr(entry_time, 1, 10) AS day, zone, COUNT(*) AS sessions,
+                     SUM(duration_min) AS total_duration
+              FROM parking_history
+              WHERE exit_ts >= ? AND exit_ts < ? AND duration_min IS NOT NULL
+              GROUP BY 1, 2) AS d
+        LEFT JOIN zone_counters zc ON zc.zone = d.zone
+        WHERE true
+        ON CONFLICT (date, zone) DO UPDATE SET
+            sessions = sessions + excluded.sessions,
+            total_duration_min = total_duration_min + excluded.total_duration_min,
+            peak_occupied = MAX(peak_occupied, excluded.peak_occupied)
+    ''', (start, end)).rowcount
+    conn.execute('''
+        INSERT INTO daily_duration_hist (date, zone, bucket, sessions)
+        SELECT substr(entry_time, 1, 10), zone, duration_min / ?, COUNT(*)
+        FROM parking_history
+        WHERE exit_ts >= ? AND exit_ts < ? AND duration_min IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT (date, zone, bucket) DO UPDATE SET sessions = sessions + excluded.sessions
+    ''', (DURATION_BUCKET_MIN, start, end))
+    conn.execute('INSERT OR REPLACE INTO maintenance_state (name, value) VALUES (?, ?)',
+                 (WATERMARK, end))
+    return rolled
+
+
+def _roll_next(upto):
+    with repo.transaction(immediate=True) as conn:
+        # read under the write lock: another terminal may have just rolled up
+        row = conn.execute('SELECT value FROM maintenance_state WHERE name = ?', (WATERMARK,)).fetchone()
+        start = row[0] if row else conn.execute(
+            'SELECT MIN(exit_ts) FROM parking_history WHERE exit_ts IS NOT NULL').fetchone()[0]
+        if start is None or start >= upto:
+            return None
+        return _roll_window(conn, start, min(start + ROLLUP_WINDOW_S, upto))
+
+
+def update_daily_summary(now=None):
+    """
+    Roll sessions that exited since the last run into daily_summary
+
+    Cheap when there is nothing new; the first run rolls up the whole
+    history a day of exits at a time. Returns the number of (date, zone)
+    rows written.
+    """
+    upto = int(now if now is not None else time.time()) - ROLLUP_LAG_S
+    rolled = 0
+    while True:
+        result = retry_on_busy(lambda: _roll_next(upto), 'daily rollup')
+        if result is None:
+            return rolled
+        rolled += result
+
+
+def rebuild_daily_summary():
+    """
+    Recompute the session rollups from parking_history (e.g. after history was edited)
+    """
+    with repo.transaction() as conn:
+        conn.execute('UPDATE daily_summary SET sessions = 0, total_duration_min = 0')
+        conn.execute('DELETE FROM daily_duration_hist')
+        conn.execute('DELETE FROM maintenance_state WHERE name = ?', (WATERMARK,))
+    return update_daily_summary()
+
+
+def duration_percentile(buckets, fraction):
+    """
+    Duration in minutes (upper edge of its bucket) below which `fraction` of
+    the sessions in a {bucket: sessions} histogram fall
+    """
+    total = sum(buckets.values())
+    if not total:
+        return None
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= fraction * total:
+            return (bucket + 1) * DURATION_BUCKET_MIN
+    return None
+
+
+if __name__ == '__main__':
+    setup_logging()
+    print(f"{update_daily_summary()} daily summary rows updated")
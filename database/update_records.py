@@ -0,0 +1,166 @@
+from datetime import datetime
+from utils import setup_logging, to_epoch
+import logging
+from database.repository import repo, retry_on_busy
+from parking_logic import allocator, DEFAULT_STRATEGY, ROW_SIZE
+from database.active_cache import active_cache
+
+# Park/exit run in BEGIN IMMEDIATE transactions, so two gate terminals
+# sharing the DB file serialize on the write lock instead of racing for a
+# slot; retry_on_busy() bounds how often a still-locked database is retried.
+
+
+def _claim_slot(conn, zone, vehicle_number, entry_time, prefer_corner=False, strategy=None, vehicle_type=None):
+    """
+    Claim a free slot with a conditional UPDATE; returns the slot id or None when the zone is full
+    """
+    strategy = strategy or ('corner' if prefer_corner else DEFAULT_STRATEGY)
+    candidate = allocator.allocate(zone, strategy=strategy, vehicle_type=vehicle_type)
+    if candidate is not None:
+        claimed = conn.execute('''
+            UPDATE slots SET is_occupied = 1, vehicle_num = ?, entry_time = ?
+            WHERE slot_id = ? AND zone = ? AND is_occupied = 0
+        ''', (vehicle_number, entry_time, candidate, zone)).rowcount
+        if claimed:
+            return candidate
+        # another terminal took it; the index is stale for this slot only
+
+    # Index empty or stale: take the next free slot straight from the table
+    order = 'slot_id DESC' if strategy == 'corner' else 'slot_id'
+    where, params = 'zone = ? AND is_occupied = 0', [zone]
+    source = 'slots'
+    if strategy == 'type_matched':
+        where += ' AND (slot_type = ? OR slot_type IS NULL)'
+        params.append(vehicle_type)
+        order = 'slot_type IS NULL, ' + order
+    elif strategy == 'balanced':
+        # rows as BalancedRows sees them: least occupied share first, ties to the front row
+        source = f'''(
+            SELECT slot_id, zone, is_occupied,
+                   AVG(is_occupied) OVER row_slots AS share, MIN(slot_id) OVER row_slots AS row_start
+            FROM slots WHERE zone = ?
+            WINDOW row_slots AS (PARTITION BY COALESCE(location, (slot_id - 1) / {ROW_SIZE})))'''
+        params.insert(0, zone)
+        order = 'share, row_start, ' + order
+    row = conn.execute(f'''
+        SELECT slot_id FROM {source}
+        WHERE {where}
+        ORDER BY {order} LIMIT 1
+    ''', params).fetchone()
+    if not row:
+        return None
+    conn.execute('''
+        UPDATE slots SET is_occupied = 1, vehicle_num = ?, entry_time = ?
+        WHERE slot_id = ? AND is_occupied = 0
+    ''', (vehicle_number, entry_time, row[0]))
+    allocator.occupy(zone, row[0])
+    return row[0]
+
+
+def park_vehicle(vehicle_number, vehicle_type, category, zone, prefer_corner=False, strategy=None):
+    """
+    Park a vehicle in one transaction: claim a slot, upsert the vehicle,
+    open the session.
+
+    The slot is chosen by the named parking_logic strategy (by default
+    DEFAULT_STRATEGY, or 'corner' with prefer_corner).
+
+    Returns a dict whose 'status' is 'parked' (with slot_id, zone and
+    entry_time), 'already_parked', 'no_slot' or 'error'.
+    """
+    def attempt():
+        now = datetime.now()
+        entry_time = now.isoformat()
+        slot_id = None
+        try:
+            with repo.transaction(immediate=True) as conn:
+                if conn.execute('SELECT 1 FROM active_vehicles WHERE vehicle_number = ?',
+                                (vehicle_number,)).fetchone():
+                    return {'status': 'already_parked'}
+
+                slot_id = _claim_slot(conn, zone, vehicle_number, entry_time, prefer_corner,
+                                      strategy, vehicle_type)
+                if slot_id is None:
+                    return {'status': 'no_slot', 'zone': zone}
+
+                conn.execute('''
+                    INSERT INTO vehicles_master
+                    (vehicle_number, vehicle_type, category, first_entry, last_slot)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (vehicle_number) DO UPDATE
+                    SET vehicle_type = excluded.vehicle_type,
+                        category = excluded.category,
+                        last_slot = excluded.last_slot
+                ''', (vehicle_number, vehicle_type, category, entry_time, f'Slot {slot_id}'))
+                conn.execute('''
+                    INSERT INTO active_vehicles (vehicle_number, slot_id, zone, entry_time)
+                    VALUES (?, ?, ?, ?)
+                ''', (vehicle_number, slot_id, zone, entry_time))
+                conn.execute('''
+                    INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time, entry_ts)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (vehicle_number, slot_id, zone, entry_time, to_epoch(now)))
+        except Exception:
+            if slot_id is not None:
+                # rolled back, so the slot is still free in the table
+                allocator.release(zone, slot_id)
+            raise
+
+        active_cache.invalidate(vehicle_number)
+        return {'status': 'parked', 'slot_id': slot_id, 'zone': zone, 'entry_time': entry_time}
+
+    try:
+        return retry_on_busy(attempt, f"park of {vehicle_number}")
+    except Exception as e:
+        logging.error(f"Error parking vehicle: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+
+def exit_vehicle(vehicle_number):
+    """
+    Close a vehicle's session in one transaction: free the slot, drop the
+    active row, stamp exit time and duration on the open history row.
+
+    Returns a dict whose 'status' is 'exited' (with slot_id, zone, exit_time,
+    duration_min and the vehicle's visits and avg_duration_min so far),
+    'not_found' or 'error'.
+    """
+    def attempt():
+        with repo.transaction(immediate=True) as conn:
+            row = conn.execute('''
+                SELECT slot_id, zone, entry_time FROM active_vehicles
+                WHERE vehicle_number = ?
+            ''', (vehicle_number,)).fetchone()
+            if not row:
+                return {'status': 'not_found'}
+
+            slot_id, zone, entry_time = row
+            now = datetime.now()
+            duration = int((now - datetime.fromisoformat(entry_time)).total_seconds() / 60)
+            exit_time = now.isoformat()
+
+            conn.execute('DELETE FROM active_vehicles WHERE vehicle_number = ?', (vehicle_number,))
+            conn.execute('''
+                UPDATE slots SET is_occupied = 0, vehicle_num = NULL, entry_time = NULL
+                WHERE slot_id = ? AND vehicle_num = ?
+            ''', (slot_id, vehicle_number))
+            conn.execute('''
+                UPDATE parking_history SET exit_time = ?, exit_ts = ?, duration_min = ?
+                WHERE vehicle_num = ? AND exit_time IS NULL
+            ''', (exit_time, to_epoch(now), duration, vehicle_number))
+            # running stats, just updated by the history trigger (migration 11)
+            visits, avg_duration = conn.execute(
+                'SELECT visits, avg_duration FROM vehicles_master WHERE vehicle_number = ?',
+                (vehicle_number,)).fetchone() or (0, None)
+
+        allocator.release(zone, slot_id)
+        active_cache.invalidate(vehicle_number)
+        return {'status': 'exited', 'slot_id': slot_id, 'zone': zone,
+                'exit_time': exit_time, 'duration_min': duration,
+                'visits': visits, 'avg_duration_min': avg_duration}
+
+    try:
+        return retry_on_busy(attempt, f"exit of {vehicle_number}")
+    except Exception as e:
+        logging.error(f"Error exiting vehicle: {e}")
+        return {'status': 'error', 'error': str(e)}
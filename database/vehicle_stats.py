@@ -0,0 +1,142 @@
+import math
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# Per-vehicle running aggregates on vehicles_master (migration 11), updated
+# by a trigger on parking_history as each session is closed, so a vehicle's
+# profile is one row read instead of a scan of its history:
+#   visits          closed sessions
+#   avg_duration    mean duration in minutes
+#   duration_m2     sum of squared deviations from the mean (Welford), so
+#                   the variance is duration_m2 / (visits - 1)
+#   last_visit      exit_time of the latest closed session
+#   favourite_zone  zone with the most visits; on a tie, the zone that got
+#                   there first keeps it
+# vehicle_zone_visits holds the per-zone visit counts behind favourite_zone.
+# Purging or archiving history leaves the aggregates alone; a backfill only
+# sees the sessions still in parking_history.
+
+
+def _merge_sessions(conn, where, params=()):
+    # One pass over the selected sessions into per-(vehicle, zone) sums,
+    # merged into the running aggregates (Chan et al.'s pairwise update of
+    # count, mean and squared deviations). The chunk's squared deviations
+    # come from exact integer sums as (n * sum(x^2) - sum(x)^2) / n, and with
+    # a bare exit_time next to MAX(exit_ts) SQLite returns the latest session's
+    conn.execute('DROP TABLE IF EXISTS temp.zone_sessions')
+    conn.execute(f'''
+        CREATE TEMP TABLE zone_sessions AS
+        SELECT vehicle_num, zone, COUNT(*) AS n, SUM(duration_min) AS total,
+               SUM(duration_min * duration_min) AS squares,
+               MAX(exit_ts) AS last_exit_ts, exit_time AS last_exit_time
+        FROM parking_history {where} AND duration_min IS NOT NULL
+        GROUP BY vehicle_num, zone
+    ''', params)
+    conn.execute('''
+        INSERT INTO vehicle_zone_visits (vehicle_number, zone, visits)
+        SELECT vehicle_num, zone, n FROM zone_sessions WHERE true
+        ON CONFLICT (vehicle_number, zone) DO UPDATE SET visits = visits + excluded.visits
+    ''')
+    conn.execute('''
+        UPDATE vehicles_master SET
+            visits = visits + s.n,
+            avg_duration = COALESCE(avg_duration, 0)
+                + (s.total * 1.0 / s.n - COALESCE(avg_duration, 0)) * s.n / (visits + s.n),
+            duration_m2 = duration_m2 + (s.n * s.squares - s.total * s.total) * 1.0 / s.n
+                + (s.total * 1.0 / s.n - COALESCE(avg_duration, 0))
+                * (s.total * 1.0 / s.n - COALESCE(avg_duration, 0)) * visits * s.n / (visits + s.n),
+            last_visit = CASE WHEN last_visit IS NULL OR s.last_exit_time > last_visit
+                              THEN s.last_exit_time ELSE last_visit END
+        FROM (SELECT vehicle_num, SUM(n) AS n, SUM(total) AS total, SUM(squares) AS squares,
+                     MAX(last_exit_ts), last_exit_time
+              FROM zone_sessions GROUP BY vehicle_num) AS s
+        WHERE vehicles_master.vehicle_number = s.vehicle_num
+    ''')
+    # most visits wins; on a tie the current favourite stays, then the zone
+    # whose count peaked first, i.e. not visited in this chunk or visited
+    # last the earliest
+    conn.execute('''
+        UPDATE vehicles_master SET favourite_zone = f.zone
+        FROM (SELECT v.vehicle_number, v.zone,
+                     ROW_NUMBER() OVER (PARTITION BY v.vehicle_number
+                                        ORDER BY v.visits DESC, v.zone IS NOT m.favourite_zone,
+                                                 z.last_exit_ts, v.zone) AS rank
+              FROM vehicle_zone_visits v
+              JOIN vehicles_master m ON m.vehicle_number = v.vehicle_number
+              LEFT JOIN zone_sessions z ON z.vehicle_num = v.vehicle_number AND z.zone = v.zone
+              WHERE v.vehicle_number IN (SELECT vehicle_num FROM zone_sessions)) AS f
+        WHERE vehicles_master.vehicle_number = f.vehicle_number AND f.rank = 1
+    ''')
+    conn.execute('DROP TABLE temp.zone_sessions')
+
+
+def add_vehicle_stats(conn, start, end):
+    """
+    Add the closed sessions with history ids in [start, end) to the
+    aggregates, on an open transaction (migration 11's backfill batches)
+    """
+    _merge_sessions(conn, 'WHERE id >= ? AND id < ?', (start, end))
+
+
+def backfill_vehicle_stats(conn):
+    """
+    Recompute every vehicle's aggregates from the closed sessions in
+    parking_history, in bulk, on an open transaction
+    """
+    conn.execute('DELETE FROM vehicle_zone_visits')
+    conn.execute('''
+        UPDATE vehicles_master SET visits = 0, avg_duration = NULL, duration_m2 = 0,
+                                   last_visit = NULL, favourite_zone = NULL
+    ''')
+    # one sequential pass rather than the vehicle index
+    _merge_sessions(conn, 'NOT INDEXED WHERE true')
+
+
+def rebuild_vehicle_stats():
+    """
+    Recompute the aggregates from parking_history (e.g. after history was edited)
+
+    Runs in one write transaction, so no exit lands half-counted.
+    """
+    with repo.transaction(immediate=True) as conn:
+        backfill_vehicle_stats(conn)
+
+
+def get_vehicle_stats(vehicle_number):
+    """
+    Running aggregates of a vehicle's closed sessions, or None if it is unknown
+
+    Returns a dict with visits, avg_duration_min, stddev_duration_min
+    (sample; None under two visits), last_visit, favourite_zone and
+    zone_visits ({zone: visits}).
+    """
+    try:
+        row = repo.fetchone('''
+            SELECT visits, avg_duration, duration_m2, last_visit, favourite_zone
+            FROM vehicles_master WHERE vehicle_number = ?
+        ''', (vehicle_number,))
+        if not row:
+            return None
+        visits, mean, m2, last_visit, favourite_zone = row
+        zone_visits = dict(repo.fetchall(
+            'SELECT zone, visits FROM vehicle_zone_visits WHERE vehicle_number = ? ORDER BY zone',
+            (vehicle_number,)))
+        return {
+            'visits': visits,
+            'avg_duration_min': mean if visits else None,
+            'stddev_duration_min': math.sqrt(max(m2, 0) / (visits - 1)) if visits > 1 else None,
+            'last_visit': last_visit,
+            'favourite_zone': favourite_zone,
+            'zone_visits': zone_visits
+        }
+
+    except Exception as e:
+        logging.error(f"Error getting vehicle stats: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    setup_logging()
+    rebuild_vehicle_stats()
+    print(f"{repo.fetchvalue('SELECT COUNT(*) FROM vehicles_master WHERE visits > 0')} vehicles with stats rebuilt")
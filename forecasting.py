@@ -0,0 +1,209 @@
+import sys
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from utils import setup_logging
+import logging
+from database.repository import repo
+from database.history_columns import history_columns
+
+# Short-term occupancy forecast per zone from the arrival and departure
+# patterns in the history columns (database/history_columns.py).
+#
+# History is binned into local quarter hours: per zone, the arrivals,
+# departures and occupancy at the start of each bin over the last
+# PROFILE_WEEKS weeks. refresh() bins only the quarter hours completed
+# since the previous call. The profiles average those bins by weekday
+# and quarter hour:
+#   arrival rate     mean arrivals in the quarter hour
+#   departure rate   share of the cars there (at the start or arriving)
+#                    that left during it
+# A forecast starts from the cars parked now (active_vehicles) and steps
+# through the coming quarter hours adding the expected arrivals and
+# removing the expected share of departures, capped at the zone's slots.
+
+# quarter hours, the profile resolution (UTC offsets are whole quarter hours,
+# so a UTC quarter hour is also a local one)
+BIN_S = 900
+WEEK_SLOTS = 7 * 96
+WEEK_S = 7 * 86400
+
+# weeks of history the profiles average over
+PROFILE_WEEKS = 8
+
+# hours ahead the dashboard projects
+HORIZON_HOURS = 4
+
+# quarter hours that ended less than this many seconds ago are binned on a
+# later refresh, so an exit still being written is not missed
+FORECAST_LAG_S = 60
+
+
+def week_slots(starts):
+    """
+    Local weekday (Monday = 0) * 96 + quarter hour of the day for an array of Unix times
+    """
+    return np.array([moment.tm_wday * 96 + moment.tm_hour * 4 + moment.tm_min // 15
+                     for moment in map(time.localtime, starts.tolist())], dtype=np.int64)
+
+
+def _bin_events(zones, seconds, start, stop, zone_count):
+    # events per zone and quarter hour in [start, stop)
+    count = (stop - start) // BIN_S
+    inside = (seconds >= start) & (seconds < stop)
+    cells = zones[inside].astype(np.int64) * count + (seconds[inside] - start) // BIN_S
+    return np.bincount(cells, minlength=zone_count * count).reshape(zone_count, count)
+
+
+class OccupancyForecaster:
+    """
+    Per-zone arrival/departure profiles, binned incrementally from the
+    history columns, and occupancy projections from them
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, start):
+        self._zones = []
+        self._end = start  # start of the first quarter hour not binned yet
+        self._slots = np.zeros(0, np.int64)
+        self._arrivals = np.zeros((0, 0), np.int64)
+        self._departures = np.zeros((0, 0), np.int64)
+        self._occupied = np.zeros((0, 0), np.int64)
+
+    def refresh(self, now=None):
+        """
+        Bin the quarter hours completed since the last refresh; returns how many
+        """
+        upto = (int(now if now is not None else time.time()) - FORECAST_LAG_S) // BIN_S * BIN_S
+        first = upto - PROFILE_WEEKS * WEEK_S
+        cols = history_columns.columns()
+        names = cols['zone_names']
+
+        with self._lock:
+            if self._end is None or self._end < first or names[:len(self._zones)] != self._zones:
+                # nothing binned in the window yet, or the mirror was rebuilt
+                self._reset(first)
+            start = self._end
+            if upto <= start:
+                return 0
+
+            zones, entry, exit_ts = cols['zone'], cols['entry_ts'], cols['exit_ts']
+            parked = (entry < start) & ((exit_ts >= start) | (exit_ts == 0))
+            opening = np.bincount(zones[parked], minlength=len(names))
+            arrivals = _bin_events(zones, entry, start, upto, len(names))
+            departures = _bin_events(zones, exit_ts, start, upto, len(names))
+            change = arrivals - departures
+            occupied = opening[:, None] + np.cumsum(change, axis=1) - change
+
+            # bins that fell out of the window are dropped; zones first seen
+            # now get empty rows for the bins before
+            drop = (first - (start - len(self._slots) * BIN_S)) // BIN_S
+            grow = ((0, len(names) - len(self._zones)), (0, 0))
+            self._arrivals = np.hstack((np.pad(self._arrivals, grow)[:, drop:], arrivals))
+            self._departures = np.hstack((np.pad(self._departures, grow)[:, drop:], departures))
+            self._occupied = np.hstack((np.pad(self._occupied, grow)[:, drop:], occupied))
+            self._slots = np.concatenate((self._slots[drop:], week_slots(np.arange(start, upto, BIN_S))))
+            self._zones = list(names)
+            self._end = upto
+            return (upto - start) // BIN_S
+
+    def profiles(self):
+        """
+        Zone names and, per zone and week slot (see week_slots), the mean
+        arrivals per quarter hour and the share of cars that leave in it
+        """
+        with self._lock:
+            zones, slots = self._zones, self._slots
+            arrivals, departures, occupied = self._arrivals, self._departures, self._occupied
+        seen = np.maximum(np.bincount(slots, minlength=WEEK_SLOTS), 1)
+        rates = np.zeros((len(zones), WEEK_SLOTS))
+        leaving = np.zeros((len(zones), WEEK_SLOTS))
+        for code in range(len(zones)):
+            arrived = np.bincount(slots, weights=arrivals[code], minlength=WEEK_SLOTS)
+            present = np.bincount(slots, weights=occupied[code], minlength=WEEK_SLOTS) + arrived
+            left = np.bincount(slots, weights=departures[code], minlength=WEEK_SLOTS)
+            rates[code] = arrived / seen
+            leaving[code] = np.minimum(left / np.maximum(present, 1), 1)
+        return zones, rates, leaving
+
+    def project(self, occupied, capacity, now=None, hours=HORIZON_HOURS):
+        """
+        Expected occupancy per zone over the next `hours`, in quarter hours
+
+        occupied and capacity are {zone: cars parked now} and {zone: slots}.
+        Returns one dict per zone of `capacity` with zone, capacity,
+        occupied, 'times' (list of the Unix time each quarter hour ends),
+        'projected' (list of the expected cars then) and 'full_at' (the
+        first of those times at which the zone is expected full, or None).
+        """
+        now = now if now is not None else time.time()
+        zones, rates, leaving = self.profiles()
+        codes = {zone: code for code, zone in enumerate(zones)}
+        names = sorted(capacity)
+        rows = [codes.get(zone, -1) for zone in names]
+        # zones without history get a profile of no arrivals or departures
+        rates = np.vstack((rates, np.zeros(WEEK_SLOTS)))[rows]
+        leaving = np.vstack((leaving, np.zeros(WEEK_SLOTS)))[rows]
+
+        begin = int(now) // BIN_S * BIN_S
+        starts = np.arange(begin, begin + hours * 3600, BIN_S)
+        slots = week_slots(starts)
+        # the current quarter hour is partly over
+        share = np.ones(len(starts))
+        share[0] = (begin + BIN_S - now) / BIN_S
+
+        limit = np.array([capacity[zone] for zone in names], dtype=np.float64)
+        expected = np.array([occupied.get(zone, 0) for zone in names], dtype=np.float64)
+        projected = np.zeros((len(names), len(starts)))
+        for step, slot in enumerate(slots):
+            expected = expected + rates[:, slot] * share[step]
+            expected = np.minimum(expected * (1 - leaving[:, slot] * share[step]), limit)
+            projected[:, step] = expected
+
+        times = starts + BIN_S
+        result = []
+        for index, zone in enumerate(names):
+            full = np.flatnonzero(projected[index] >= limit[index] - 0.5) if limit[index] else []
+            result.append({'zone': zone, 'capacity': capacity[zone], 'occupied': occupied.get(zone, 0),
+                           'times': times.tolist(), 'projected': projected[index].tolist(),
+                           'full_at': int(times[full[0]]) if len(full) else None})
+        return result
+
+    def forecast(self, now=None, hours=HORIZON_HOURS):
+        """
+        project() from the cars parked now, after binning new history
+        """
+        self.refresh(now)
+        capacity = dict(repo.fetchall('SELECT zone, total FROM zone_counters'))
+        occupied = dict(repo.fetchall('SELECT zone, COUNT(*) FROM active_vehicles GROUP BY zone'))
+        return self.project(occupied, capacity, now, hours)
+
+
+# single shared instance
+forecaster = OccupancyForecaster()
+
+
+def get_dashboard_forecast():
+    """
+    forecaster.forecast() for the dashboard, or None on failure
+    """
+    try:
+        return forecaster.forecast()
+
+    except Exception as e:
+        logging.error(f"Error forecasting occupancy: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    setup_logging()
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else HORIZON_HOURS
+    for row in forecaster.forecast(hours=hours):
+        steps = ', '.join(f"{datetime.fromtimestamp(moment):%H:%M} {value:.0f}"
+                          for moment, value in zip(row['times'][3::4], row['projected'][3::4]))
+        full = f"{datetime.fromtimestamp(row['full_at']):%H:%M}" if row['full_at'] else 'not expected'
+        print(f"Zone {row['zone']}: {row['occupied']}/{row['capacity']} now; {steps}; full {full}")
@@ -1,10 +1,21 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QPushButton, QTabWidget, QTableWidget, QTableWidgetItem,
-                             QLineEdit, QComboBox, QMessageBox, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer
-import sqlite3
-from datetime import datetime
+                             QLabel, QPushButton, QTabWidget, QTableView,
+                             QLineEdit, QComboBox, QMessageBox, QGridLayout, QCompleter)
+from PyQt5.QtCore import Qt, QTimer, QStringListModel
 from PyQt5.QtGui import QFont
+from datetime import datetime
+from database import update_records, fetch_records
+from database.change_monitor import ChangeMonitor, POLL_INTERVAL_MS
+from database.active_cache import active_cache
+from database.plate_search import suggest_plates
+from table_models import RowTableModel, HistoryTableModel, HeatmapTableModel
+import reports
+import forecasting
+import parking_logic
+from query_executor import shared_executor, LatencyOverlay, DEBUG_QUERIES
+
+
+FORECAST_INTERVAL_MS = 5 * 60 * 1000
 
 
 class DashboardWindow(QMainWindow):
@@ -14,7 +25,11 @@ class DashboardWindow(QMainWindow):
         self.role = role
         self.setWindowTitle(f'Parking Dashboard - {self.username}')
         self.setGeometry(100, 100, 1200, 800)
+        # every database call runs on the executor's worker threads
+        self.executor = shared_executor()
         self.init_ui()
+        if DEBUG_QUERIES:
+            self.latency_overlay = LatencyOverlay(self, self.executor)
         self.setup_timer()
         self.load_dashboard_data()
 
@@ -34,16 +49,20 @@ class DashboardWindow(QMainWindow):
         self.tab_vehicle_entry = QWidget()
         self.tab_vehicle_exit = QWidget()
         self.tab_history = QWidget()
+        self.tab_reports = QWidget()
 
         self.tabs.addTab(self.tab_dashboard, "📊 Dashboard")
         self.tabs.addTab(self.tab_vehicle_entry, "🚗 Vehicle Entry")
         self.tabs.addTab(self.tab_vehicle_exit, "🚪 Vehicle Exit")
         self.tabs.addTab(self.tab_history, "📋 History")
+        self.tabs.addTab(self.tab_reports, "📈 Reports")
 
         self.init_dashboard_tab()
         self.init_vehicle_entry_tab()
         self.init_vehicle_exit_tab()
         self.init_history_tab()
+        self.init_reports_tab()
+        self.tabs.currentChanged.connect(self.tab_changed)
 
         v_layout.addWidget(self.tabs)
         main_widget.setLayout(v_layout)
@@ -78,11 +97,26 @@ class DashboardWindow(QMainWindow):
         layout.addLayout(stats_layout)
 
         # Zone info table
-        self.zone_table = QTableWidget()
-        self.zone_table.setColumnCount(4)
-        self.zone_table.setHorizontalHeaderLabels(['Zone', 'Total Slots', 'Occupied', 'Available'])
+        self.zone_model = RowTableModel(['Zone', 'Total Slots', 'Occupied', 'Available'],
+                                        [lambda row: f"Zone {row[0]}", 1, 2, 3])
+        self.zone_table = QTableView()
+        self.zone_table.setModel(self.zone_model)
         layout.addWidget(self.zone_table)
 
+        # expected cars per zone over the next hours, from forecasting's weekday profiles
+        hours = range(1, forecasting.HORIZON_HOURS + 1)
+        expected = lambda hour: lambda row: f"{row['projected'][hour * 4 - 1]:.0f}"
+        full_at = lambda row: f"{datetime.fromtimestamp(row['full_at']):%H:%M}" if row['full_at'] else '-'
+        self.forecast_model = RowTableModel(
+            ['Zone', 'Now'] + [f'+{hour}h' for hour in hours] + ['Full by'],
+            [lambda row: f"Zone {row['zone']}", lambda row: f"{row['occupied']}/{row['capacity']}"]
+            + [expected(hour) for hour in hours] + [full_at],
+            key=lambda row: row['zone'])
+        self.forecast_table = QTableView()
+        self.forecast_table.setModel(self.forecast_model)
+        layout.addWidget(QLabel('Occupancy forecast'))
+        layout.addWidget(self.forecast_table)
+
         self.tab_dashboard.setLayout(layout)
 
     def init_vehicle_entry_tab(self):
@@ -108,10 +142,18 @@ class DashboardWindow(QMainWindow):
         self.entry_category.addItems(['Student', 'Faculty', 'VIP'])
         grid.addWidget(self.entry_category, 2, 1)
 
+        # Slot choice (parking_logic strategies)
+        grid.addWidget(QLabel('Slot Choice:'), 3, 0)
+        self.entry_strategy = QComboBox()
+        for name, label in parking_logic.STRATEGY_LABELS.items():
+            self.entry_strategy.addItem(label, name)
+        self.entry_strategy.setCurrentIndex(self.entry_strategy.findData(parking_logic.DEFAULT_STRATEGY))
+        grid.addWidget(self.entry_strategy, 3, 1)
+
         # Park button
-        park_btn = QPushButton('Park Vehicle')
-        park_btn.clicked.connect(self.park_vehicle)
-        grid.addWidget(park_btn, 3, 0, 1, 2)
+        self.park_btn = QPushButton('Park Vehicle')
+        self.park_btn.clicked.connect(self.park_vehicle)
+        grid.addWidget(self.park_btn, 4, 0, 1, 2)
 
         form.setLayout(grid)
         layout.addWidget(form)
@@ -128,18 +170,26 @@ class DashboardWindow(QMainWindow):
         grid.addWidget(QLabel('Vehicle Number:'), 0, 0)
         grid.addWidget(self.exit_vehicle_num_input, 0, 1)
 
-        exit_btn = QPushButton('Exit Vehicle')
-        exit_btn.clicked.connect(self.exit_vehicle)
-        grid.addWidget(exit_btn, 1, 0, 1, 2)
+        # Plate suggestions as the operator types, ranked by plate_search (parked first)
+        self.plate_suggestions = QStringListModel()
+        self.plate_completer = QCompleter(self.plate_suggestions, self)
+        self.plate_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.plate_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.exit_vehicle_num_input.setCompleter(self.plate_completer)
+        self.exit_vehicle_num_input.textEdited.connect(self.search_plates)
+
+        self.exit_btn = QPushButton('Exit Vehicle')
+        self.exit_btn.clicked.connect(self.exit_vehicle)
+        grid.addWidget(self.exit_btn, 1, 0, 1, 2)
 
         form.setLayout(grid)
         layout.addWidget(form)
 
         # Current parking
         lbl_current = QLabel('Currently Parked Vehicles:')
-        self.table_current = QTableWidget()
-        self.table_current.setColumnCount(5)
-        self.table_current.setHorizontalHeaderLabels(['Vehicle', 'Type', 'Category', 'Slot', 'Entry'])
+        self.current_model = RowTableModel(['Vehicle', 'Type', 'Category', 'Slot', 'Entry'])
+        self.table_current = QTableView()
+        self.table_current.setModel(self.current_model)
         layout.addWidget(lbl_current)
         layout.addWidget(self.table_current)
 
@@ -147,68 +197,161 @@ class DashboardWindow(QMainWindow):
 
     def init_history_tab(self):
         layout = QVBoxLayout()
-        self.table_history = QTableWidget()
-        self.table_history.setColumnCount(7)
-        self.table_history.setHorizontalHeaderLabels(['Vehicle', 'Type', 'Category', 'Slot', 'Entry', 'Exit', 'Duration'])
+        # pages are fetched by the view (fetchMore) as the user scrolls towards the bottom
+        self.history_model = HistoryTableModel(executor=self.executor)
+        self.table_history = QTableView()
+        self.table_history.setModel(self.history_model)
         layout.addWidget(QLabel('Parking History'))
         layout.addWidget(self.table_history)
         self.tab_history.setLayout(layout)
 
+    def init_reports_tab(self):
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        self.report_zone = QComboBox()
+        self.report_kind = QComboBox()
+        self.report_kind.addItems(['Arrivals', 'Departures'])
+        self.report_refresh_btn = QPushButton('Recompute')
+        self.report_refresh_btn.clicked.connect(self.load_report)
+        controls.addWidget(QLabel('Zone:'))
+        controls.addWidget(self.report_zone)
+        controls.addWidget(self.report_kind)
+        controls.addStretch()
+        controls.addWidget(self.report_refresh_btn)
+        layout.addLayout(controls)
+
+        # weekday x hour counts over the last reports.REPORT_DAYS days
+        self.heatmap_model = HeatmapTableModel(reports.WEEKDAYS, [f'{hour:02d}' for hour in range(24)])
+        self.table_heatmap = QTableView()
+        self.table_heatmap.setModel(self.heatmap_model)
+        self.table_heatmap.horizontalHeader().setDefaultSectionSize(40)
+        self.busiest_label = QLabel('')
+        layout.addWidget(QLabel(f'Busiest hours, last {reports.REPORT_DAYS} days'))
+        layout.addWidget(self.table_heatmap)
+        layout.addWidget(self.busiest_label)
+
+        minutes = lambda field: lambda row: f"{row[field]:.0f}"
+        self.dwell_model = RowTableModel(
+            ['Zone', 'Category', 'Sessions', 'Mean (min)', 'Median', 'p90', 'p95', 'p99'],
+            ['zone', 'category', 'sessions', minutes('mean'), minutes('p50'),
+             minutes('p90'), minutes('p95'), minutes('p99')],
+            key=lambda row: (row['zone'], row['category']))
+        self.table_dwell = QTableView()
+        self.table_dwell.setModel(self.dwell_model)
+        layout.addWidget(QLabel('Dwell time'))
+        layout.addWidget(self.table_dwell)
+
+        self.report = None
+        self.report_zone.currentIndexChanged.connect(self.show_heatmap)
+        self.report_kind.currentIndexChanged.connect(self.show_heatmap)
+        self.tab_reports.setLayout(layout)
+
     def setup_timer(self):
+        # Poll for commits from any terminal; only widgets showing a changed table reload
+        self.monitor = ChangeMonitor()
+        self.monitor.poll()
         self.timer = QTimer()
-        self.timer.timeout.connect(self.load_dashboard_data)
-        self.timer.start(30000)  # refresh every 30 sec
+        self.timer.timeout.connect(self.refresh_changed)
+        self.timer.start(POLL_INTERVAL_MS)
+        # the forecast also moves on as time passes, not only on parks and exits
+        self.forecast_timer = QTimer()
+        self.forecast_timer.timeout.connect(self.load_forecast)
+        self.forecast_timer.start(FORECAST_INTERVAL_MS)
+
+    def refresh_changed(self):
+        changed = self.monitor.poll()
+        if not changed:
+            return
+        if changed & {'slots', 'vehicles_master'}:
+            self.load_stats()
+        if 'slots' in changed:
+            self.load_zones()
+            self.load_forecast()
+        if 'active_vehicles' in changed:
+            # may be another terminal's park/exit, which did not invalidate our cache
+            active_cache.clear()
+        if 'slots' in changed:
+            # nor our free-slot index; catch up on the changed slots only
+            self.executor.submit('slot index', parking_logic.allocator.sync, key='allocator')
+        if changed & {'active_vehicles', 'vehicles_master'}:
+            self.load_current_vehicles()
+        if changed & {'parking_history', 'vehicles_master'}:
+            self.load_history()
 
     def load_dashboard_data(self):
-        conn = sqlite3.connect('parking_system.db')
-        c = conn.cursor()
-        # Get total slots info
-        c.execute('SELECT COUNT(*) FROM slots')
-        total_slots = c.fetchone()[0]
-        c.execute('SELECT COUNT(*) FROM slots WHERE is_occupied=1')
-        occupied = c.fetchone()[0]
-        available = total_slots - occupied
-        c.execute('SELECT COUNT(DISTINCT vehicle_number) FROM vehicles_master')
-        total_vehicles = c.fetchone()[0]
-        self.total_slots_label.setText(f'Total Slots: {total_slots}')
-        self.occupied_slots_label.setText(f'Occupied: {occupied}')
-        self.available_slots_label.setText(f'Available: {available}')
-        self.total_vehicles_label.setText(f'Vehicles: {total_vehicles}')
-        # Zone summary
-        c.execute('''SELECT zone, COUNT(*) as total_slots, SUM(is_occupied) as occupied
-                     FROM slots GROUP BY zone''')
-        self.zone_table.setRowCount(0)
-        for row_idx, row in enumerate(c.fetchall()):
-            zone, total, occupied_in_zone = row
-            available_zone = total - occupied_in_zone
-            self.zone_table.insertRow(row_idx)
-            self.zone_table.setItem(row_idx, 0, QTableWidgetItem(f"Zone {zone}"))
-            self.zone_table.setItem(row_idx, 1, QTableWidgetItem(str(total)))
-            self.zone_table.setItem(row_idx, 2, QTableWidgetItem(str(occupied_in_zone)))
-            self.zone_table.setItem(row_idx, 3, QTableWidgetItem(str(available_zone)))
-        # Current vehicles
-        c.execute('''SELECT av.vehicle_number, vm.vehicle_type, vm.category, 
-                     'Slot ' || av.slot_id || ' (' || av.zone || ')', 
-                     datetime(av.entry_time) FROM active_vehicles av 
-                     JOIN vehicles_master vm ON av.vehicle_number = vm.vehicle_number''')
-        self.table_current.setRowCount(0)
-        for row_idx, row in enumerate(c.fetchall()):
-            for col_idx, val in enumerate(row):
-                self.table_current.setItem(row_idx, col_idx, QTableWidgetItem(str(val)))
-        # refresh history table
+        self.load_stats()
+        self.load_zones()
+        self.load_forecast()
+        self.load_current_vehicles()
         self.load_history()
-        conn.close()
+
+    # Refreshes are keyed, so a newer one supersedes a stale one still queued or running
+    def load_stats(self):
+        self.executor.submit('dashboard stats', fetch_records.get_dashboard_stats,
+                             on_result=self.show_stats, key='stats')
+
+    def show_stats(self, stats):
+        self.total_slots_label.setText(f"Total Slots: {stats['total_slots']}")
+        self.occupied_slots_label.setText(f"Occupied: {stats['occupied_slots']}")
+        self.available_slots_label.setText(f"Available: {stats['available_slots']}")
+        self.total_vehicles_label.setText(f"Vehicles: {stats['total_vehicles']}")
+
+    # the table models repaint only rows that changed
+    def load_zones(self):
+        self.executor.submit('zone stats', fetch_records.get_zone_stats,
+                             on_result=self.zone_model.set_rows, key='zones')
+
+    def load_forecast(self):
+        self.executor.submit('forecast', forecasting.get_dashboard_forecast,
+                             on_result=self.show_forecast, key='forecast')
+
+    def show_forecast(self, forecast):
+        if forecast is not None:
+            self.forecast_model.set_rows(forecast)
+
+    def load_current_vehicles(self):
+        self.executor.submit('active vehicles', fetch_records.get_active_vehicles,
+                             on_result=self.current_model.set_rows, key='current')
 
     def load_history(self):
-        conn = sqlite3.connect('parking_system.db')
-        c = conn.cursor()
-        c.execute('''SELECT vehicle_num, vehicle_type, category, slot_id, entry_time, exit_time, duration_min 
-                     FROM parking_history''')
-        self.table_history.setRowCount(0)
-        for row_idx, row in enumerate(c.fetchall()):
-            for col_idx, val in enumerate(row):
-                self.table_history.setItem(row_idx, col_idx, QTableWidgetItem(str(val)))
-        conn.close()
+        # re-reads the newest page only; older pages already loaded are kept
+        self.history_model.refresh()
+
+    def tab_changed(self, index):
+        # a year of history is recomputed on demand, not on every poll
+        if self.tabs.widget(index) is self.tab_reports and self.report is None:
+            self.load_report()
+
+    def load_report(self):
+        self.report_refresh_btn.setEnabled(False)
+        self.executor.submit('report', reports.get_dashboard_report,
+                             on_result=self.show_report, key='report')
+
+    def show_report(self, report):
+        self.report_refresh_btn.setEnabled(True)
+        if report is None:
+            QMessageBox.critical(self, 'Error', 'Could not build the report')
+            return
+        self.report = report
+        zone = self.report_zone.currentText()
+        self.report_zone.blockSignals(True)
+        self.report_zone.clear()
+        self.report_zone.addItems([f'Zone {name}' for name in report['zones']])
+        if zone:
+            self.report_zone.setCurrentText(zone)
+        self.report_zone.blockSignals(False)
+        self.dwell_model.set_rows(report['dwell'])
+        self.show_heatmap()
+
+    def show_heatmap(self):
+        index = self.report_zone.currentIndex()
+        if self.report is None or index < 0:
+            return
+        kind = 'arrivals' if self.report_kind.currentText() == 'Arrivals' else 'departures'
+        self.heatmap_model.set_matrix(self.report[kind][index])
+        busiest = self.report['busiest_hour'][index]
+        self.busiest_label.setText('Most arrivals: ' + ', '.join(
+            f'{day} {hour:02d}:00' for day, hour in zip(reports.WEEKDAYS, busiest) if hour >= 0))
 
     def park_vehicle(self):
         vehicle_number = self.entry_vehicle_num.text().upper().strip()
@@ -217,74 +360,69 @@ class DashboardWindow(QMainWindow):
         if not vehicle_number:
             QMessageBox.warning(self, 'Error', 'Enter vehicle number')
             return
-        conn = sqlite3.connect('parking_system.db')
-        c = conn.cursor()
-        # Check duplicate
-        c.execute('SELECT * FROM active_vehicles WHERE vehicle_number=?', (vehicle_number,))
-        if c.fetchone():
+        # Zone by category, slot by the chosen strategy
+        zone = parking_logic.zone_for_category(category)
+        strategy = self.entry_strategy.currentData()
+        self.park_btn.setEnabled(False)
+        self.executor.submit('park', update_records.park_vehicle, vehicle_number, v_type, category, zone,
+                             False, strategy,
+                             on_result=lambda result: self.parked(vehicle_number, zone, result),
+                             on_error=lambda error: self.parked(vehicle_number, zone,
+                                                                {'status': 'error', 'error': str(error)}))
+
+    def parked(self, vehicle_number, zone, result):
+        self.park_btn.setEnabled(True)
+        status = result['status']
+        if status == 'already_parked':
             QMessageBox.warning(self, 'Error', 'Vehicle already parked')
-            conn.close()
             return
-        # Find slot based on category/zone
-        zone_map = {'Student':'A','Faculty':'B','VIP':'C'}
-        zone = zone_map.get(category,'A')
-        c.execute('SELECT slot_id FROM slots WHERE zone=? AND is_occupied=0 LIMIT 1', (zone,))
-        slot = c.fetchone()
-        if not slot:
+        if status == 'no_slot':
             QMessageBox.warning(self, 'No Slot', f'No slots available in Zone {zone}')
-            conn.close()
             return
-        slot_id = slot[0]
-        now = datetime.now().isoformat()
-        # Insert into master
-        c.execute('''INSERT OR REPLACE INTO vehicles_master (vehicle_number, vehicle_type, category, first_entry, last_slot)
-                     VALUES (?, ?, ?, COALESCE((SELECT first_entry FROM vehicles_master WHERE vehicle_number=?), ?), ?)''',
-                   (vehicle_number, v_type, category, vehicle_number, now, now))
-        # Update slot
-        c.execute('UPDATE slots SET is_occupied=1, vehicle_num=?, entry_time=? WHERE slot_id=?',
-                  (vehicle_number, now, slot_id))
-        # Add to active
-        c.execute('INSERT INTO active_vehicles VALUES (?, ?, ?, ?)',
-                  (vehicle_number, slot_id, zone, now))
-        # Add to history
-        c.execute('''INSERT INTO parking_history (vehicle_num, slot_id, zone, entry_time)
-                     VALUES (?, ?, ?, ?)''', (vehicle_number, slot_id, zone, now))
-        conn.commit()
-        conn.close()
+        if status == 'error':
+            QMessageBox.critical(self, 'Error', f"Could not park vehicle: {result['error']}")
+            return
+        slot_id = result['slot_id']
         QMessageBox.information(self, 'Success', f'Vehicle {vehicle_number} parked in Slot {slot_id} (Zone {zone})')
         self.entry_vehicle_num.clear()
-        self.load_dashboard_data()
+        self.refresh_changed()
+
+    def search_plates(self, text):
+        # keyed, so a fast typist only gets the suggestions for the latest keystroke
+        self.executor.submit('plate search', suggest_plates, text,
+                             on_result=self.show_plate_suggestions, key='plate search')
+
+    def show_plate_suggestions(self, suggestions):
+        self.plate_suggestions.setStringList([s['plate'] for s in suggestions])
+        if suggestions and self.exit_vehicle_num_input.hasFocus():
+            self.plate_completer.complete()
 
     def exit_vehicle(self):
         vehicle_number = self.exit_vehicle_num_input.text().upper().strip()
         if not vehicle_number:
             QMessageBox.warning(self, 'Error', 'Enter vehicle number')
             return
-        conn = sqlite3.connect('parking_system.db')
-        c = conn.cursor()
-        c.execute('SELECT slot_id, entry_time FROM active_vehicles WHERE vehicle_number=?', (vehicle_number,))
-        result = c.fetchone()
-        if not result:
+        self.exit_btn.setEnabled(False)
+        self.executor.submit('exit', update_records.exit_vehicle, vehicle_number,
+                             on_result=lambda result: self.exited(vehicle_number, result),
+                             on_error=lambda error: self.exited(vehicle_number,
+                                                                {'status': 'error', 'error': str(error)}))
+
+    def exited(self, vehicle_number, result):
+        self.exit_btn.setEnabled(True)
+        status = result['status']
+        if status == 'not_found':
             QMessageBox.warning(self, 'Error', 'Vehicle not found')
-            conn.close()
             return
-        slot_id, entry_time = result
-        now = datetime.now().isoformat()
-        # Calculate duration
-        e_time = datetime.fromisoformat(entry_time)
-        exit_time = datetime.fromisoformat(now)
-        duration = int((exit_time - e_time).total_seconds() / 60)
-        # Free slot
-        c.execute('UPDATE slots SET is_occupied=0, vehicle_num=NULL, entry_time=NULL WHERE slot_id=?', (slot_id,))
-        c.execute('DELETE FROM active_vehicles WHERE vehicle_number=?', (vehicle_number,))
-        # Update history
-        c.execute('''UPDATE parking_history 
-                     SET exit_time=?, duration_min=? WHERE vehicle_num=? AND exit_time IS NULL''',
-                  (now, duration, vehicle_number))
-        conn.commit()
-        conn.close()
-        QMessageBox.information(self, 'Exited', f'{vehicle_number} exited. Duration: {duration} mins')
-        self.load_dashboard_data()
+        if status == 'error':
+            QMessageBox.critical(self, 'Error', f"Could not exit vehicle: {result['error']}")
+            return
+        duration = result['duration_min']
+        message = f'{vehicle_number} exited. Duration: {duration} mins'
+        if result.get('visits'):
+            message += f"\nVisit {result['visits']}, average stay {result['avg_duration_min']:.0f} mins"
+        QMessageBox.information(self, 'Exited', message)
+        self.refresh_changed()
         self.exit_vehicle_num_input.clear()
 
     def logout(self):
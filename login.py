@@ -1,9 +1,9 @@
 import sys
-import sqlite3
-import hashlib
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox)
 from PyQt5.QtCore import Qt
 from gui import DashboardWindow
+from database import auth
+from query_executor import shared_executor
 from PyQt5.QtGui import QFont
 
 
@@ -66,14 +66,14 @@ class LoginWindow(QWidget):
         self.input_pass.setPlaceholderText('Enter password')
         self.input_pass.setEchoMode(QLineEdit.Password)
 
-        btn_login = QPushButton('LOGIN')
-        btn_login.clicked.connect(self.authenticate)
+        self.btn_login = QPushButton('LOGIN')
+        self.btn_login.clicked.connect(self.authenticate)
 
         form_layout.addWidget(lbl_user)
         form_layout.addWidget(self.input_user)
         form_layout.addWidget(lbl_pass)
         form_layout.addWidget(self.input_pass)
-        form_layout.addWidget(btn_login)
+        form_layout.addWidget(self.btn_login)
 
         layout.addWidget(title)
         layout.addLayout(form_layout)
@@ -83,23 +83,8 @@ class LoginWindow(QWidget):
         self.input_pass.returnPressed.connect(self.authenticate)
 
     def init_db(self):
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'staff'
-            )
-        ''')
-        # Insert default admin if not exists
-        default_password_hash = hashlib.sha256('admin123'.encode()).hexdigest()
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, password_hash, role)
-            VALUES (?, ?, ?)''', ('admin', default_password_hash, 'admin'))
-        conn.commit()
-        conn.close()
+        # users table and default admin, on a worker thread like the login check itself
+        shared_executor().submit('default admin', auth.create_default_admin)
 
     def authenticate(self):
         username = self.input_user.text().strip()
@@ -107,15 +92,19 @@ class LoginWindow(QWidget):
         if not username or not password:
             QMessageBox.warning(self, 'Error', 'Please enter both username and password')
             return
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        conn = sqlite3.connect('parking_system.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE username=? AND password_hash=?', (username, password_hash))
-        result = cursor.fetchone()
-        conn.close()
-        if result:
+        if not self.btn_login.isEnabled():
+            return  # a check is already running
+        # checked on a worker thread so a locked database cannot freeze the login window
+        self.btn_login.setEnabled(False)
+        shared_executor().submit('login', auth.authenticate_user, username, password,
+                                 on_result=lambda role: self.authenticated(username, role),
+                                 on_error=lambda error: self.authenticated(username, None))
+
+    def authenticated(self, username, role):
+        self.btn_login.setEnabled(True)
+        if role:
             self.hide()
-            self.dashboard = DashboardWindow(username, result[0])
+            self.dashboard = DashboardWindow(username, role)
             self.dashboard.show()
         else:
             QMessageBox.critical(self, 'Login Failed', 'Invalid username or password')
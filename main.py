@@ -1,9 +1,14 @@
 import sys
 from PyQt5.QtWidgets import QApplication
 from login import LoginWindow
+from database.create_tables import initialize_database
+from parking_logic import allocator
 
 def main():
     app = QApplication(sys.argv)
+    # create missing tables and apply pending schema migrations
+    initialize_database()
+    allocator.load()
     login_win = LoginWindow()
     login_win.show()
     sys.exit(app.exec_())
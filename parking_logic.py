@@ -0,0 +1,433 @@
+import heapq
+import threading
+from collections import namedtuple
+from utils import setup_logging
+import logging
+from database.repository import repo
+
+# Slot allocation policy: which zone a vehicle goes to and which free slot
+# in it. AllocationEngine keeps the free slots indexed for each strategy
+# below, so every strategy answers in O(log n); a strategy's index is
+# built the first time it is asked and kept up to date from then on, so
+# parks and exits pay only for the strategies in use:
+#   nearest        closest to the zone's entrance (lowest slot id, as
+#                  seed_slots numbers each zone front to back)
+#   corner         farthest from the entrance (highest slot id)
+#   balanced       nearest free slot in the row with the lowest share of
+#                  occupied slots; a row is a slot location, or a block of
+#                  ROW_SIZE consecutive slots where no location is set
+#   type_matched   nearest slot whose slot_type is the vehicle's type, else
+#                  the nearest slot without a type
+# The engine is the shared `allocator`: park and exit keep it in sync
+# through allocate()/occupy()/release(), and the slots table stays the
+# source of truth that load() rebuilds it from. Other terminals' writes
+# are picked up by sync() from the slot_changes log (migration 13).
+
+# category -> zone, as signposted at the gates
+CATEGORY_ZONES = {'Student': 'A', 'Faculty': 'B', 'VIP': 'C'}
+DEFAULT_ZONE = 'A'
+
+DEFAULT_STRATEGY = 'nearest'
+
+# names shown to operators
+STRATEGY_LABELS = {
+    'nearest': 'Nearest to entrance',
+    'corner': 'Corner',
+    'balanced': 'Balance rows',
+    'type_matched': 'Match vehicle type',
+}
+
+# slots per row for the balanced strategy where slots have no location
+ROW_SIZE = 10
+
+Slot = namedtuple('Slot', 'zone slot_type location')
+
+
+def zone_for_category(category):
+    return CATEGORY_ZONES.get(category, DEFAULT_ZONE)
+
+
+class FreeHeap:
+    """
+    Min-heap of (key, slot_id) over free slots, cleaned lazily: a taken
+    slot stays in the heap until it reaches the top, where the engine's
+    free bitmap shows it is stale.
+    """
+
+    def __init__(self, entries=()):
+        self._heap = list(entries)
+        heapq.heapify(self._heap)
+        self.live = len(self._heap)
+
+    def push(self, key, slot_id, free):
+        heapq.heappush(self._heap, (key, slot_id))
+        self.live += 1
+        if len(self._heap) > 2 * self.live + 64:
+            # slots freed and taken over and over leave stale entries behind
+            self._heap = list({slot_id: (key, slot_id) for key, slot_id in self._heap if free[slot_id]}.values())
+            heapq.heapify(self._heap)
+
+    def discard(self):
+        self.live -= 1
+
+    def top(self, free):
+        heap = self._heap
+        while heap and not free[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+
+class Strategy:
+    """
+    One allocation policy and the index of free slots it chooses from
+
+    The engine calls load() with every slot, then added() when a slot
+    becomes free (new=True for a slot not seen before) and taken() when
+    it is claimed. `free` is the engine's bitmap of free slot ids.
+    """
+    name = None
+
+    def load(self, free, slots):
+        raise NotImplementedError
+
+    def added(self, slot_id, slot, new=False):
+        raise NotImplementedError
+
+    def taken(self, slot_id, slot):
+        raise NotImplementedError
+
+    def choose(self, zone, vehicle_type=None):
+        """
+        Best free slot id in the zone, or None
+        """
+        raise NotImplementedError
+
+
+class HeapStrategy(Strategy):
+    """
+    Free slots grouped into pools, each a heap ordered by key(); the
+    subclasses pick the pool and the order
+    """
+
+    def pool(self, slot):
+        return slot.zone
+
+    def key(self, slot_id, slot):
+        return slot_id
+
+    def load(self, free, slots):
+        self.free = free
+        entries = {}
+        for slot_id, slot, is_free in slots:
+            if is_free:
+                entries.setdefault(self.pool(slot), []).append((self.key(slot_id, slot), slot_id))
+        self._pools = {pool: FreeHeap(items) for pool, items in entries.items()}
+
+    def added(self, slot_id, slot, new=False):
+        pool = self._pools.get(self.pool(slot))
+        if pool is None:
+            pool = self._pools[self.pool(slot)] = FreeHeap()
+        pool.push(self.key(slot_id, slot), slot_id, self.free)
+
+    def taken(self, slot_id, slot):
+        self._pools[self.pool(slot)].discard()
+
+    def _top(self, pool):
+        heap = self._pools.get(pool)
+        return heap.top(self.free) if heap else None
+
+    def choose(self, zone, vehicle_type=None):
+        return self._top(zone)
+
+
+class NearestEntrance(HeapStrategy):
+    """
+    Slot closest to the entrance; by default slot ids count outward from
+    it, or distance(slot_id, slot) gives the distance
+    """
+    name = 'nearest'
+
+    def __init__(self, distance=None):
+        self.distance = distance
+
+    def key(self, slot_id, slot):
+        return self.distance(slot_id, slot) if self.distance else slot_id
+
+
+class Corner(HeapStrategy):
+    """
+    Slot farthest from the entrance (highest id)
+    """
+    name = 'corner'
+
+    def key(self, slot_id, slot):
+        return -slot_id
+
+
+class TypeMatched(HeapStrategy):
+    """
+    Nearest slot of the vehicle's type, falling back to untyped slots
+    """
+    name = 'type_matched'
+
+    def pool(self, slot):
+        return (slot.zone, slot.slot_type)
+
+    def choose(self, zone, vehicle_type=None):
+        slot_id = self._top((zone, vehicle_type)) if vehicle_type is not None else None
+        return slot_id if slot_id is not None else self._top((zone, None))
+
+
+class BalancedRows(Strategy):
+    """
+    Nearest free slot in the zone's least occupied row
+
+    Rows are tracked by occupied share in a heap per zone holding an
+    entry per change of a row's count; entries whose count is out of date,
+    or whose row is full, are dropped as they reach the top.
+    """
+    name = 'balanced'
+
+    def _row(self, slot_id, slot):
+        key = (slot.zone, slot.location if slot.location is not None else (slot_id - 1) // ROW_SIZE)
+        row = self._row_ids.get(key)
+        if row is None:
+            row = self._row_ids[key] = len(self._size)
+            self._size.append(0)
+            self._taken.append(0)
+            self._pools.append(FreeHeap())
+            self._zones.setdefault(slot.zone, [])
+        return row
+
+    def _rank(self, zone, row):
+        heapq.heappush(self._zones[zone], (self._taken[row] / self._size[row], row, self._taken[row]))
+
+    def load(self, free, slots):
+        self.free = free
+        self._row_ids, self._size, self._taken, self._pools, self._zones = {}, [], [], [], {}
+        entries = {}
+        for slot_id, slot, is_free in slots:
+            row = self._row(slot_id, slot)
+            self._size[row] += 1
+            if is_free:
+                entries.setdefault(row, []).append((slot_id, slot_id))
+            else:
+                self._taken[row] += 1
+        for row, items in entries.items():
+            self._pools[row] = FreeHeap(items)
+        for (zone, _), row in self._row_ids.items():
+            self._zones[zone].append((self._taken[row] / self._size[row], row, self._taken[row]))
+        for heap in self._zones.values():
+            heapq.heapify(heap)
+
+    def added(self, slot_id, slot, new=False):
+        row = self._row(slot_id, slot)
+        if new:
+            self._size[row] += 1
+        else:
+            self._taken[row] -= 1
+        self._pools[row].push(slot_id, slot_id, self.free)
+        self._rank(slot.zone, row)
+
+    def taken(self, slot_id, slot):
+        row = self._row(slot_id, slot)
+        self._taken[row] += 1
+        self._pools[row].discard()
+        self._rank(slot.zone, row)
+        heap = self._zones[slot.zone]
+        if len(heap) > 4 * len(self._size) + 64:
+            # a row going back and forth between two counts leaves equal entries; keep one
+            self._zones[slot.zone] = heap = list({entry for entry in heap if entry[2] == self._taken[entry[1]]})
+            heapq.heapify(heap)
+
+    def choose(self, zone, vehicle_type=None):
+        heap = self._zones.get(zone)
+        while heap:
+            _, row, taken = heap[0]
+            if taken == self._taken[row]:
+                slot_id = self._pools[row].top(self.free)
+                if slot_id is not None:
+                    return slot_id
+            heapq.heappop(heap)
+        return None
+
+
+def default_strategies():
+    return [NearestEntrance(), Corner(), BalancedRows(), TypeMatched()]
+
+
+class AllocationEngine:
+    """
+    In-memory index of free slots, loaded from the slots table and queried
+    through pluggable strategies
+
+    A bitmap indexed by slot_id says whether a slot is free; each strategy
+    in use keeps its own ordering of the free slots on top of it.
+    """
+
+    def __init__(self, strategies=None):
+        self.strategies = {strategy.name: strategy for strategy in (strategies or default_strategies())}
+        self._active = []  # strategies whose index is loaded and kept up to date
+        # re-entrant: the first lookup loads the index while holding the lock
+        self._lock = threading.RLock()
+        self._free = bytearray()
+        self._slots = {}
+        self._free_counts = {}
+        self._seq = 0  # last slot_changes entry the index reflects
+        self.loaded = False
+
+    def load(self, rows=None):
+        """
+        Build the index from (slot_id, zone, is_occupied, slot_type, location)
+        rows, read from the DB by default
+        """
+        seq = self._seq
+        if rows is None:
+            # changes logged after this are replayed by the next sync(); replaying one twice is harmless
+            seq = repo.fetchvalue('SELECT COALESCE(MAX(seq), 0) FROM slot_changes')
+            rows = repo.fetchall('SELECT slot_id, zone, is_occupied, slot_type, location FROM slots')
+        slots = [(slot_id, Slot(zone, slot_type, location), not is_occupied)
+                 for slot_id, zone, is_occupied, slot_type, location in rows]
+        free = bytearray(max((slot_id for slot_id, _, _ in slots), default=0) + 1)
+        counts = {}
+        for slot_id, slot, is_free in slots:
+            free[slot_id] = is_free
+            counts[slot.zone] = counts.get(slot.zone, 0) + is_free
+        with self._lock:
+            # the strategies hold on to the bitmap, so it is refilled in place
+            self._free[:] = free
+            self._slots = {slot_id: slot for slot_id, slot, _ in slots}
+            self._free_counts = counts
+            for strategy in self._active:
+                strategy.load(self._free, slots)
+            self._seq = seq
+            self.loaded = True
+        logging.info(f"Slot allocator loaded {sum(counts.values())} free slots")
+
+    def sync(self):
+        """
+        Apply the slot changes logged since the index was loaded or last
+        synced, e.g. parks and exits at other terminals; returns how many
+        slots changed in the index
+
+        Costs one read of the log past the last seen entry. Changes made
+        through this engine already match the index and are skipped; a log
+        that no longer reaches back that far means a full load().
+        """
+        if not self.loaded:
+            self.load()
+            return 0
+        since = self._seq
+        rows = repo.fetchall('''
+            SELECT c.seq, c.slot_id, s.zone, s.is_occupied
+            FROM slot_changes c LEFT JOIN slots s ON s.slot_id = c.slot_id
+            WHERE c.seq > ?
+            ORDER BY c.seq
+        ''', (since,))
+        if not rows:
+            return 0
+        if rows[0][0] > since + 1:
+            logging.info("Slot change log trimmed past the index; reloading")
+            self.load()
+            return 0
+        # slots as they are now; a slot logged twice is looked at once
+        current = {slot_id: (zone, is_occupied) for _, slot_id, zone, is_occupied in rows}
+        changed = 0
+        with self._lock:
+            for slot_id, (zone, is_occupied) in current.items():
+                was_free = slot_id < len(self._free) and self._free[slot_id]
+                if zone is None or is_occupied:
+                    # taken, or removed from the lot: never handed out again
+                    if was_free:
+                        self._take(slot_id)
+                        changed += 1
+                elif not was_free:
+                    self.release(zone, slot_id)
+                    changed += 1
+            self._seq = max(self._seq, rows[-1][0])
+        return changed
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def _strategy(self, strategy, prefer_corner):
+        strategy = self.strategies[strategy or ('corner' if prefer_corner else DEFAULT_STRATEGY)]
+        if strategy not in self._active:
+            strategy.load(self._free, [(slot_id, slot, self._free[slot_id])
+                                       for slot_id, slot in self._slots.items()])
+            self._active.append(strategy)
+        return strategy
+
+    def peek(self, zone, prefer_corner=False, strategy=None, vehicle_type=None):
+        """
+        Free slot the strategy (DEFAULT_STRATEGY, or 'corner' with
+        prefer_corner) would give in a zone, without claiming it, or None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._strategy(strategy, prefer_corner).choose(zone, vehicle_type)
+
+    def allocate(self, zone, prefer_corner=False, strategy=None, vehicle_type=None):
+        """
+        Claim the slot peek() would give and return its id, or None when there is none
+        """
+        with self._lock:
+            self._ensure_loaded()
+            slot_id = self._strategy(strategy, prefer_corner).choose(zone, vehicle_type)
+            if slot_id is not None:
+                self._take(slot_id)
+            return slot_id
+
+    def _take(self, slot_id):
+        slot = self._slots[slot_id]
+        self._free[slot_id] = 0
+        self._free_counts[slot.zone] -= 1
+        for strategy in self._active:
+            strategy.taken(slot_id, slot)
+
+    def occupy(self, zone, slot_id):
+        """
+        Mark a specific slot as taken (e.g. occupied by another terminal)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if slot_id < len(self._free) and self._free[slot_id]:
+                self._take(slot_id)
+
+    def release(self, zone, slot_id):
+        """
+        Return a slot to the free pool after exit or a failed park
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if slot_id < len(self._free) and self._free[slot_id]:
+                return
+            slot = self._slots.get(slot_id)
+            new = slot is None
+            if new:
+                # added since the last load; its type and location are picked up on the next one
+                slot = self._slots[slot_id] = Slot(zone, None, None)
+            if slot_id >= len(self._free):
+                self._free.extend(bytes(slot_id + 1 - len(self._free)))
+            self._free[slot_id] = 1
+            self._free_counts[slot.zone] = self._free_counts.get(slot.zone, 0) + 1
+            for strategy in self._active:
+                strategy.added(slot_id, slot, new)
+
+    def free_count(self, zone):
+        with self._lock:
+            self._ensure_loaded()
+            return self._free_counts.get(zone, 0)
+
+
+# shared instance, loaded at startup and kept in sync by park/exit
+allocator = AllocationEngine()
+
+
+if __name__ == '__main__':
+    setup_logging()
+    allocator.load()
+    for zone in sorted(allocator._free_counts):
+        choices = ', '.join(f"{name} {allocator.peek(zone, strategy=name)}" for name in allocator.strategies)
+        print(f"Zone {zone}: {allocator.free_count(zone)} free; {choices}")
@@ -0,0 +1,148 @@
+import os
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QEvent, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QLabel
+from utils import setup_logging
+import logging
+
+# Worker threads for database calls. They never expire, so each keeps its
+# repository connection (and statement cache) for the life of the app.
+MAX_WORKERS = 4
+
+# Set PARKING_DEBUG_QUERIES=1 to show per-query timings over the window
+DEBUG_QUERIES = os.environ.get('PARKING_DEBUG_QUERIES', '') not in ('', '0')
+
+
+class _TaskSignals(QObject):
+    finished = pyqtSignal(object, object, object, float)  # task, result, error, seconds
+
+
+class _QueryTask(QRunnable):
+    def __init__(self, name, fn, args, key):
+        super().__init__()
+        # the executor keeps the reference, so tryTake() can still cancel it
+        self.setAutoDelete(False)
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.on_result = None
+        self.on_error = None
+        self.signals = _TaskSignals()
+
+    def run(self):
+        start = time.perf_counter()
+        result = error = None
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            error = e
+        self.signals.finished.emit(self, result, error, time.perf_counter() - start)
+
+
+class QueryExecutor(QObject):
+    """
+    Runs database calls on a thread pool and hands results back on the Qt thread.
+
+    submit() returns immediately; on_result(result) or on_error(exception)
+    is called later from the event loop, so the UI never waits on a locked
+    database or a slow query. Calls given the same `key` are refreshes of
+    the same data: a newer one cancels an older one that has not started
+    yet, and the result of one that was already running is dropped instead
+    of overwriting newer data.
+    """
+
+    timed = pyqtSignal(str, float)  # query name, seconds
+
+    def __init__(self, max_workers=MAX_WORKERS, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.pool.setExpiryTimeout(-1)
+        self._pending = set()
+        self._latest = {}  # key -> newest task submitted for it
+
+    def submit(self, name, fn, *args, on_result=None, on_error=None, key=None):
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None and self.pool.tryTake(previous):
+                self._pending.discard(previous)
+
+        task = _QueryTask(name, fn, args, key)
+        task.on_result = on_result
+        task.on_error = on_error
+        task.signals.finished.connect(self._deliver)
+        self._pending.add(task)
+        if key is not None:
+            self._latest[key] = task
+        self.pool.start(task)
+        return task
+
+    @pyqtSlot(object, object, object, float)
+    def _deliver(self, task, result, error, seconds):
+        self._pending.discard(task)
+        self.timed.emit(task.name, seconds)
+        if task.key is not None and self._latest.get(task.key) is not task:
+            # superseded by a newer refresh of the same data
+            return
+        if task.key is not None:
+            del self._latest[task.key]
+        if error is not None:
+            logging.error(f"Query {task.name} failed: {error}")
+            if task.on_error is not None:
+                task.on_error(error)
+        elif task.on_result is not None:
+            task.on_result(result)
+
+    def wait(self, msecs=-1):
+        """
+        Block until every started call has finished (for shutdown and scripts)
+        """
+        return self.pool.waitForDone(msecs)
+
+
+class LatencyOverlay(QLabel):
+    """
+    Small translucent list of the most recent query timings, pinned to the
+    top-right corner of a window (debug mode only)
+    """
+
+    def __init__(self, window, executor, size=8):
+        super().__init__(window)
+        self.timings = deque(maxlen=size)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet('background: rgba(0, 0, 0, 160); color: #7CFC00; '
+                           'font-family: monospace; font-size: 11px; padding: 4px;')
+        executor.timed.connect(self.add_timing)
+        window.installEventFilter(self)
+        self.hide()
+
+    def add_timing(self, name, seconds):
+        self.timings.appendleft(f'{name:<16}{seconds * 1000:8.1f} ms')
+        self.setText('\n'.join(self.timings))
+        self.adjustSize()
+        self.reposition()
+        self.show()
+        self.raise_()
+
+    def reposition(self):
+        self.move(self.parentWidget().width() - self.width() - 8, 8)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize:
+            self.reposition()
+        return False
+
+
+_shared = None
+
+
+def shared_executor():
+    """
+    The executor used by the login and dashboard windows, created on first use
+    """
+    global _shared
+    if _shared is None:
+        _shared = QueryExecutor()
+    return _shared
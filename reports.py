@@ -0,0 +1,126 @@
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from utils import setup_logging, to_epoch
+import logging
+from database.history_columns import history_columns
+
+# Peak-hour heatmaps and dwell-time percentiles for management reports,
+# computed from the memory-mapped history columns
+# (database/history_columns.py) by vectorized binning, so a year of
+# sessions is recomputed in well under a second.
+
+# window of history the dashboard reports on
+REPORT_DAYS = 365
+
+DWELL_PERCENTILES = (50, 75, 90, 95, 99)
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def weekday_hours(seconds):
+    """
+    Local weekday (Monday = 0) * 24 + local hour for an array of Unix times
+    """
+    if not len(seconds):
+        return np.zeros(0, np.int64)
+    # UTC offset per quarter hour of the range (offsets and DST changes fall
+    # on quarter hours): looked up once a day, and per quarter hour only on
+    # days where it changed
+    first = int(seconds.min()) // 900
+    count = int(seconds.max()) // 900 + 1 - first
+    daily = [time.localtime((first + quarter) * 900).tm_gmtoff for quarter in range(0, count + 96, 96)]
+    offsets = np.repeat(np.array(daily[:-1], dtype=np.int64), 96)[:count]
+    for day in np.flatnonzero(np.diff(daily)):
+        quarters = range(day * 96, min(day * 96 + 96, count))
+        offsets[quarters.start:quarters.stop] = [time.localtime((first + quarter) * 900).tm_gmtoff
+                                                 for quarter in quarters]
+    local = seconds + offsets[seconds // 900 - first]
+    # 1970-01-01 was a Thursday
+    return (local // 86400 + 3) % 7 * 24 + local % 86400 // 3600
+
+
+def _heatmaps(zones, seconds, zone_count):
+    cells = zones.astype(np.int64) * 168 + weekday_hours(seconds)
+    return np.bincount(cells, minlength=zone_count * 168).reshape(zone_count, 7, 24)
+
+
+def _dwell_rows(keys, durations, labels):
+    # a handful of groups: a mask and a partition-based percentile per group
+    # beat sorting every session
+    rows = []
+    for key in np.flatnonzero(np.bincount(keys)):
+        values = durations[keys == key]
+        row = dict(labels(int(key)), sessions=len(values), mean=float(values.mean()))
+        for p, value in zip(DWELL_PERCENTILES, np.percentile(values, DWELL_PERCENTILES)):
+            row[f'p{p}'] = float(value)
+        rows.append(row)
+    return rows
+
+
+def build_report(start=None, end=None):
+    """
+    Arrival/departure heatmaps and dwell-time percentiles for start to end
+
+    start and end are datetimes, dates or ISO strings; by default the last
+    REPORT_DAYS days. Returns a dict with:
+      'zones'        zone names, the first axis of the heatmaps
+      'arrivals'     sessions entered per zone, local weekday and hour,
+                     an int array of shape (zones, 7, 24)
+      'departures'   the same for exits
+      'busiest_hour' hour of most arrivals per zone and weekday, shape
+                     (zones, 7); -1 where there were none
+      'dwell'        per zone and category, then per zone over all
+                     categories ('All'): sessions, mean and the
+                     DWELL_PERCENTILES of stay in minutes, as dicts
+    """
+    end_ts = to_epoch(end) if end is not None else int(time.time())
+    start_ts = to_epoch(start) if start is not None else end_ts - REPORT_DAYS * 86400
+
+    cols = history_columns.columns()
+    zones, categories = cols['zone_names'], cols['category_names']
+    zone, entry, exit_ts = cols['zone'], cols['entry_ts'], cols['exit_ts']
+
+    entered = (entry >= start_ts) & (entry < end_ts)
+    left = (exit_ts >= start_ts) & (exit_ts < end_ts)
+    arrivals = _heatmaps(zone[entered], entry[entered], len(zones))
+    departures = _heatmaps(zone[left], exit_ts[left], len(zones))
+    busiest = np.where(arrivals.max(axis=2) > 0, arrivals.argmax(axis=2), -1)
+
+    closed = entered & (cols['duration_min'] >= 0)
+    durations = cols['duration_min'][closed]
+    closed_zones = zone[closed].astype(np.int64)
+    by_category = closed_zones * len(categories) + cols['category'][closed]
+    dwell = _dwell_rows(by_category, durations, lambda key: {
+        'zone': zones[key // len(categories)], 'category': categories[key % len(categories)] or 'Unknown'})
+    dwell += _dwell_rows(closed_zones, durations, lambda key: {'zone': zones[key], 'category': 'All'})
+    dwell.sort(key=lambda row: (row['zone'], row['category'] == 'All', row['category']))
+
+    return {'start': start_ts, 'end': end_ts, 'zones': zones, 'arrivals': arrivals,
+            'departures': departures, 'busiest_hour': busiest, 'dwell': dwell}
+
+
+def get_dashboard_report():
+    """
+    build_report() for the dashboard, or None on failure
+    """
+    try:
+        return build_report()
+
+    except Exception as e:
+        logging.error(f"Error building report: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    setup_logging()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else REPORT_DAYS
+    report = build_report(start=datetime.now() - timedelta(days=days))
+    for index, zone in enumerate(report['zones']):
+        hours = ', '.join(f"{day} {hour:02d}:00" if hour >= 0 else f"{day} -"
+                          for day, hour in zip(WEEKDAYS, report['busiest_hour'][index]))
+        print(f"Zone {zone} busiest hours: {hours}")
+    for row in report['dwell']:
+        print(f"Zone {row['zone']} {row['category']:>8}: {row['sessions']:>8} sessions, "
+              f"median {row['p50']:.0f} min, p95 {row['p95']:.0f} min")
@@ -0,0 +1,200 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
+from database import fetch_records
+
+
+class RowTableModel(QAbstractTableModel):
+    """
+    Read-only table over a list of rows for a QTableView.
+
+    set_rows() diffs the new rows against the current ones by key: vanished
+    rows are removed, new rows inserted and only rows whose values changed
+    emit dataChanged, so a refresh repaints what changed and keeps the
+    selection and scroll position. Each column is a row index/dict key, or
+    a callable taking the row.
+    """
+
+    def __init__(self, headers, fields=None, key=lambda row: row[0], parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.fields = fields if fields is not None else list(range(len(headers)))
+        self.key = key
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        field = self.fields[index.column()]
+        value = field(row) if callable(field) else row[field]
+        return '' if value is None else str(value)
+
+    def row(self, position):
+        return self._rows[position]
+
+    def set_rows(self, rows):
+        rows = list(rows)
+        new_keys = [self.key(row) for row in rows]
+        new_set = set(new_keys)
+        old_keys = [self.key(row) for row in self._rows]
+
+        # 1. drop rows that are gone, bottom-up in contiguous runs
+        end = len(old_keys)
+        while end > 0:
+            if old_keys[end - 1] in new_set:
+                end -= 1
+                continue
+            start = end - 1
+            while start > 0 and old_keys[start - 1] not in new_set:
+                start -= 1
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            del self._rows[start:end]
+            del old_keys[start:end]
+            self.endRemoveRows()
+            end = start
+
+        # rows that moved relative to each other: not worth diffing
+        old_set = set(old_keys)
+        if [k for k in new_keys if k in old_set] != old_keys:
+            self.beginResetModel()
+            self._rows = rows
+            self.endResetModel()
+            return
+
+        # 2. walk the new order, inserting runs of new rows and updating changed ones
+        pos = 0
+        while pos < len(rows):
+            if new_keys[pos] in old_set:
+                if self._rows[pos] != rows[pos]:
+                    self._rows[pos] = rows[pos]
+                    self.dataChanged.emit(self.index(pos, 0), self.index(pos, len(self.headers) - 1))
+                pos += 1
+                continue
+            end = pos
+            while end < len(rows) and new_keys[end] not in old_set:
+                end += 1
+            self.beginInsertRows(QModelIndex(), pos, end - 1)
+            self._rows[pos:pos] = rows[pos:end]
+            self.endInsertRows()
+            pos = end
+
+
+class HistoryTableModel(RowTableModel):
+    """
+    Parking history, newest first, loaded a page at a time.
+
+    The view calls fetchMore() as the user scrolls to the bottom; refresh()
+    re-reads only the newest page and merges it into the rows already
+    loaded, so memory and refresh time depend on what was scrolled through,
+    not on the size of the history table. With an executor the page
+    queries run off the Qt thread and the rows arrive when they are ready.
+    """
+
+    HEADERS = ['Vehicle', 'Type', 'Category', 'Slot', 'Entry', 'Exit', 'Duration']
+    FIELDS = ['vehicle_num', 'vehicle_type', 'category', 'slot_id', 'entry_time', 'exit_time', 'duration_min']
+
+    def __init__(self, page_size=fetch_records.HISTORY_PAGE_SIZE, executor=None, parent=None):
+        super().__init__(self.HEADERS, self.FIELDS, key=lambda row: row['id'], parent=parent)
+        self.page_size = page_size
+        self.executor = executor
+        self._more = True
+        self._fetching = False
+
+    def _query(self, name, callback, **kwargs):
+        if self.executor is None:
+            callback(fetch_records.get_history_page(limit=self.page_size, **kwargs))
+        else:
+            self.executor.submit(name, fetch_records.get_history_page, kwargs.get('after'),
+                                 self.page_size, on_result=callback, key=name)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fetching:
+            return
+        last = self._rows[-1] if self._rows else None
+        after = (last['entry_time'], last['id']) if last else None
+        self._fetching = True
+
+        def append(page):
+            self._fetching = False
+            current = self._rows[-1]['id'] if self._rows else None
+            if current != (last['id'] if last else None):
+                # a refresh replaced the tail meanwhile; the view will ask again
+                return
+            rows = page['rows']
+            if rows:
+                self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+                self._rows.extend(rows)
+                self.endInsertRows()
+            self._more = page['next'] is not None
+
+        self._query('history page', append, after=after)
+
+    def refresh(self):
+        self._query('history refresh', self._merge_newest)
+
+    def _merge_newest(self, page):
+        boundary = page['next']
+        if boundary is None:
+            older = []
+        else:
+            # rows loaded earlier that are older than the newest page stay as they are
+            older = [row for row in self._rows if (row['entry_time'], row['id']) < boundary]
+        # loaded rows already reach the oldest one unless nothing older was kept
+        self._more = boundary is not None and (self._more or not older)
+        self.set_rows(page['rows'] + older)
+
+
+class HeatmapTableModel(QAbstractTableModel):
+    """
+    Read-only grid of counts (e.g. weekday x hour) shaded from white for
+    zero to red for the largest value
+    """
+
+    def __init__(self, row_labels, column_labels, parent=None):
+        super().__init__(parent)
+        self.row_labels = row_labels
+        self.column_labels = column_labels
+        self._matrix = [[0] * len(column_labels) for _ in row_labels]
+        self._peak = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.row_labels)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.column_labels)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return self.column_labels[section] if orientation == Qt.Horizontal else self.row_labels[section]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._matrix[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            return str(value)
+        if role == Qt.BackgroundRole:
+            shade = int(255 * (1 - value / self._peak)) if self._peak else 255
+            return QColor(255, shade, shade)
+        return None
+
+    def set_matrix(self, matrix):
+        self._matrix = [[int(value) for value in row] for row in matrix]
+        self._peak = max((max(row) for row in self._matrix), default=0)
+        self.dataChanged.emit(self.index(0, 0),
+                              self.index(len(self.row_labels) - 1, len(self.column_labels) - 1))
@@ -0,0 +1,32 @@
+import logging
+from datetime import datetime, date, time
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+def setup_logging(level=logging.INFO, log_file=None):
+    """
+    Configure application logging (safe to call more than once)
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+
+def to_epoch(value):
+    """
+    Unix seconds for a datetime, a date (its midnight) or an ISO string
+
+    Naive values are local time, as stored by the park/exit paths; the
+    migration backfill computes the same number in SQL with
+    strftime('%s', <seconds part>, 'utc').
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, time())
+    return int(value.timestamp())